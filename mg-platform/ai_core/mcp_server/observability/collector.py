@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Collecteur de traces local (remplaçant d'un collecteur OpenTelemetry pour le développement)
+Reçoit les spans OTLP/HTTP (protobuf ou JSON) et les écrit en JSONL, analyse le chemin critique d'une trace
+
+Usage:
+    python -m observability.collector serve [--port 4318] [--output traces/spans.jsonl]
+    python -m observability.collector critical-path traces/spans.jsonl [--trace-id <id>]
+"""
+
+import argparse
+import base64
+import json
+import logging
+import sys
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Codes OTLP vers les noms utilisés par l'exporteur fichier
+SPAN_KINDS = {0: "INTERNAL", 1: "INTERNAL", 2: "SERVER", 3: "CLIENT", 4: "PRODUCER", 5: "CONSUMER"}
+STATUS_CODES = {0: "UNSET", 1: "OK", 2: "ERROR"}
+
+
+def _decode_id(value: str) -> Optional[str]:
+    """Identifiants OTLP : base64 en protobuf décodé par MessageToDict, hexadécimal en JSON OTLP"""
+    if not value:
+        return None
+    try:
+        int(value, 16)
+        return value.lower()
+    except ValueError:
+        return base64.b64decode(value).hex()
+
+
+def _attribute_value(value: Dict[str, Any]) -> Any:
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "arrayValue" in value:
+        return [_attribute_value(item) for item in value["arrayValue"].get("values", [])]
+    return None
+
+
+def _attributes(attributes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {attribute["key"]: _attribute_value(attribute.get("value", {})) for attribute in attributes or []}
+
+
+def flatten_export_request(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Convertit une requête ExportTraceServiceRequest (forme JSON) en spans à plat"""
+    spans = []
+    for resource_spans in payload.get("resourceSpans", []):
+        resource = _attributes(resource_spans.get("resource", {}).get("attributes"))
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                start = int(span.get("startTimeUnixNano", 0))
+                end = int(span.get("endTimeUnixNano", 0))
+                kind = span.get("kind", 0)
+                status = span.get("status", {})
+                status_code = status.get("code", 0)
+                spans.append({
+                    "trace_id": _decode_id(span.get("traceId")),
+                    "span_id": _decode_id(span.get("spanId")),
+                    "parent_id": _decode_id(span.get("parentSpanId")),
+                    "name": span.get("name"),
+                    # MessageToDict produit les noms d'énumération (SPAN_KIND_SERVER, STATUS_CODE_ERROR)
+                    "kind": kind.replace("SPAN_KIND_", "") if isinstance(kind, str) else SPAN_KINDS.get(kind, "INTERNAL"),
+                    "start_time_unix_nano": start,
+                    "end_time_unix_nano": end,
+                    "duration_ms": round((end - start) / 1e6, 3),
+                    "attributes": _attributes(span.get("attributes")),
+                    "status": status_code.replace("STATUS_CODE_", "") if isinstance(status_code, str) else STATUS_CODES.get(status_code, "UNSET"),
+                    "status_message": status.get("message"),
+                    "service": resource.get("service.name")
+                })
+    return spans
+
+
+def decode_body(body: bytes, content_type: str) -> Dict[str, Any]:
+    """Décode le corps d'une requête OTLP/HTTP"""
+    if "json" in content_type:
+        return json.loads(body)
+
+    from google.protobuf.json_format import MessageToDict
+    from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest
+
+    request = ExportTraceServiceRequest()
+    request.ParseFromString(body)
+    return MessageToDict(request)
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    """Point d'entrée /v1/traces du protocole OTLP/HTTP"""
+
+    output: Path = Path("traces/spans.jsonl")
+    lock = threading.Lock()
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/traces":
+            self.send_error(404)
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            spans = flatten_export_request(decode_body(body, self.headers.get("Content-Type", "")))
+        except Exception as e:
+            logger.error(f"Invalid OTLP payload: {str(e)}")
+            self.send_error(400, str(e))
+            return
+
+        with self.lock, open(self.output, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + "\n")
+
+        logger.info(f"Received {len(spans)} span(s)")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def critical_path(spans: List[Dict[str, Any]], trace_id: Optional[str] = None) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Chemin critique d'une trace (la plus lente si trace_id n'est pas fourni), sous forme (profondeur, span).
+    En remontant depuis la fin de chaque span, on retient l'enfant qui se termine le plus tard
+    avant le curseur, puis on recule le curseur au début de cet enfant
+    """
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+    if not traces:
+        return []
+
+    if trace_id is None:
+        trace_id = max(traces, key=lambda tid: max(span["duration_ms"] or 0 for span in traces[tid]))
+    trace_spans = traces.get(trace_id, [])
+
+    span_ids = {span["span_id"] for span in trace_spans}
+    children = defaultdict(list)
+    roots = []
+    for span in trace_spans:
+        if span["parent_id"] in span_ids:
+            children[span["parent_id"]].append(span)
+        else:
+            roots.append(span)
+    if not roots:
+        return []
+
+    def walk(span: Dict[str, Any], depth: int) -> List[Tuple[int, Dict[str, Any]]]:
+        critical_children = []
+        cursor = span["end_time_unix_nano"]
+        for child in sorted(children.get(span["span_id"], []), key=lambda c: c["end_time_unix_nano"], reverse=True):
+            if child["start_time_unix_nano"] < cursor:
+                critical_children.append(child)
+                cursor = child["start_time_unix_nano"]
+
+        path = [(depth, span)]
+        for child in reversed(critical_children):
+            path.extend(walk(child, depth + 1))
+        return path
+
+    return walk(max(roots, key=lambda span: span["duration_ms"] or 0), 0)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Collecteur de traces local")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Reçoit les spans OTLP/HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=4318)
+    serve_parser.add_argument("--output", default="traces/spans.jsonl")
+
+    path_parser = subparsers.add_parser("critical-path", help="Chemin critique d'une trace")
+    path_parser.add_argument("spans_file")
+    path_parser.add_argument("--trace-id")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if args.command == "serve":
+        CollectorHandler.output = Path(args.output)
+        CollectorHandler.output.parent.mkdir(parents=True, exist_ok=True)
+        httpd = ThreadingHTTPServer((args.host, args.port), CollectorHandler)
+        logger.info(f"Collector listening on http://{args.host}:{args.port}/v1/traces, writing to {args.output}")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    path = critical_path(load_spans(args.spans_file), args.trace_id)
+    if not path:
+        print("No spans found")
+        return 1
+
+    root = path[0][1]
+    print(f"Trace {root['trace_id']} ({root['duration_ms']} ms)")
+    trace_start = root["start_time_unix_nano"]
+    for depth, span in path:
+        offset_ms = (span["start_time_unix_nano"] - trace_start) / 1e6
+        print(f"{'  ' * depth}{span['name']}: {span['duration_ms']} ms (+{offset_ms:.1f} ms) [{span['status']}]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Journalisation du serveur MCP chargée depuis config/logging.json
+Écriture asynchrone (file + thread d'écriture), enregistrements JSON contextualisés, échantillonnage
+"""
+
+import atexit
+import json
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+try:
+    from pythonjsonlogger.json import JsonFormatter as BaseJsonFormatter
+except ImportError:  # python-json-logger < 3
+    from pythonjsonlogger.jsonlogger import JsonFormatter as BaseJsonFormatter
+
+from observability.tracing import current_trace_id
+
+# Racine du projet : les chemins relatifs de la configuration sont résolus depuis ce dossier
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+DEFAULT_CONFIG_PATH = PROJECT_ROOT / "config" / "logging.json"
+
+# Contexte de l'appel en cours, recopié dans chaque enregistrement
+_log_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+_listeners: List["AsyncQueueHandler"] = []
+
+
+@contextmanager
+def log_context(**fields):
+    """Ajoute des champs (tool, request_id...) aux enregistrements émis dans le bloc"""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class ContextFilter(logging.Filter):
+    """Recopie le contexte de l'appel sur l'enregistrement (avant passage au thread d'écriture)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+
+        if not hasattr(record, "trace_id"):
+            trace_id = current_trace_id()
+            if trace_id:
+                record.trace_id = trace_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Ne conserve qu'un enregistrement sur `every` pour les niveaux <= max_level des loggers bruyants
+    Les avertissements et erreurs ne sont jamais échantillonnés
+    """
+
+    def __init__(self, every: int = 10, max_level: str = "INFO", loggers: Optional[List[str]] = None):
+        super().__init__()
+        self.every = max(int(every), 1)
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+        self.loggers = tuple(loggers or [])
+        self.counters: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def _is_noisy(self, name: str) -> bool:
+        return any(name == logger or name.startswith(logger + ".") for logger in self.loggers)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level or not self._is_noisy(record.name):
+            return True
+
+        key = (record.name, record.levelno)
+        with self._lock:
+            count = self.counters.get(key, 0)
+            self.counters[key] = count + 1
+
+        if count % self.every:
+            return False
+        record.sample_rate = self.every
+        return True
+
+
+class JsonFormatter(BaseJsonFormatter):
+    """Enregistrements JSON (timestamp, level, logger, message et champs de contexte)"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("rename_fields", {"asctime": "timestamp", "levelname": "level", "name": "logger"})
+        kwargs.setdefault("json_ensure_ascii", False)
+        super().__init__(*args, **kwargs)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Handler non bloquant : les enregistrements sont déposés dans une file bornée et
+    formatés/écrits par un thread dédié (QueueListener) vers les handlers cibles
+    """
+
+    def __init__(self, handlers: List[str], queue_size: int = 10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.target_names = handlers
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def start(self, handlers: Mapping[str, logging.Handler]):
+        """Démarre le thread d'écriture (handlers cibles configurés par dictConfig, par nom)"""
+        targets = [handlers[name] for name in self.target_names]
+        self.listener = logging.handlers.QueueListener(self.queue, *targets, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener:
+            self.listener.stop()
+            self.listener = None
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # File pleine : avertissements et erreurs écrits directement par le thread appelant,
+            # les autres enregistrements abandonnés plutôt que de bloquer la boucle d'événements
+            listener = self.listener
+            if record.levelno >= logging.WARNING and listener is not None:
+                listener.handle(record)
+                return
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+def dropped_records() -> int:
+    """Enregistrements abandonnés (file pleine) depuis le démarrage du processus"""
+    return sum(handler.dropped for handler in _listeners)
+
+
+def _resolve_paths(config: Dict[str, Any]):
+    """
+    Chemins de fichiers relatifs à la racine du projet, dossiers créés au besoin
+    Plusieurs workers (MCP_WORKERS > 1) : un fichier par processus (mcp_server.<pid>.log), la rotation d'un
+    fichier partagé par plusieurs processus perdrait ou mélangerait des enregistrements
+    """
+    per_process = int(os.getenv("MCP_WORKERS", "1")) > 1
+    for handler in config.get("handlers", {}).values():
+        filename = handler.get("filename")
+        if not filename:
+            continue
+        path = Path(filename)
+        if not path.is_absolute():
+            path = PROJECT_ROOT / path
+        if per_process:
+            path = path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler["filename"] = str(path)
+
+
+def stop_logging():
+    """Vide les files et arrête les threads d'écriture"""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def configure_logging(config_path: Optional[str] = None) -> bool:
+    """
+    Configure la journalisation depuis config/logging.json (ou MCP_LOGGING_CONFIG)
+    Retourne False si la configuration est absente ou invalide (repli sur basicConfig)
+    """
+    path = Path(config_path or os.getenv("MCP_LOGGING_CONFIG", DEFAULT_CONFIG_PATH))
+
+    try:
+        config = json.loads(path.read_text(encoding="utf-8"))
+        _resolve_paths(config)
+
+        level = os.getenv("LOG_LEVEL")
+        if level and "root" in config:
+            config["root"]["level"] = level.upper()
+
+        stop_logging()
+        # Configurateur conservé : ses handlers configurés, par nom, sont les cibles des files
+        configurator = logging.config.dictConfigClass(config)
+        configurator.configure()
+        handlers = configurator.config.get("handlers", {})
+    except (OSError, ValueError, TypeError, KeyError) as e:
+        logging.basicConfig(level=logging.INFO)
+        logging.getLogger(__name__).warning(f"Could not load logging configuration {path}: {str(e)}")
+        return False
+
+    for handler in handlers.values():
+        if isinstance(handler, AsyncQueueHandler):
+            handler.start(handlers)
+            _listeners.append(handler)
+
+    logging.getLogger(__name__).info(f"Logging configured from {path}")
+    return True
+
+
+atexit.register(stop_logging)
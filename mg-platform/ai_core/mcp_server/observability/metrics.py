@@ -0,0 +1,157 @@
+"""
+Métriques Prometheus du serveur MCP
+Appels, erreurs et latences par outil, pool de connexions, scraping par hôte, caches et journalisation
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from observability.log_config import dropped_records
+
+# Bornes couvrant les outils rapides (schéma, cache) comme l'analyse de gros fichiers
+TOOL_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SCRAPER_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+
+TOOL_CALLS = Counter(
+    "mcp_tool_calls_total", "Appels d'outils par statut", ["tool", "status"]
+)
+TOOL_ERRORS = Counter(
+    "mcp_tool_errors_total", "Appels d'outils en erreur (exception ou success=False)", ["tool"]
+)
+TOOL_LATENCY = Histogram(
+    "mcp_tool_duration_seconds", "Durée d'exécution des outils", ["tool"], buckets=TOOL_LATENCY_BUCKETS
+)
+TOOL_IN_FLIGHT = Gauge(
+    "mcp_tool_in_flight", "Appels d'outils en cours d'exécution", ["tool"], multiprocess_mode="livesum"
+)
+SCRAPER_LATENCY = Histogram(
+    "mcp_scraper_request_duration_seconds", "Durée des requêtes HTTP du scraper par hôte",
+    ["host", "status"], buckets=SCRAPER_LATENCY_BUCKETS
+)
+
+
+class ToolCall:
+    """Appel d'outil mesuré : error est positionné par l'appelant ou par une exception"""
+
+    def __init__(self):
+        self.error = False
+
+
+@contextmanager
+def track_tool(tool_name: str):
+    """Mesure un appel d'outil (latence, en cours, erreurs)"""
+    call = ToolCall()
+    in_flight = TOOL_IN_FLIGHT.labels(tool=tool_name)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException:
+        call.error = True
+        raise
+    finally:
+        in_flight.dec()
+        TOOL_LATENCY.labels(tool=tool_name).observe(time.perf_counter() - start)
+        TOOL_CALLS.labels(tool=tool_name, status="error" if call.error else "success").inc()
+        if call.error:
+            TOOL_ERRORS.labels(tool=tool_name).inc()
+
+
+def observe_scraper_request(host: str, duration: float, status: str):
+    """Listener du WebScraper : latence par hôte"""
+    SCRAPER_LATENCY.labels(host=host, status=status).observe(duration)
+
+
+class ServerStateCollector:
+    """Collecteur lu à chaque scrape : pool de connexions, taux de succès des caches et journalisation"""
+
+    def __init__(self, get_engine: Callable[[], Any], cache_stats: Dict[str, Callable[[], Dict[str, Any]]]):
+        """
+        Args:
+            get_engine: Retourne le moteur SQLAlchemy courant (None si non connecté)
+            cache_stats: Fonctions retournant des statistiques de cache (hits, misses, hit_ratio) par nom de cache
+        """
+        self.get_engine = get_engine
+        self.cache_stats = cache_stats
+
+    def collect(self):
+        yield from self._collect_pool()
+        yield from self._collect_caches()
+        yield CounterMetricFamily(
+            "mcp_log_records_dropped", "Enregistrements de journal abandonnés (file d'écriture pleine)",
+            value=dropped_records()
+        )
+
+    def _collect_pool(self):
+        engine = self.get_engine()
+        pool = getattr(engine, "pool", None)
+        if pool is None or not hasattr(pool, "checkedout"):
+            return
+
+        metrics = [
+            ("mcp_db_pool_size", "Taille configurée du pool de connexions", pool.size()),
+            ("mcp_db_pool_checked_out", "Connexions empruntées", pool.checkedout()),
+            ("mcp_db_pool_checked_in", "Connexions disponibles dans le pool", pool.checkedin()),
+            ("mcp_db_pool_overflow", "Connexions ouvertes au-delà de la taille du pool", pool.overflow()),
+        ]
+        for name, documentation, value in metrics:
+            yield GaugeMetricFamily(name, documentation, value=value)
+
+    def _collect_caches(self):
+        hits = CounterMetricFamily("mcp_cache_hits", "Succès par cache", labels=["cache"])
+        misses = CounterMetricFamily("mcp_cache_misses", "Échecs par cache", labels=["cache"])
+        ratio = GaugeMetricFamily("mcp_cache_hit_ratio", "Taux de succès par cache", labels=["cache"])
+
+        for cache_name, get_stats in self.cache_stats.items():
+            for name, stats in self._flatten(cache_name, get_stats()):
+                hits.add_metric([name], stats.get("hits", 0) + stats.get("coalesced", 0))
+                misses.add_metric([name], stats.get("misses", 0))
+                ratio.add_metric([name], stats.get("hit_ratio", 0.0))
+
+        yield hits
+        yield misses
+        yield ratio
+
+    @staticmethod
+    def _flatten(cache_name: str, stats: Dict[str, Any]):
+        """Statistiques par outil du cache de résultats, globales pour les autres caches"""
+        if "tools" in stats:
+            for tool_name, tool_stats in stats["tools"].items():
+                yield f"{cache_name}:{tool_name}", tool_stats
+        else:
+            yield cache_name, stats
+
+
+_collector: Optional[ServerStateCollector] = None
+
+
+def register_server_state(get_engine: Callable[[], Any], cache_stats: Dict[str, Callable[[], Dict[str, Any]]]):
+    """Enregistre le collecteur d'état du serveur (remplace un éventuel collecteur précédent)"""
+    global _collector
+    if _collector is not None:
+        REGISTRY.unregister(_collector)
+    _collector = ServerStateCollector(get_engine, cache_stats)
+    REGISTRY.register(_collector)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Exposition texte de toutes les métriques
+    Avec plusieurs workers (PROMETHEUS_MULTIPROC_DIR), compteurs et histogrammes sont agrégés entre workers
+    ; le pool de connexions est celui du worker qui répond
+    """
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    if _collector is not None:
+        registry.register(_collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,204 @@
+"""
+Profilage à la demande de l'exécution des outils
+Échantillonnage de la pile du thread d'exécution (format folded des flame graphs) et durées par étape
+Les étapes sont également des spans de trace OpenTelemetry
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from opentelemetry import trace
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+# Session de profilage du contexte courant (None : profilage inactif)
+_active_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+
+class ProfileSession:
+    """Durées des étapes d'un appel profilé (imbrication notée par des points-virgules)"""
+
+    def __init__(self, interval: float = 0.005):
+        self.start = time.perf_counter()
+        self.interval = interval
+        self.stages: List[Dict[str, Any]] = []
+        self.stack: List[str] = []
+        # Piles échantillonnées dans un autre processus (pool d'analyse)
+        self.remote_samples: Counter = Counter()
+        self.remote_callers: set = set()
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.start) * 1000, 3)
+
+    def merge_remote(self, stages: List[Dict[str, Any]], samples: Counter, start_ms: float, caller_stack: str):
+        """Rattache les étapes et les piles d'un worker à l'étape et à la pile de l'appelant"""
+        prefix = ";".join(self.stack)
+        for remote in stages:
+            self.stages.append({
+                "stage": f"{prefix};{remote['stage']}" if prefix else remote["stage"],
+                "start_ms": round(start_ms + remote["start_ms"], 3),
+                "duration_ms": remote["duration_ms"]
+            })
+        self.remote_callers.add(caller_stack)
+        for stack, count in samples.items():
+            self.remote_samples[f"{caller_stack};{stack}"] += count
+
+
+def active_session() -> Optional[ProfileSession]:
+    """Session de profilage du contexte courant (None : profilage inactif)"""
+    return _active_session.get()
+
+
+def format_stack(frame: Optional[FrameType], max_depth: int = 128) -> str:
+    """Pile d'appels d'une frame au format folded (de la racine vers la frame)"""
+    stack = []
+    while frame is not None and len(stack) < max_depth:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Étape d'un outil : span de trace et, si un profilage est actif, durée dans le profil
+    Utilisable comme bloc with ou comme décorateur
+    """
+    with tracer.start_as_current_span(name):
+        session = _active_session.get()
+        if session is None:
+            yield
+            return
+
+        session.stack.append(name)
+        path = ";".join(session.stack)
+        start_ms = session.elapsed_ms()
+        try:
+            yield
+        finally:
+            session.stack.pop()
+            session.stages.append({
+                "stage": path,
+                "start_ms": start_ms,
+                "duration_ms": round(session.elapsed_ms() - start_ms, 3)
+            })
+
+
+class SamplingProfiler:
+    """Échantillonne périodiquement la pile d'un thread et agrège les piles identiques"""
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, thread_id: int):
+        self._thread = threading.Thread(target=self._run, args=(thread_id,), name="tool-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self, thread_id: int):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            self.samples[format_stack(frame, self.max_depth)] += 1
+
+    def folded(self) -> str:
+        """Piles au format folded (compatible flamegraph.pl, speedscope, inferno)"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+def run_profiled(func: Callable, interval: float, *args, **kwargs) -> Tuple[Any, List[Dict[str, Any]], Counter]:
+    """Exécute une fonction sous profilage dans un worker : résultat, étapes et piles échantillonnées"""
+    session = ProfileSession(interval)
+    sampler = SamplingProfiler(interval)
+    token = _active_session.set(session)
+    sampler.start(threading.get_ident())
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        sampler.stop()
+        _active_session.reset(token)
+    return result, session.stages, sampler.samples
+
+
+class ToolProfiler:
+    """Profilage d'un appel d'outil sur le thread courant (échantillonnage + étapes)"""
+
+    def __init__(self, tool_name: str, interval: Optional[float] = None):
+        self.tool_name = tool_name
+        self.interval = interval or float(os.getenv("MCP_PROFILE_INTERVAL_MS", "5")) / 1000
+        self.sampler = SamplingProfiler(self.interval)
+        self.session = ProfileSession(self.interval)
+        self.duration_ms = 0.0
+
+    @contextmanager
+    def profile(self):
+        """Active le profilage pour le bloc (à exécuter sur le thread qui exécute l'outil)"""
+        token = _active_session.set(self.session)
+        self.sampler.start(threading.get_ident())
+        try:
+            yield self
+        finally:
+            self.sampler.stop()
+            self._merge_remote_samples()
+            self.duration_ms = self.session.elapsed_ms()
+            _active_session.reset(token)
+
+    def _merge_remote_samples(self):
+        """Piles des workers à la place de l'attente du résultat dans le thread appelant"""
+        prefixes = tuple(f"{caller};" for caller in self.session.remote_callers)
+        if prefixes:
+            for stack in [stack for stack in self.sampler.samples if stack.startswith(prefixes)]:
+                del self.sampler.samples[stack]
+        self.sampler.samples.update(self.session.remote_samples)
+
+    def run(self, func, **arguments):
+        """Exécute une fonction synchrone sous profilage"""
+        with self.profile():
+            return func(**arguments)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Profil retourné avec le résultat (et enregistré si MCP_PROFILE_DIR est défini)"""
+        folded = self.sampler.folded()
+        profile = {
+            "tool": self.tool_name,
+            "mode": "sampling",
+            "interval_ms": round(self.interval * 1000, 3),
+            "duration_ms": self.duration_ms,
+            "samples": sum(self.sampler.samples.values()),
+            "stages": sorted(self.session.stages, key=lambda s: s["start_ms"]),
+            "folded": folded
+        }
+
+        profile_dir = os.getenv("MCP_PROFILE_DIR")
+        if profile_dir:
+            try:
+                path = Path(profile_dir)
+                path.mkdir(parents=True, exist_ok=True)
+                target = path / f"{self.tool_name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.folded"
+                target.write_text(folded + "\n", encoding="utf-8")
+                profile["stored_at"] = str(target)
+            except OSError as e:
+                logger.warning(f"Could not store profile for {self.tool_name}: {str(e)}")
+
+        return profile
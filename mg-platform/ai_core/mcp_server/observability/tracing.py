@@ -0,0 +1,228 @@
+"""
+Traçage distribué du serveur MCP (OpenTelemetry)
+Configure le fournisseur de spans et leur export (fichier JSONL ou collecteur OTLP/HTTP)
+"""
+
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+from opentelemetry import context, propagate, trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import Event, ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import ALWAYS_ON, ParentBased, TraceIdRatioBased
+from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+from opentelemetry.trace import SpanContext, SpanKind, TraceFlags
+from opentelemetry.trace.status import Status, StatusCode
+
+logger = logging.getLogger(__name__)
+
+# Racine du projet : MCP_TRACE_FILE relatif est résolu depuis ce dossier, comme les fichiers de journal
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+_provider: Optional[TracerProvider] = None
+_processor: Optional[BatchSpanProcessor] = None
+
+# Worker du pool d'analyse : spans gardés en mémoire puis renvoyés au serveur
+_capture_exporter: Optional[InMemorySpanExporter] = None
+
+
+def span_to_dict(span: ReadableSpan) -> Dict[str, Any]:
+    """Représentation à plat d'un span (même format que le collecteur local)"""
+    span_context = span.get_span_context()
+    return {
+        "trace_id": trace.format_trace_id(span_context.trace_id),
+        "span_id": trace.format_span_id(span_context.span_id),
+        "parent_id": trace.format_span_id(span.parent.span_id) if span.parent else None,
+        "name": span.name,
+        "kind": span.kind.name,
+        "start_time_unix_nano": span.start_time,
+        "end_time_unix_nano": span.end_time,
+        "duration_ms": round((span.end_time - span.start_time) / 1e6, 3) if span.end_time else None,
+        "attributes": dict(span.attributes or {}),
+        "status": span.status.status_code.name,
+        "status_message": span.status.description,
+        "service": span.resource.attributes.get("service.name")
+    }
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Export des spans terminés dans un fichier JSONL (un span par ligne)"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        try:
+            lines = "".join(json.dumps(span_to_dict(span), default=str) + "\n" for span in spans)
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+            return SpanExportResult.SUCCESS
+        except OSError as e:
+            logger.warning(f"Could not export spans to {self.path}: {str(e)}")
+            return SpanExportResult.FAILURE
+
+    def shutdown(self):
+        pass
+
+
+def _trace_file() -> Path:
+    """Fichier JSONL des spans (MCP_TRACE_FILE, relatif à la racine du projet)"""
+    path = Path(os.getenv("MCP_TRACE_FILE") or "traces/spans.jsonl")
+    return path if path.is_absolute() else PROJECT_ROOT / path
+
+
+def _build_exporter(exporter_name: str) -> Optional[SpanExporter]:
+    """Exporteur choisi par MCP_TRACE_EXPORTER (none, file, otlp)"""
+    if exporter_name == "file":
+        return JsonLinesSpanExporter(str(_trace_file()))
+
+    if exporter_name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("opentelemetry-exporter-otlp-proto-http not installed, exporting spans to file")
+            return JsonLinesSpanExporter(str(_trace_file()))
+        return OTLPSpanExporter(endpoint=os.getenv("MCP_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"))
+
+    if exporter_name != "none":
+        logger.warning(f"Unknown trace exporter '{exporter_name}', tracing disabled")
+    return None
+
+
+def configure_tracing(service_name: str, service_version: str) -> bool:
+    """
+    Installe le fournisseur de spans du processus (une seule fois)
+    Sans configuration, les spans créés par les outils restent des no-op
+    """
+    global _provider, _processor
+    if _provider is not None:
+        return True
+
+    exporter = _build_exporter(os.getenv("MCP_TRACE_EXPORTER", "none").lower())
+    if exporter is None:
+        return False
+
+    sample_ratio = float(os.getenv("MCP_TRACE_SAMPLE_RATIO", "1.0"))
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name, "service.version": service_version}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio))
+    )
+    _processor = BatchSpanProcessor(exporter)
+    _provider.add_span_processor(_processor)
+    trace.set_tracer_provider(_provider)
+
+    logger.info(f"Tracing enabled ({exporter.__class__.__name__}, sample ratio {sample_ratio})")
+    return True
+
+
+def extract_context(headers: Mapping[str, str]) -> Context:
+    """
+    Contexte parent des spans d'un appel : span HTTP courant s'il existe (instrumentation
+    de FastAPI), sinon contexte transmis par l'appelant (en-tête traceparent W3C)
+    """
+    if trace.get_current_span().get_span_context().is_valid:
+        return context.get_current()
+    return propagate.extract(headers)
+
+
+def current_trace_id() -> Optional[str]:
+    """Identifiant de la trace courante (None hors trace échantillonnée)"""
+    span_context = trace.get_current_span().get_span_context()
+    return trace.format_trace_id(span_context.trace_id) if span_context.is_valid else None
+
+
+def inject_context() -> Dict[str, str]:
+    """Contexte de trace courant à transmettre à un autre processus (vide si le traçage est inactif)"""
+    carrier: Dict[str, str] = {}
+    if _provider is not None:
+        propagate.inject(carrier)
+    return carrier
+
+
+def _span_record(span: ReadableSpan) -> Dict[str, Any]:
+    """Champs d'un span terminé, sérialisables entre processus (ReadableSpan ne l'est pas)"""
+    return {
+        "name": span.name,
+        "trace_id": span.context.trace_id,
+        "span_id": span.context.span_id,
+        "trace_flags": int(span.context.trace_flags),
+        "parent_id": span.parent.span_id if span.parent else None,
+        "kind": span.kind.name,
+        "start_time": span.start_time,
+        "end_time": span.end_time,
+        "attributes": dict(span.attributes or {}),
+        "events": [(event.name, dict(event.attributes or {}), event.timestamp) for event in span.events],
+        "status": span.status.status_code.name,
+        "status_message": span.status.description,
+        "scope": span.instrumentation_scope.name if span.instrumentation_scope else __name__
+    }
+
+
+@contextmanager
+def capture_spans(carrier: Mapping[str, str]) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Exécution dans un worker sous le contexte de trace du serveur
+    La liste fournie reçoit en sortie les spans terminés du bloc, à exporter par le serveur
+    """
+    global _capture_exporter
+    spans: List[Dict[str, Any]] = []
+    if not carrier:
+        yield spans
+        return
+
+    if _capture_exporter is None:
+        # Échantillonnage décidé par le serveur (drapeau du contexte transmis)
+        _capture_exporter = InMemorySpanExporter()
+        provider = TracerProvider(sampler=ParentBased(ALWAYS_ON))
+        provider.add_span_processor(SimpleSpanProcessor(_capture_exporter))
+        trace.set_tracer_provider(provider)
+
+    _capture_exporter.clear()
+    token = context.attach(propagate.extract(carrier))
+    try:
+        yield spans
+    finally:
+        context.detach(token)
+        spans.extend(_span_record(span) for span in _capture_exporter.get_finished_spans())
+        _capture_exporter.clear()
+
+
+def export_remote_spans(spans: Sequence[Dict[str, Any]]):
+    """Exporte avec ceux du serveur les spans renvoyés par un worker (rattachés à la trace d'origine)"""
+    if _processor is None:
+        return
+
+    for record in spans:
+        flags = TraceFlags(record["trace_flags"])
+        parent = None
+        if record["parent_id"] is not None:
+            parent = SpanContext(record["trace_id"], record["parent_id"], is_remote=True, trace_flags=flags)
+        _processor.on_end(ReadableSpan(
+            name=record["name"],
+            context=SpanContext(record["trace_id"], record["span_id"], is_remote=False, trace_flags=flags),
+            parent=parent,
+            resource=_provider.resource,
+            attributes=record["attributes"],
+            events=[Event(name, attributes, timestamp) for name, attributes, timestamp in record["events"]],
+            kind=SpanKind[record["kind"]],
+            status=Status(StatusCode[record["status"]], record["status_message"]),
+            start_time=record["start_time"],
+            end_time=record["end_time"],
+            instrumentation_scope=InstrumentationScope(record["scope"])
+        ))
+
+
+def flush_spans():
+    """Force l'export des spans en attente (arrêt du serveur, tests)"""
+    if _provider is not None:
+        _provider.force_flush()
@@ -4,43 +4,89 @@ Fournit les outils essentiels pour l'analyse et l'enrichissement des données
 """
 
 import asyncio
+import inspect
 import json
 import logging
-from typing import Any, Dict, List, Optional
+import os
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Union
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
-# Importation des outils
-from tools.file_tools import analyze_file, enrich_file
-from tools.data_tools import run_sql, get_table_schema
-from tools.scraping_tools import search_web, scrape_url
+# Configuration du logging (config/logging.json) avant le chargement des outils, qui journalisent dès leur import
+from observability.log_config import configure_logging, log_context, new_request_id
+configure_logging()
+
+# Les modules d'outils (pandas, SQLAlchemy, BeautifulSoup) sont importés au premier appel (tool_registry)
+from shared_state import get_state, remove_sqlite_state
+from tool_cache import CachePolicy, ToolResultCache, file_state_key, is_error_result
+from tool_registry import LazyTool, on_module_load
+from observability.metrics import observe_scraper_request, register_server_state, render_metrics, track_tool
+from observability.profiling import ToolProfiler
+from observability.tracing import configure_tracing, current_trace_id, extract_context
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.trace import Status, StatusCode
 
-# Configuration du logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
 
 # Modèles Pydantic pour les requêtes/réponses
 class ToolRequest(BaseModel):
     name: str
     arguments: Dict[str, Any]
+    profile: bool = False
 
 class ToolResponse(BaseModel):
     success: bool
     result: Any
     error: Optional[str] = None
+    profile: Optional[Dict[str, Any]] = None
+    trace_id: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    calls: List[ToolRequest] = Field(default_factory=list)
+    stream: bool = False
+
+class BatchResponse(BaseModel):
+    results: List[ToolResponse]
 
 class MCPServer:
     def __init__(self, name: str, version: str = "0.1.0"):
         self.name = name
         self.version = version
         self.tools = {}
+        
+        # Limites d'exécution partagées par les appels unitaires et les lots
+        self.max_concurrency = int(os.getenv("MCP_MAX_CONCURRENCY", "8"))
+        self.max_batch_size = int(os.getenv("MCP_MAX_BATCH_SIZE", "50"))
+        self.execution_slots = asyncio.Semaphore(self.max_concurrency)
+        
+        # Mémoïsation des outils idempotents (politique déclarée dans add_tool), partagée entre workers
+        self.result_cache = ToolResultCache(get_state())
+        
+        # Chargement des modules d'outils : lazy (premier appel), background (après le démarrage) ou eager
+        self.tool_loading = os.getenv("MCP_TOOL_LOADING", "background").lower()
+        
+        # Réception des fichiers envoyés (/files/upload), module importé au premier envoi
+        self.upload_receiver = LazyTool("tools.upload_tools:receive_upload")
+        
+        # Export des spans (MCP_TRACE_EXPORTER) ; sans configuration les spans sont des no-op
+        configure_tracing(name, version)
         self.app = FastAPI(
             title=f"{name} MCP Server",
             description="Model Context Protocol Server pour Marne & Gondoire",
-            version=version
+            version=version,
+            lifespan=self.lifespan
         )
         
         # Configuration CORS
@@ -55,6 +101,38 @@ class MCPServer:
         # Routes principales
         self.setup_routes()
     
+    @asynccontextmanager
+    async def lifespan(self, app: FastAPI):
+        """Préchargement des outils au démarrage, sans retarder les premières requêtes en mode background"""
+        if self.tool_loading == "eager":
+            await run_in_threadpool(self.preload_tools)
+        elif self.tool_loading == "background":
+            threading.Thread(target=self.preload_tools, name="tool-preload", daemon=True).start()
+        yield
+        # Pool d'analyse démarré seulement si un outil de fichiers l'a utilisé
+        process_pool = sys.modules.get("tools.process_pool")
+        if process_pool is not None:
+            process_pool.shutdown_pool()
+        # Historique d'enrichissement en attente écrit avant l'arrêt du worker
+        data_tools = sys.modules.get("tools.data_tools")
+        if data_tools is not None:
+            await run_in_threadpool(data_tools.flush_enrichments)
+    
+    def preload_tools(self):
+        """Importe et initialise les modules de tous les outils (un échec n'empêche pas le démarrage)"""
+        for name, tool in self.tools.items():
+            try:
+                tool["loader"].load()
+            except Exception as e:
+                logger.error(f"Could not load tool {name}: {str(e)}")
+    
+    async def load_tool(self, tool_name: str) -> Callable:
+        """Fonction de l'outil, importée dans le pool de threads au premier appel"""
+        loader = self.tools[tool_name]["loader"]
+        if loader.loaded:
+            return loader.load()
+        return await run_in_threadpool(loader.load)
+    
     def setup_routes(self):
         """Configure les routes principales du serveur MCP"""
         
@@ -75,48 +153,287 @@ class MCPServer:
                     {
                         "name": name,
                         "description": tool.get("description", ""),
-                        "parameters": tool.get("parameters", {})
+                        "parameters": tool.get("parameters", {}),
+                        "streaming": tool.get("streaming", False),
+                        "cached": self.result_cache.is_enabled(name),
+                        "loaded": tool["loader"].loaded
                     }
                     for name, tool in self.tools.items()
                 ]
             }
         
+        @self.app.get("/metrics")
+        async def metrics():
+            """Métriques au format Prometheus"""
+            content, content_type = render_metrics()
+            return Response(content=content, media_type=content_type)
+        
+        @self.app.get("/cache")
+        async def cache_stats():
+            """Statistiques du cache de résultats (succès, échecs, appels regroupés) et des DataFrames partagés"""
+            stats = await run_in_threadpool(self.result_cache.get_stats)
+            frame_store = sys.modules.get("tools.frame_store")
+            if frame_store is not None:
+                stats["frames"] = frame_store.frame_store.get_stats()
+            return stats
+        
+        @self.app.delete("/cache")
+        async def clear_cache(tool: Optional[str] = None):
+            """Vide le cache de résultats d'un outil ou de tous les outils"""
+            return {"invalidated": await run_in_threadpool(self.result_cache.invalidate, tool)}
+        
+        @self.app.post("/files/upload")
+        async def upload_file(http_request: Request, analyze: bool = True):
+            """
+            Reçoit un fichier en multipart/form-data (champ 'file') sans le charger en mémoire
+            Le fichier est enregistré dans files_processed puis, si analyze, analysé pour que l'appel
+            suivant de analyze_file sur le chemin retourné soit servi par le cache
+            """
+            receive = self.upload_receiver.load() if self.upload_receiver.loaded else \
+                await run_in_threadpool(self.upload_receiver.load)
+            upload = await receive(http_request.headers.get("content-type", ""), http_request.stream())
+            if not upload["success"]:
+                raise HTTPException(status_code=upload["status_code"], detail=upload["error"])
+            
+            if analyze:
+                response = await self.run_tool(
+                    "analyze_file", {"file_path": upload["file_path"]},
+                    trace_context=extract_context(http_request.headers),
+                    request_id=http_request.headers.get("x-request-id")
+                )
+                upload["analysis"] = {
+                    "success": response.success and not is_error_result(response.result),
+                    "missing_data_summary": (response.result or {}).get("missing_data_summary"),
+                    "error": response.error or (response.result or {}).get("error")
+                }
+            return upload
+        
+        # Déclarée avant /tools/{tool_name} pour ne pas être capturée par celle-ci
+        @self.app.post("/tools/batch")
+        async def call_tools_batch(request: BatchRequest, http_request: Request):
+            """Appelle plusieurs outils en parallèle (résultats dans l'ordre des appels)"""
+            if len(request.calls) > self.max_batch_size:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Batch too large ({len(request.calls)} calls, max {self.max_batch_size})"
+                )
+            
+            # Les appels du lot partagent la trace de la requête (ou celle de l'appelant)
+            trace_context = extract_context(http_request.headers)
+            
+            if request.stream:
+                return StreamingResponse(
+                    self.stream_batch(request.calls, trace_context, http_request.headers.get("x-request-id")),
+                    media_type="application/x-ndjson"
+                )
+            
+            batch_id = http_request.headers.get("x-request-id") or new_request_id()
+            results = await asyncio.gather(*(
+                self.run_tool(call.name, call.arguments, call.profile, trace_context, f"{batch_id}-{index}")
+                for index, call in enumerate(request.calls)
+            ))
+            return BatchResponse(results=list(results))
+        
         @self.app.post("/tools/{tool_name}")
-        async def call_tool(tool_name: str, request: ToolRequest):
-            """Appelle un outil spécifique"""
+        async def call_tool(tool_name: str, request: ToolRequest, http_request: Request):
+            """Appelle un outil spécifique (flux SSE ou NDJSON pour les outils générateurs)"""
             if tool_name not in self.tools:
                 raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found")
             
+            # Contexte de trace de l'appelant (en-tête traceparent) ou nouvelle trace
+            trace_context = extract_context(http_request.headers)
+            
+            if self.tools[tool_name]["streaming"]:
+                accept = http_request.headers.get("accept", "")
+                media_type = "text/event-stream" if "text/event-stream" in accept else "application/x-ndjson"
+                return StreamingResponse(
+                    self.stream_tool(tool_name, request.arguments, media_type, trace_context,
+                                     http_request.headers.get("x-request-id")),
+                    media_type=media_type,
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+                )
+            
+            # Profilage à la demande : champ profile ou en-tête X-MCP-Profile
+            profile = request.profile or http_request.headers.get("x-mcp-profile", "").lower() in ("1", "true", "yes")
+            request_id = http_request.headers.get("x-request-id")
+            return await self.run_tool(tool_name, request.arguments, profile, trace_context, request_id)
+    
+    async def run_tool(self, tool_name: str, arguments: Dict[str, Any], profile: bool = False,
+                       trace_context: Optional[Context] = None, request_id: Optional[str] = None) -> ToolResponse:
+        """Exécute un outil et encapsule le résultat ou l'erreur dans une ToolResponse"""
+        if tool_name not in self.tools:
+            return ToolResponse(success=False, result=None, error=f"Tool '{tool_name}' not found")
+        
+        with log_context(tool=tool_name, request_id=request_id or new_request_id()):
+            start = time.perf_counter()
+            response = await self._run_tool(tool_name, arguments, profile, trace_context)
+            logger.info(
+                f"Tool {tool_name} {'completed' if response.success else 'failed'}",
+                extra={"duration_ms": round((time.perf_counter() - start) * 1000, 2), "success": response.success}
+            )
+            return response
+    
+    async def _run_tool(self, tool_name: str, arguments: Dict[str, Any], profile: bool,
+                        trace_context: Optional[Context]) -> ToolResponse:
+        profiler = ToolProfiler(tool_name) if profile else None
+        with tracer.start_as_current_span(
+            f"tool {tool_name}", context=trace_context, attributes={"mcp.tool": tool_name}
+        ) as span:
             try:
-                tool_func = self.tools[tool_name]["func"]
-                result = await self.execute_tool(tool_func, request.arguments)
+                if profiler:
+                    # Appel profilé : le cache est contourné pour mesurer une exécution réelle
+                    result = await self.execute_tool(tool_name, arguments, profiler)
+                elif self.result_cache.is_enabled(tool_name):
+                    result = await self.result_cache.get_or_compute(
+                        tool_name, self.with_defaults(tool_name, arguments),
+                        lambda: self.execute_tool(tool_name, arguments)
+                    )
+                else:
+                    result = await self.execute_tool(tool_name, arguments)
                 
+                if is_error_result(result):
+                    span.set_status(Status(StatusCode.ERROR, str(result.get("error", ""))))
+                
+                # Invalidation dans l'état partagé (SQLite, Redis) hors de la boucle d'événements
+                await run_in_threadpool(self.result_cache.notify_success, tool_name, result)
                 return ToolResponse(
                     success=True,
-                    result=result
+                    result=result,
+                    profile=profiler.to_dict() if profiler else None,
+                    trace_id=current_trace_id()
                 )
             except Exception as e:
                 logger.error(f"Error executing tool {tool_name}: {str(e)}")
+                span.record_exception(e)
+                span.set_status(Status(StatusCode.ERROR, str(e)))
                 return ToolResponse(
                     success=False,
                     result=None,
-                    error=str(e)
+                    error=str(e),
+                    profile=profiler.to_dict() if profiler else None,
+                    trace_id=current_trace_id()
+                )
+    
+    async def stream_batch(self, calls: List[ToolRequest], trace_context: Optional[Context] = None,
+                           batch_id: Optional[str] = None):
+        """Émet en NDJSON le résultat de chaque appel dès qu'il est terminé"""
+        batch_id = batch_id or new_request_id()
+        
+        async def indexed(index: int, call: ToolRequest):
+            response = await self.run_tool(call.name, call.arguments, call.profile, trace_context, f"{batch_id}-{index}")
+            return index, call.name, response
+        
+        tasks = [asyncio.ensure_future(indexed(index, call)) for index, call in enumerate(calls)]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                index, name, response = await completed
+                yield json.dumps({"index": index, "name": name, **jsonable_encoder(response)}) + "\n"
+        finally:
+            # Client déconnecté : on annule les appels restants
+            for task in tasks:
+                task.cancel()
+    
+    async def stream_tool(self, tool_name: str, arguments: Dict[str, Any], media_type: str,
+                          trace_context: Optional[Context] = None, request_id: Optional[str] = None):
+        """Transmet chaque élément produit par un outil générateur dès qu'il est disponible"""
+        with log_context(tool=tool_name, request_id=request_id or new_request_id()):
+            async for event in self._stream_tool(tool_name, arguments, media_type, trace_context):
+                yield event
+    
+    async def _stream_tool(self, tool_name: str, arguments: Dict[str, Any], media_type: str,
+                           trace_context: Optional[Context]):
+        chunks = 0
+        start = time.perf_counter()
+        
+        async with self.execution_slots:
+            try:
+                tool_func = await self.load_tool(tool_name)
+                with track_tool(tool_name), tracer.start_as_current_span(
+                    f"tool {tool_name}", context=trace_context,
+                    attributes={"mcp.tool": tool_name, "mcp.streaming": True}
+                ):
+                    async for chunk in self.iterate_tool(tool_func, arguments):
+                        yield self.format_event("chunk", {"index": chunks, "data": chunk}, media_type)
+                        chunks += 1
+                yield self.format_event("end", {"success": True, "chunks": chunks}, media_type)
+                logger.info(
+                    f"Tool {tool_name} streamed",
+                    extra={"duration_ms": round((time.perf_counter() - start) * 1000, 2), "chunks": chunks, "success": True}
                 )
+            except Exception as e:
+                logger.error(f"Error streaming tool {tool_name}: {str(e)}")
+                yield self.format_event("error", {"success": False, "error": str(e), "chunks": chunks}, media_type)
     
-    async def execute_tool(self, tool_func, arguments: Dict[str, Any]):
-        """Exécute un outil avec gestion async/sync"""
-        if asyncio.iscoroutinefunction(tool_func):
-            return await tool_func(**arguments)
+    @staticmethod
+    def format_event(event: str, payload: Dict[str, Any], media_type: str) -> str:
+        """Formate un événement en Server-Sent Event ou en ligne NDJSON"""
+        data = json.dumps(jsonable_encoder(payload))
+        if media_type == "text/event-stream":
+            return f"event: {event}\ndata: {data}\n\n"
+        return json.dumps({"type": event, **json.loads(data)}) + "\n"
+    
+    async def iterate_tool(self, tool_func, arguments: Dict[str, Any]):
+        """Itère un outil générateur (async ou sync, ce dernier dans le pool de threads)"""
+        if inspect.isasyncgenfunction(tool_func):
+            async for chunk in tool_func(**arguments):
+                yield chunk
         else:
-            return tool_func(**arguments)
+            async for chunk in iterate_in_threadpool(tool_func(**arguments)):
+                yield chunk
+    
+    async def execute_tool(self, tool_name: str, arguments: Dict[str, Any], profiler: Optional[ToolProfiler] = None):
+        """Exécute un outil avec gestion async/sync (outils synchrones dans le pool de threads)"""
+        tool_func = await self.load_tool(tool_name)
+        
+        async with self.execution_slots:
+            with track_tool(tool_name) as call:
+                if inspect.isgeneratorfunction(tool_func) or inspect.isasyncgenfunction(tool_func):
+                    # Appel non streamé d'un outil générateur (ex: lot) : éléments regroupés
+                    result = [chunk async for chunk in self.iterate_tool(tool_func, arguments)]
+                elif asyncio.iscoroutinefunction(tool_func):
+                    if profiler:
+                        # Échantillonne le thread de la boucle d'événements (inclut les autres tâches)
+                        with profiler.profile():
+                            result = await tool_func(**arguments)
+                    else:
+                        result = await tool_func(**arguments)
+                elif profiler:
+                    result = await run_in_threadpool(profiler.run, tool_func, **arguments)
+                else:
+                    result = await run_in_threadpool(tool_func, **arguments)
+                
+                call.error = is_error_result(result)
+                return result
+    
+    def with_defaults(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Arguments complétés par les valeurs par défaut déclarées (clé de cache identique avec ou sans elles)"""
+        parameters = self.tools[tool_name].get("parameters", {})
+        defaults = {name: spec["default"] for name, spec in parameters.items() if "default" in spec}
+        return {**defaults, **arguments}
     
-    def add_tool(self, name: str, func: callable, description: str = "", parameters: Dict = None):
-        """Ajoute un outil au serveur MCP"""
+    def add_tool(self, name: str, func: Union[str, Callable], description: str = "", parameters: Dict = None,
+                 cache: Optional[CachePolicy] = None, streaming: Optional[bool] = None):
+        """
+        Ajoute un outil au serveur MCP
+        
+        Args:
+            func: Fonction de l'outil ou référence 'module:fonction' importée au premier appel
+            cache: Politique de mémoïsation pour un outil idempotent
+            streaming: Outil générateur (déduit de la fonction, à préciser pour une référence)
+        """
+        if streaming is None:
+            streaming = callable(func) and (inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func))
+        if cache and streaming:
+            raise ValueError(f"Streaming tool '{name}' cannot be cached")
+        
         self.tools[name] = {
-            "func": func,
+            "loader": LazyTool(func),
             "description": description,
-            "parameters": parameters or {}
+            "parameters": parameters or {},
+            "streaming": streaming
         }
+        if cache:
+            self.result_cache.register(name, cache)
         logger.info(f"Tool '{name}' registered successfully")
 
 
@@ -126,56 +443,115 @@ server = MCPServer(name="mg-data-mcp")
 # Enregistrement des outils
 server.add_tool(
     name="analyze_file",
-    func=analyze_file,
+    func="tools.file_tools:analyze_file",
     description="Analyse un fichier (Excel, CSV, JSON) et identifie les données manquantes",
     parameters={
         "file_path": {"type": "string", "description": "Chemin vers le fichier à analyser"},
         "detailed": {"type": "boolean", "description": "Analyse détaillée (optionnel)", "default": False}
-    }
+    },
+    cache=CachePolicy(
+        ttl=int(os.getenv("CACHE_TTL_ANALYZE_FILE", "3600")),
+        key=file_state_key,
+        invalidated_by=["enrich_file"]
+    )
 )
 
 server.add_tool(
     name="enrich_file",
-    func=enrich_file,
+    func="tools.file_tools:enrich_file",
     description="Enrichit un fichier avec des données manquantes via web scraping",
     parameters={
         "file_path": {"type": "string", "description": "Chemin vers le fichier à enrichir"},
-        "missing_fields": {"type": "array", "description": "Liste des champs manquants à rechercher"}
+        "missing_fields": {"type": "array", "description": "Liste des champs manquants à rechercher"},
+        "only_changed": {"type": "boolean", "description": "N'enrichit que les lignes ajoutées ou modifiées depuis la version précédente", "default": False},
+        "previous_file_path": {"type": "string", "description": "Version précédente déjà enrichie (optionnel, défaut : dernière version indexée du fichier)"},
+        "key_columns": {"type": "array", "description": "Colonnes identifiant une ligne (optionnel, défaut : colonne SIRET/identifiant unique)"},
+        "output_path": {"type": "string", "description": "Fichier enrichi à produire, format selon l'extension : .xlsx, .csv, .tsv, .json, .ndjson, .parquet (optionnel)"}
+    }
+)
+
+server.add_tool(
+    name="diff_file_versions",
+    func="tools.file_tools:diff_file_versions",
+    description="Compare deux versions d'un fichier ligne à ligne par clé (lignes ajoutées, supprimées, modifiées)",
+    parameters={
+        "file_path": {"type": "string", "description": "Chemin vers la nouvelle version"},
+        "previous_file_path": {"type": "string", "description": "Chemin vers la version précédente (optionnel, défaut : version indexée lors du dernier appel)"},
+        "key_columns": {"type": "array", "description": "Colonnes identifiant une ligne (optionnel, défaut : colonne SIRET/identifiant unique)"},
+        "limit": {"type": "integer", "description": "Nombre maximum de lignes retournées par catégorie", "default": 100}
+    }
+)
+
+server.add_tool(
+    name="sync_entity_index",
+    func="tools.entity_index:sync_entity_index",
+    description="Intègre les nouveaux enrichissements à l'index des entités (réutilisés entre lignes et fichiers)",
+    parameters={
+        "full": {"type": "boolean", "description": "Reconstruit l'index à partir de tout l'historique", "default": False}
     }
 )
 
 server.add_tool(
     name="run_sql",
-    func=run_sql,
+    func="tools.data_tools:run_sql",
     description="Exécute une requête SQL en lecture seule",
     parameters={
         "query": {"type": "string", "description": "Requête SQL à exécuter"},
-        "limit": {"type": "integer", "description": "Limite de résultats (optionnel)", "default": 100}
+        "limit": {"type": "integer", "description": "Limite de résultats (optionnel)", "default": 100},
+        "timeout_ms": {"type": "integer", "description": "Durée maximale de la requête en millisecondes (optionnel)"}
     }
 )
 
+server.add_tool(
+    name="stream_sql",
+    func="tools.data_tools:stream_sql",
+    description="Exécute une requête SQL en lecture seule et transmet les résultats page par page (flux NDJSON ou SSE)",
+    parameters={
+        "query": {"type": "string", "description": "Requête SQL à exécuter"},
+        "limit": {"type": "integer", "description": "Nombre maximum de lignes (0 = illimité)", "default": 10000},
+        "page_size": {"type": "integer", "description": "Nombre de lignes par page", "default": 500},
+        "timeout_ms": {"type": "integer", "description": "Durée maximale de la requête en millisecondes (optionnel)"}
+    },
+    streaming=True
+)
+
 server.add_tool(
     name="get_table_schema",
-    func=get_table_schema,
+    func="tools.data_tools:get_table_schema",
     description="Retourne le schéma d'une table de la base de données",
     parameters={
         "table_name": {"type": "string", "description": "Nom de la table"}
+    },
+    cache=CachePolicy(ttl=int(os.getenv("CACHE_TTL_TABLE_SCHEMA", "300")))
+)
+
+server.add_tool(
+    name="get_kpis",
+    func="tools.data_tools:get_kpis",
+    description="Retourne les KPI d'enrichissement pré-agrégés (taux de remplissage, confiance, succès par champ/source/jour/fichier)",
+    parameters={
+        "dimension": {"type": "string", "description": "Axe d'agrégation : file, field, source ou day", "default": "field"},
+        "file_id": {"type": "integer", "description": "Filtre sur un fichier (optionnel)"},
+        "field_name": {"type": "string", "description": "Filtre sur un champ (optionnel)"},
+        "since": {"type": "string", "description": "Date de début AAAA-MM-JJ (optionnel)"},
+        "limit": {"type": "integer", "description": "Nombre maximum de lignes", "default": 100}
     }
 )
 
 server.add_tool(
     name="search_web",
-    func=search_web,
+    func="tools.scraping_tools:search_web",
     description="Recherche des informations sur le web",
     parameters={
         "query": {"type": "string", "description": "Terme de recherche"},
         "max_results": {"type": "integer", "description": "Nombre maximum de résultats", "default": 5}
-    }
+    },
+    cache=CachePolicy(ttl=int(os.getenv("CACHE_TTL_SEARCH_WEB", "3600")))
 )
 
 server.add_tool(
     name="scrape_url",
-    func=scrape_url,
+    func="tools.scraping_tools:scrape_url",
     description="Scrape le contenu d'une URL spécifique",
     parameters={
         "url": {"type": "string", "description": "URL à scraper"},
@@ -183,6 +559,38 @@ server.add_tool(
     }
 )
 
+server.add_tool(
+    name="crawl_site",
+    func="tools.crawler:crawl_site",
+    description="Explore un site d'entreprise (pages contact et mentions légales en priorité) jusqu'à trouver les champs demandés",
+    parameters={
+        "url": {"type": "string", "description": "Page d'accueil du site"},
+        "extract_fields": {"type": "array", "description": "Champs à trouver : email, telephone, adresse, code_postal, siret, siren (défaut : email et téléphone)"},
+        "max_pages": {"type": "integer", "description": "Nombre maximum de pages téléchargées", "default": 10},
+        "max_depth": {"type": "integer", "description": "Profondeur maximale depuis la page d'accueil", "default": 2}
+    }
+)
+
+# Métriques lues à chaque scrape : pool de connexions, caches, latence du scraping par hôte
+# (complétées à l'initialisation des modules d'outils concernés)
+register_server_state(get_engine=lambda: None, cache_stats={"tool_results": server.result_cache.get_stats})
+
+
+def init_data_tools(module):
+    """Connexion à la base dans le thread de chargement, puis métriques du pool et du cache SQL"""
+    module.db_manager.connect()
+    register_server_state(
+        get_engine=lambda: module.db_manager.engine,
+        cache_stats={
+            "tool_results": server.result_cache.get_stats,
+            "sql_analysis": module.db_manager.sql_analyzer.get_cache_stats
+        }
+    )
+
+
+on_module_load("tools.data_tools", init_data_tools)
+on_module_load("tools.scraping_tools", lambda module: module.scraper.add_request_listener(observe_scraper_request))
+
 # Application FastAPI
 app = server.app
 
@@ -193,6 +601,7 @@ async def health_check():
 
 # Point d'entrée principal
 if __name__ == "__main__":
+    import tempfile
     import uvicorn
     
     logger.info(f"Starting {server.name} v{server.version}")
@@ -200,10 +609,29 @@ if __name__ == "__main__":
     for tool_name in server.tools.keys():
         logger.info(f"  - {tool_name}")
     
+    # MCP_WORKERS > 1 : mode production, un processus par cœur avec état partagé
+    workers = int(os.getenv("MCP_WORKERS", "1"))
+    if workers > 1:
+        backend = os.getenv("MCP_STATE_BACKEND", "local").lower()
+        if backend == "local":
+            logger.warning("MCP_STATE_BACKEND=local cannot be shared between workers, using sqlite")
+            backend = os.environ["MCP_STATE_BACKEND"] = "sqlite"
+        if backend == "sqlite":
+            remove_sqlite_state()
+        # Variables héritées par les workers, lues avant l'import de prometheus_client
+        os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="mcp_metrics_"))
+        logger.info(f"Starting {workers} workers (shared state: {backend})")
+    
+    # Rechargement automatique réservé au développement (MCP_RELOAD, par défaut actif si ENVIRONMENT=development)
+    default_reload = "true" if os.getenv("ENVIRONMENT", "").lower() == "development" else "false"
+    reload = workers == 1 and (os.getenv("MCP_RELOAD") or default_reload).lower() in ("1", "true", "yes")
+    
     uvicorn.run(
         "server:app",
-        host="0.0.0.0",
-        port=8080,
-        reload=True,
-        log_level="info"
+        host=os.getenv("MCP_SERVER_HOST", "0.0.0.0"),
+        port=int(os.getenv("MCP_SERVER_PORT", "8080")),
+        workers=workers,
+        reload=reload,
+        log_level="info",
+        log_config=None  # Journalisation configurée par config/logging.json
     )
\ No newline at end of file
@@ -0,0 +1,380 @@
+"""
+État partagé entre les workers du serveur MCP
+Cache des résultats, verrous d'appels en cours, compteurs et créneaux de limitation de fréquence
+
+Backends (MCP_STATE_BACKEND) :
+    local  : mémoire du processus (un seul worker)
+    sqlite : fichier SQLite en mémoire partagée (/dev/shm), pour plusieurs workers sur une même machine
+    redis  : Redis (REDIS_HOST, REDIS_PORT, REDIS_DB), pour plusieurs workers ou plusieurs machines
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Préfixe des clés Redis du serveur
+KEY_PREFIX = "mcp:"
+
+# Absence de valeur en cache (None est un résultat valide)
+MISSING = object()
+
+
+def _lock_token() -> str:
+    """Jeton du détenteur d'un verrou : seul celui qui l'a obtenu peut le libérer"""
+    return f"{os.getpid()}:{uuid.uuid4().hex}"
+
+
+class LocalState:
+    """État en mémoire du processus : comportement d'un serveur à un seul worker"""
+
+    backend = "local"
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._caches: Dict[str, "OrderedDict[str, tuple]"] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._locks: Dict[str, tuple] = {}
+        self._slots: Dict[str, float] = {}
+
+    def cache_get(self, namespace: str, key: str) -> Any:
+        with self._lock:
+            entries = self._caches.get(namespace, {})
+            cached = entries.get(key)
+            if cached is None:
+                return MISSING
+            expires_at, value = cached
+            if expires_at <= time.monotonic():
+                del entries[key]
+                return MISSING
+            return value
+
+    def cache_set(self, namespace: str, key: str, value: Any, ttl: float, max_entries: int):
+        with self._lock:
+            entries = self._caches.setdefault(namespace, OrderedDict())
+            entries[key] = (time.monotonic() + ttl, value)
+            entries.move_to_end(key)
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+
+    def cache_clear(self, namespace: str) -> int:
+        with self._lock:
+            entries = self._caches.get(namespace, {})
+            removed = len(entries)
+            entries.clear()
+            return removed
+
+    def cache_size(self, namespace: str) -> int:
+        return len(self._caches.get(namespace, {}))
+
+    def incr(self, namespace: str, field: str, amount: int = 1):
+        with self._lock:
+            counters = self._counters.setdefault(namespace, {})
+            counters[field] = counters.get(field, 0) + amount
+
+    def counters(self, namespace: str) -> Dict[str, int]:
+        return dict(self._counters.get(namespace, {}))
+
+    def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        """Jeton du verrou obtenu, None si un autre appel le détient"""
+        with self._lock:
+            if self._locks.get(name, (0, None))[0] > time.monotonic():
+                return None
+            token = _lock_token()
+            self._locks[name] = (time.monotonic() + ttl, token)
+            return token
+
+    def release_lock(self, name: str, token: str):
+        """Libère le verrou s'il est toujours détenu avec ce jeton (expiré puis repris : conservé)"""
+        with self._lock:
+            if self._locks.get(name, (0, None))[1] == token:
+                del self._locks[name]
+
+    def is_locked(self, name: str) -> bool:
+        return self._locks.get(name, (0, None))[0] > time.monotonic()
+
+    def reserve_slot(self, name: str, interval: float) -> float:
+        """Réserve le prochain créneau espacé d'au moins `interval` secondes, retourne l'attente"""
+        with self._lock:
+            now = time.monotonic()
+            scheduled = max(now, self._slots.get(name, 0) + interval)
+            self._slots[name] = scheduled
+            return scheduled - now
+
+
+class SQLiteState:
+    """
+    État partagé par les processus d'une machine dans un fichier SQLite
+    (placé dans /dev/shm s'il existe : aucune écriture disque)
+    """
+
+    backend = "sqlite"
+    shared = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache (
+            namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB, expires_at REAL, created_at REAL,
+            PRIMARY KEY (namespace, key)
+        );
+        CREATE TABLE IF NOT EXISTS counters (
+            namespace TEXT NOT NULL, field TEXT NOT NULL, value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (namespace, field)
+        );
+        CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, expires_at REAL, owner TEXT);
+        CREATE TABLE IF NOT EXISTS slots (name TEXT PRIMARY KEY, scheduled REAL);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+            # Fichier d'état créé par une version sans détenteur des verrous
+            if "owner" not in [row[1] for row in conn.execute("PRAGMA table_info(locks)")]:
+                conn.execute("ALTER TABLE locks ADD COLUMN owner TEXT")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Une connexion par thread (mode autocommit, transactions explicites)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def cache_get(self, namespace: str, key: str) -> Any:
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else MISSING
+
+    def cache_set(self, namespace: str, key: str, value: Any, ttl: float, max_entries: int):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now + ttl, now)
+            )
+            # Entrées expirées puis plus anciennes au-delà de max_entries
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (namespace, now))
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache WHERE namespace = ? ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (namespace, namespace, max_entries)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def cache_clear(self, namespace: str) -> int:
+        return self._connection().execute("DELETE FROM cache WHERE namespace = ?", (namespace,)).rowcount
+
+    def cache_size(self, namespace: str) -> int:
+        return self._connection().execute(
+            "SELECT count(*) FROM cache WHERE namespace = ? AND expires_at > ?", (namespace, time.time())
+        ).fetchone()[0]
+
+    def incr(self, namespace: str, field: str, amount: int = 1):
+        self._connection().execute(
+            "INSERT INTO counters (namespace, field, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (namespace, field) DO UPDATE SET value = value + excluded.value",
+            (namespace, field, amount)
+        )
+
+    def counters(self, namespace: str) -> Dict[str, int]:
+        rows = self._connection().execute("SELECT field, value FROM counters WHERE namespace = ?", (namespace,))
+        return dict(rows.fetchall())
+
+    def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        now = time.time()
+        token = _lock_token()
+        cursor = self._connection().execute(
+            "INSERT INTO locks (name, expires_at, owner) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET expires_at = excluded.expires_at, owner = excluded.owner "
+            "WHERE locks.expires_at <= ?",
+            (name, now + ttl, token, now)
+        )
+        return token if cursor.rowcount == 1 else None
+
+    def release_lock(self, name: str, token: str):
+        self._connection().execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, token))
+
+    def is_locked(self, name: str) -> bool:
+        return self._connection().execute(
+            "SELECT 1 FROM locks WHERE name = ? AND expires_at > ?", (name, time.time())
+        ).fetchone() is not None
+
+    def reserve_slot(self, name: str, interval: float) -> float:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT scheduled FROM slots WHERE name = ?", (name,)).fetchone()
+            scheduled = max(now, (row[0] if row else 0) + interval)
+            conn.execute("INSERT OR REPLACE INTO slots (name, scheduled) VALUES (?, ?)", (name, scheduled))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return scheduled - now
+
+
+class RedisState:
+    """État partagé dans Redis (entrées de cache indexées par un ensemble trié pour la limite de taille)"""
+
+    backend = "redis"
+    shared = True
+
+    # Créneau réservé avec l'horloge de Redis (indépendant de l'horloge des workers)
+    RESERVE_SLOT_SCRIPT = """
+        local time = redis.call('TIME')
+        local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+        local interval = tonumber(ARGV[1])
+        local scheduled = math.max(now, tonumber(redis.call('GET', KEYS[1]) or '0') + interval)
+        redis.call('SET', KEYS[1], tostring(scheduled), 'PX', math.ceil((scheduled - now + interval) * 1000) + 1000)
+        return tostring(scheduled - now)
+    """
+    # Suppression du verrou par son seul détenteur (comparaison et suppression atomiques)
+    RELEASE_LOCK_SCRIPT = """
+        if redis.call('GET', KEYS[1]) == ARGV[1] then
+            return redis.call('DEL', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._reserve_slot = client.register_script(self.RESERVE_SLOT_SCRIPT)
+        self._release_lock = client.register_script(self.RELEASE_LOCK_SCRIPT)
+
+    @staticmethod
+    def _key(*parts: str) -> str:
+        return KEY_PREFIX + ":".join(parts)
+
+    def cache_get(self, namespace: str, key: str) -> Any:
+        value = self.client.get(self._key("cache", namespace, key))
+        return pickle.loads(value) if value is not None else MISSING
+
+    def cache_set(self, namespace: str, key: str, value: Any, ttl: float, max_entries: int):
+        index = self._key("cache-index", namespace)
+        pipeline = self.client.pipeline()
+        pipeline.set(self._key("cache", namespace, key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                     px=max(int(ttl * 1000), 1))
+        pipeline.zadd(index, {key: time.time()})
+        pipeline.zrange(index, 0, -max_entries - 1)
+        evicted = pipeline.execute()[-1]
+        if evicted:
+            keys = [key.decode() if isinstance(key, bytes) else key for key in evicted]
+            pipeline.delete(*(self._key("cache", namespace, key) for key in keys))
+            pipeline.zrem(index, *keys)
+            pipeline.execute()
+
+    def cache_clear(self, namespace: str) -> int:
+        index = self._key("cache-index", namespace)
+        keys = [key.decode() if isinstance(key, bytes) else key for key in self.client.zrange(index, 0, -1)]
+        removed = self.client.delete(*(self._key("cache", namespace, key) for key in keys)) if keys else 0
+        self.client.delete(index)
+        return removed
+
+    def cache_size(self, namespace: str) -> int:
+        # L'index conserve les clés expirées jusqu'à leur éviction : taille approximative
+        return self.client.zcard(self._key("cache-index", namespace))
+
+    def incr(self, namespace: str, field: str, amount: int = 1):
+        self.client.hincrby(self._key("counters", namespace), field, amount)
+
+    def counters(self, namespace: str) -> Dict[str, int]:
+        return {
+            (field.decode() if isinstance(field, bytes) else field): int(value)
+            for field, value in self.client.hgetall(self._key("counters", namespace)).items()
+        }
+
+    def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        token = _lock_token()
+        acquired = self.client.set(self._key("lock", name), token, nx=True, px=max(int(ttl * 1000), 1))
+        return token if acquired else None
+
+    def release_lock(self, name: str, token: str):
+        self._release_lock(keys=[self._key("lock", name)], args=[token])
+
+    def is_locked(self, name: str) -> bool:
+        return bool(self.client.exists(self._key("lock", name)))
+
+    def reserve_slot(self, name: str, interval: float) -> float:
+        return float(self._reserve_slot(keys=[self._key("slot", name)], args=[interval]))
+
+
+def _default_sqlite_path() -> str:
+    directory = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+    return str(directory / "mg_mcp_state.sqlite")
+
+
+def remove_sqlite_state(path: Optional[str] = None):
+    """Supprime le fichier d'état SQLite (démarrage d'un nouveau groupe de workers)"""
+    path = path or os.getenv("MCP_STATE_PATH") or _default_sqlite_path()
+    for suffix in ("", "-wal", "-shm"):
+        Path(path + suffix).unlink(missing_ok=True)
+
+
+def create_state(backend: Optional[str] = None):
+    """
+    Crée le backend configuré (MCP_STATE_BACKEND)
+    Redis indisponible : repli sur SQLite, qui reste partagé entre les workers d'une même machine
+    """
+    backend = (backend or os.getenv("MCP_STATE_BACKEND", "local")).lower()
+
+    if backend == "redis":
+        try:
+            import redis
+
+            client = redis.Redis(
+                host=os.getenv("REDIS_HOST", "localhost"),
+                port=int(os.getenv("REDIS_PORT", "6379")),
+                db=int(os.getenv("REDIS_DB", "0")),
+                socket_timeout=2,
+                socket_connect_timeout=2
+            )
+            client.ping()
+            logger.info("Shared state backend: redis")
+            return RedisState(client)
+        except Exception as e:
+            logger.warning(f"Redis unavailable ({str(e)}), falling back to sqlite shared state")
+            backend = "sqlite"
+
+    if backend == "sqlite":
+        path = os.getenv("MCP_STATE_PATH") or _default_sqlite_path()
+        logger.info(f"Shared state backend: sqlite ({path})")
+        return SQLiteState(path)
+
+    if backend != "local":
+        logger.warning(f"Unknown state backend '{backend}', using local state")
+    return LocalState()
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_state():
+    """État partagé du processus (créé au premier accès)"""
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                _state = create_state()
+    return _state
@@ -0,0 +1,203 @@
+"""
+Mémoïsation des résultats d'outils idempotents
+Cache partagé par le serveur MCP avec TTL, clé personnalisable et déduplication des appels concurrents
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from shared_state import MISSING, LocalState
+
+logger = logging.getLogger(__name__)
+
+
+class CachePolicy:
+    """Politique de mise en cache d'un outil"""
+
+    def __init__(self, ttl: float = 300, key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 invalidated_by: Iterable[str] = (), max_entries: int = 256):
+        """
+        Args:
+            ttl: Durée de validité d'un résultat en secondes
+            key: Fonction calculant la clé de cache à partir des arguments (défaut : arguments tels quels)
+            invalidated_by: Outils dont un appel réussi vide le cache de cet outil
+            max_entries: Nombre maximum de résultats conservés
+        """
+        self.ttl = ttl
+        self.key = key
+        self.invalidated_by = set(invalidated_by)
+        self.max_entries = max_entries
+
+
+def file_state_key(arguments: Dict[str, Any]) -> Any:
+    """Clé incluant la taille et la date de modification du fichier (résultat invalidé si le fichier change)"""
+    file_path = arguments.get("file_path", "")
+    try:
+        stat = Path(file_path).stat()
+        state = (stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        state = None
+    return {**arguments, "file_path": str(Path(file_path).resolve()) if file_path else file_path, "_state": state}
+
+
+def is_error_result(result: Any) -> bool:
+    """Les outils signalent leurs erreurs par un dict avec success=False ou une clé error"""
+    return isinstance(result, dict) and (result.get("success") is False or "error" in result)
+
+
+def is_cacheable(result: Any) -> bool:
+    """Les résultats d'erreur ne sont pas mis en cache"""
+    return not is_error_result(result)
+
+
+class ToolResultCache:
+    """
+    Cache des résultats par outil avec appels concurrents identiques regroupés (single-flight)
+    Avec un état partagé (plusieurs workers), les entrées, compteurs et appels en cours sont communs aux workers
+    """
+
+    # Attente maximale d'un appel identique exécuté par un autre worker, intervalle de consultation
+    REMOTE_WAIT_TIMEOUT = 120.0
+    REMOTE_POLL_INTERVAL = 0.05
+
+    def __init__(self, state=None):
+        self.state = state or LocalState()
+        self.policies: Dict[str, CachePolicy] = {}
+        self.in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def register(self, tool_name: str, policy: CachePolicy):
+        """Active la mise en cache pour un outil"""
+        self.policies[tool_name] = policy
+
+    def is_enabled(self, tool_name: str) -> bool:
+        return tool_name in self.policies
+
+    def make_key(self, tool_name: str, arguments: Dict[str, Any]) -> str:
+        """Empreinte des arguments (ou de la clé calculée par la politique)"""
+        policy = self.policies[tool_name]
+        material = policy.key(arguments) if policy.key else arguments
+        payload = json.dumps(material, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get_or_compute(self, tool_name: str, arguments: Dict[str, Any],
+                             compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Retourne le résultat en cache, attend un appel identique en cours ou exécute l'outil"""
+        policy = self.policies[tool_name]
+        key = self.make_key(tool_name, arguments)
+
+        cached = await self._state_call(self.state.cache_get, tool_name, key)
+        if cached is not MISSING:
+            await self._state_call(self.state.incr, tool_name, "hits")
+            return cached
+
+        flight_key = (tool_name, key)
+        pending = self.in_flight.get(flight_key)
+        if pending is not None:
+            await self._state_call(self.state.incr, tool_name, "coalesced")
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[flight_key] = future
+        try:
+            result = await self._compute_once(tool_name, key, policy, compute)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Exception consommée ici si aucun appel concurrent ne l'attend
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self.in_flight.pop(flight_key, None)
+
+    async def _compute_once(self, tool_name: str, key: str, policy: CachePolicy,
+                            compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Exécute l'outil, ou attend le résultat d'un appel identique en cours dans un autre worker"""
+        lock_name = f"{tool_name}:{key}"
+        token = None
+        if self.state.shared:
+            token = await self._state_call(self.state.acquire_lock, lock_name, self.REMOTE_WAIT_TIMEOUT)
+            if token is None:
+                deadline = time.monotonic() + self.REMOTE_WAIT_TIMEOUT
+                while (await self._state_call(self.state.is_locked, lock_name)) and time.monotonic() < deadline:
+                    await asyncio.sleep(self.REMOTE_POLL_INTERVAL)
+                cached = await self._state_call(self.state.cache_get, tool_name, key)
+                if cached is not MISSING:
+                    await self._state_call(self.state.incr, tool_name, "coalesced")
+                    return cached
+                # Appel distant en échec ou expiré : exécution locale, sans le verrou (détenu par un autre worker
+                # ou repris par le prochain appel)
+
+        await self._state_call(self.state.incr, tool_name, "misses")
+        try:
+            result = await compute()
+            if is_cacheable(result):
+                await self._state_call(self.state.cache_set, tool_name, key, result, policy.ttl, policy.max_entries)
+            return result
+        finally:
+            if token is not None:
+                await self._state_call(self.state.release_lock, lock_name, token)
+
+    async def _state_call(self, method: Callable, *args) -> Any:
+        """Appel à l'état, hors de la boucle d'événements pour les backends partagés (SQLite, Redis)"""
+        if not self.state.shared:
+            return method(*args)
+        return await run_in_threadpool(method, *args)
+
+    def notify_success(self, tool_name: str, result: Any):
+        """Vide le cache des outils invalidés par un appel réussi de tool_name"""
+        if not is_cacheable(result):
+            return
+        for cached_tool, policy in self.policies.items():
+            if tool_name in policy.invalidated_by:
+                self.invalidate(cached_tool)
+
+    def invalidate(self, tool_name: Optional[str] = None) -> int:
+        """Vide le cache d'un outil (ou de tous) et retourne le nombre d'entrées supprimées"""
+        tool_names = [tool_name] if tool_name else list(self.policies)
+        removed = 0
+        for name in tool_names:
+            if name not in self.policies:
+                continue
+            count = self.state.cache_clear(name)
+            if count:
+                removed += count
+                self.state.incr(name, "invalidations")
+        if removed:
+            logger.info(f"Invalidated {removed} cached result(s) for {tool_name or 'all tools'}")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Compteurs de succès/échecs du cache par outil (tous workers confondus avec un état partagé)"""
+        tools = {}
+        for name, policy in self.policies.items():
+            counters = self.state.counters(name)
+            stats = {field: counters.get(field, 0) for field in ("hits", "misses", "coalesced", "invalidations")}
+            lookups = stats["hits"] + stats["coalesced"] + stats["misses"]
+            tools[name] = {
+                **stats,
+                "entries": self.state.cache_size(name),
+                "ttl": policy.ttl,
+                "hit_ratio": round((stats["hits"] + stats["coalesced"]) / lookups, 4) if lookups else 0.0
+            }
+
+        hits = sum(stats["hits"] + stats["coalesced"] for stats in tools.values())
+        misses = sum(stats["misses"] for stats in tools.values())
+        return {
+            "backend": self.state.backend,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "tools": tools
+        }
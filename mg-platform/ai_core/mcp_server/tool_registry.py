@@ -0,0 +1,82 @@
+"""
+Chargement différé des outils du serveur MCP
+Un outil est décrit par ses métadonnées et une référence 'module:fonction' ; le module n'est importé
+(et initialisé) qu'au premier appel ou lors du préchargement en arrière-plan
+"""
+
+import importlib
+import logging
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Union
+
+logger = logging.getLogger(__name__)
+
+# Initialisations exécutées une fois par module d'outils, après son import
+_initializers: Dict[str, List[Callable]] = {}
+_initialized_modules = set()
+_initializers_lock = threading.RLock()
+
+
+def on_module_load(module_name: str, initializer: Callable):
+    """Enregistre une initialisation (connexion, listeners, métriques) à exécuter après l'import du module"""
+    with _initializers_lock:
+        _initializers.setdefault(module_name, []).append(initializer)
+    run_initializers()
+
+
+def run_initializers():
+    """Initialise les modules importés depuis le dernier appel (y compris importés indirectement)"""
+    with _initializers_lock:
+        for module_name, initializers in _initializers.items():
+            module = sys.modules.get(module_name)
+            if module is None or module_name in _initialized_modules:
+                continue
+            # Import en cours dans un autre thread : initialisé par ce thread une fois l'import terminé
+            if getattr(getattr(module, "__spec__", None), "_initializing", False):
+                continue
+            _initialized_modules.add(module_name)
+            for initializer in initializers:
+                try:
+                    initializer(module)
+                except Exception as e:
+                    logger.error(f"Initialization of {module_name} failed: {str(e)}")
+
+
+class LazyTool:
+    """Fonction d'un outil résolue au premier appel (import sûr entre threads)"""
+
+    def __init__(self, target: Union[str, Callable]):
+        """
+        Args:
+            target: Référence 'module:fonction' ou fonction déjà importée
+        """
+        if callable(target):
+            self.target = f"{target.__module__}:{target.__qualname__}"
+            self._func = target
+        else:
+            if ":" not in target:
+                raise ValueError(f"Invalid tool reference '{target}' (expected 'module:function')")
+            self.target = target
+            self._func = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._func is not None
+
+    def load(self) -> Callable:
+        """Importe le module de l'outil et exécute ses initialisations (bloquant)"""
+        if self._func is not None:
+            return self._func
+
+        with self._lock:
+            if self._func is None:
+                module_name, _, attribute = self.target.partition(":")
+                start = time.perf_counter()
+                module = importlib.import_module(module_name)
+                run_initializers()
+                self._func = getattr(module, attribute)
+                logger.info(f"Tool {self.target} loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return self._func
@@ -0,0 +1,211 @@
+"""
+Index des lignes d'une version de fichier par empreinte
+Chaque ligne est identifiée par l'empreinte de sa clé (SIRET, identifiant...) et résumée par l'empreinte de
+l'ensemble de ses valeurs : deux livraisons d'un même jeu de données sont comparées en temps linéaire
+(lignes ajoutées, supprimées, modifiées) sans relire l'ancienne version
+
+L'index est enregistré à côté du fichier (.<nom>.rowindex.arrow) : après remplacement du fichier par une nouvelle
+livraison, il décrit encore la version précédente
+"""
+
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.util import hash_pandas_object
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+from observability.profiling import stage
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+INDEX_METADATA_KEY = b"mg_row_index"
+
+# Colonnes candidates comme clé quand aucune n'est indiquée (valeurs uniques et renseignées)
+KEY_COLUMN_PATTERN = re.compile(r"siret|siren|^id$|^id_|_id$|identifiant|^code$|^ref", re.IGNORECASE)
+
+
+def index_path(file_path: str) -> Path:
+    path = Path(file_path)
+    return path.parent / f".{path.name}.rowindex.arrow"
+
+
+def file_version(file_path: str) -> Dict[str, int]:
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def detect_key_columns(df: pd.DataFrame) -> List[str]:
+    """Première colonne au nom d'identifiant dont les valeurs sont uniques et renseignées"""
+    candidates = [column for column in df.columns if KEY_COLUMN_PATTERN.search(str(column))]
+    for column in candidates:
+        series = df[column]
+        if series.notna().all() and series.is_unique:
+            return [str(column)]
+    raise ValueError(f"No unique key column found among {candidates or 'identifier-like columns'}, "
+                     f"specify key_columns")
+
+
+def _hashable(series: pd.Series) -> pd.Series:
+    """
+    Représentation commune aux deux versions : les entiers de largeurs différentes, le texte catégoriel ou Arrow
+    ont déjà la même empreinte, seules les dates changent selon leur résolution
+    """
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.astype("datetime64[ns]")
+    return series
+
+
+def _key_hashes(keys: pd.DataFrame) -> Tuple[np.ndarray, int]:
+    """Empreintes des clés et nombre de lignes dont la clé est répétée"""
+    hashes = hash_pandas_object(keys.apply(_hashable), index=False).to_numpy()
+    occurrence = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+    duplicates = int(np.count_nonzero(occurrence))
+    if duplicates:
+        # Clés répétées : nième occurrence d'une clé associée à la nième occurrence dans l'autre version
+        hashes = hash_pandas_object(pd.DataFrame({"key": hashes, "occurrence": occurrence}), index=False).to_numpy()
+    return hashes, duplicates
+
+
+def _key_labels(keys: pd.DataFrame) -> pd.Series:
+    labels = None
+    for column in keys.columns:
+        values = keys[column].astype(str).where(keys[column].notna(), "")
+        labels = values if labels is None else labels + "|" + values
+    return labels.astype(object)
+
+
+class RowIndex:
+    """Empreintes de clé et de contenu des lignes d'une version de fichier"""
+
+    def __init__(self, keys: np.ndarray, key_hashes: np.ndarray, row_hashes: np.ndarray, metadata: Dict[str, Any]):
+        self.keys = keys
+        self.key_hashes = key_hashes
+        self.row_hashes = row_hashes
+        self.metadata = metadata
+
+    def __len__(self) -> int:
+        return len(self.key_hashes)
+
+    @property
+    def key_columns(self) -> List[str]:
+        return self.metadata["key_columns"]
+
+    @property
+    def columns(self) -> List[str]:
+        return self.metadata["columns"]
+
+    @classmethod
+    @stage("row_hash")
+    def build(cls, df: pd.DataFrame, key_columns: List[str], version: Dict[str, int],
+              key_detected: bool = False) -> "RowIndex":
+        """
+        Index d'un DataFrame (colonnes triées par nom : un changement d'ordre ne modifie pas les empreintes)
+
+        Args:
+            key_detected: Clé choisie par detect_key_columns (index réutilisable quand aucune clé n'est indiquée)
+        """
+        missing = [column for column in key_columns if column not in df.columns]
+        if missing:
+            raise ValueError(f"Key columns not found: {missing}")
+
+        columns = sorted(str(column) for column in df.columns)
+        frame = df.rename(columns=str)
+        row_hashes = hash_pandas_object(frame[columns].apply(_hashable), index=False).to_numpy()
+        keys = frame[key_columns]
+        key_hashes, duplicates = _key_hashes(keys)
+        metadata = {
+            "version": INDEX_VERSION,
+            "key_columns": list(key_columns),
+            "key_detected": key_detected,
+            "columns": columns,
+            "duplicate_keys": duplicates,
+            "source": version,
+            "indexed_at": datetime.now().isoformat()
+        }
+        return cls(_key_labels(keys).to_numpy(), key_hashes, row_hashes, metadata)
+
+    def is_current(self, version: Dict[str, int]) -> bool:
+        return self.metadata.get("version") == INDEX_VERSION and self.metadata.get("source") == version
+
+    def save(self, path: Path) -> bool:
+        """Écriture atomique (False si pyarrow est absent ou le répertoire non accessible en écriture)"""
+        if pa is None:
+            return False
+        table = pa.table({
+            "key": pa.array(self.keys, type=pa.string()),
+            "key_hash": self.key_hashes,
+            "row_hash": self.row_hashes
+        }).replace_schema_metadata({INDEX_METADATA_KEY: json.dumps(self.metadata).encode("utf-8")})
+
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with pa.OSFile(str(temporary), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(temporary, path)
+            return True
+        except (OSError, pa.ArrowException) as e:
+            Path(temporary).unlink(missing_ok=True)
+            logger.warning(f"Row index {path} not saved: {str(e)}")
+            return False
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["RowIndex"]:
+        if pa is None:
+            return None
+        try:
+            with pa.OSFile(str(path), "rb") as source:
+                table = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return None
+
+        metadata = json.loads((table.schema.metadata or {}).get(INDEX_METADATA_KEY, b"{}"))
+        return cls(
+            table.column("key").to_numpy(zero_copy_only=False),
+            table.column("key_hash").to_numpy(),
+            table.column("row_hash").to_numpy(),
+            metadata
+        )
+
+
+@stage("row_diff")
+def diff_indexes(previous: RowIndex, current: RowIndex) -> Dict[str, Any]:
+    """
+    Lignes ajoutées, supprimées et modifiées entre deux versions (correspondance par table de hachage des clés)
+
+    Returns:
+        Dict avec les positions des lignes (inserted et modified dans la version courante, deleted dans la
+        précédente), le nombre de lignes inchangées et les colonnes ajoutées ou supprimées
+    """
+    if previous.key_columns != current.key_columns:
+        raise ValueError(f"Versions indexed on different keys: {previous.key_columns} and {current.key_columns}")
+
+    matches = pd.Index(previous.key_hashes).get_indexer(current.key_hashes)
+    matched = matches >= 0
+    current_positions = np.flatnonzero(matched)
+    changed = previous.row_hashes[matches[matched]] != current.row_hashes[matched]
+
+    kept = np.zeros(len(previous), dtype=bool)
+    kept[matches[matched]] = True
+
+    return {
+        "inserted": np.flatnonzero(~matched),
+        "deleted": np.flatnonzero(~kept),
+        "modified": current_positions[changed],
+        "unchanged": int(len(current_positions) - np.count_nonzero(changed)),
+        "columns_added": [column for column in current.columns if column not in previous.columns],
+        "columns_removed": [column for column in previous.columns if column not in current.columns]
+    }
@@ -0,0 +1,238 @@
+"""
+Statistiques de colonnes fusionnables
+Calculées sur un bloc de lignes puis combinées avec celles des blocs suivants : un fichier complété en fin
+(livraisons quotidiennes) n'est analysé que sur les lignes ajoutées
+
+Valeurs distinctes comptées exactement jusqu'à EXACT_DISTINCT_LIMIT, estimées au-delà (HyperLogLog)
+Type de contenu déterminé sur le premier bloc et imposé aux suivants (valeurs invalides additionnées)
+"""
+
+import base64
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.util import hash_pandas_object
+
+from .validators import validator
+
+# Valeurs distinctes conservées avec leur nombre d'occurrences
+EXACT_DISTINCT_LIMIT = 1000
+# Valeurs les plus fréquentes conservées au-delà de cette limite
+TOP_VALUES = 20
+# 2^12 registres : erreur type de l'estimation d'environ 1,6 %
+HLL_PRECISION = 12
+SAMPLE_SIZE = 3
+
+
+def column_kind(series: pd.Series) -> str:
+    """Nature d'une colonne : numeric (booléens compris), date, text ou other (listes, types mélangés)"""
+    dtype = series.dtype
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "date"
+    if isinstance(dtype, pd.CategoricalDtype):
+        values = series.cat.categories
+    elif pd.api.types.is_string_dtype(dtype):
+        values = series
+    else:
+        return "other"
+    return "text" if pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty") else "other"
+
+
+def _normalized(non_null: pd.Series, kind: str) -> pd.Series:
+    """Valeurs dans une représentation commune à tous les blocs (empreintes et clés identiques)"""
+    if kind == "numeric":
+        return non_null.astype("float64")
+    if kind == "date":
+        return non_null.astype("datetime64[ns]").astype("int64")
+    return non_null.astype(str) if kind == "other" else non_null.astype(object)
+
+
+def _value_key(value: Any, kind: str) -> str:
+    if kind == "numeric":
+        return repr(float(value))
+    if kind == "date":
+        return pd.Timestamp(value).isoformat()
+    return str(value)
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    return value.item() if hasattr(value, "item") else value
+
+
+def _hll_registers(hashes: np.ndarray) -> np.ndarray:
+    """Registres HyperLogLog : rang du premier bit à 1 maximal par registre"""
+    registers = np.zeros(1 << HLL_PRECISION, dtype=np.uint8)
+    if len(hashes) == 0:
+        return registers
+
+    remaining_bits = 64 - HLL_PRECISION
+    index = (hashes >> np.uint64(remaining_bits)).astype(np.int64)
+    remainder = hashes & np.uint64((1 << remaining_bits) - 1)
+    # Moins de 2^53 : conversion en float64 exacte, log2 donne la position du bit de poids fort
+    bit_length = np.zeros(len(remainder), dtype=np.int64)
+    nonzero = remainder > 0
+    bit_length[nonzero] = np.floor(np.log2(remainder[nonzero].astype(np.float64))).astype(np.int64) + 1
+    rank = remaining_bits - bit_length + 1
+
+    maxima = pd.Series(rank).groupby(index).max()
+    registers[maxima.index.to_numpy()] = maxima.to_numpy()
+    return registers
+
+
+def _hll_estimate(registers: np.ndarray) -> int:
+    size = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / size)
+    estimate = alpha * size * size / np.sum(np.power(2.0, -registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    # Correction des petites cardinalités (comptage linéaire)
+    if estimate <= 2.5 * size and zeros:
+        estimate = size * math.log(size / zeros)
+    return int(round(estimate))
+
+
+def _encode_registers(registers: np.ndarray) -> str:
+    return base64.b64encode(registers.tobytes()).decode("ascii")
+
+
+def _decode_registers(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.uint8)
+
+
+def compute_stats(series: pd.Series, column: str = "",
+                  content_types: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Any]:
+    """
+    Statistiques d'une colonne (sérialisables en JSON)
+
+    Args:
+        content_types: Types de contenu imposés par colonne (blocs suivants), déduits des valeurs sinon
+    """
+    non_null = series.dropna()
+    kind = column_kind(non_null) if len(non_null) else "empty"
+    if content_types is not None and column in content_types:
+        content_type = content_types[column]
+    else:
+        content_type = validator.infer_type(non_null, column)
+    stats = {
+        "kind": kind,
+        "dtype": str(non_null.dtype) if len(non_null) else "unknown",
+        "count": int(len(series)),
+        "missing": int(len(series) - len(non_null)),
+        "content_type": content_type,
+        "invalid": validator.count_invalid(non_null, content_type),
+        "samples": [_json_value(value) for value in non_null.head(SAMPLE_SIZE).tolist()]
+    }
+    if kind == "empty":
+        return stats
+
+    if kind == "numeric":
+        stats["min"] = float(non_null.min())
+        stats["max"] = float(non_null.max())
+        stats["sum"] = float(non_null.astype("float64").sum())
+    elif kind == "date":
+        stats["min"] = non_null.min().isoformat()
+        stats["max"] = non_null.max().isoformat()
+
+    normalized = _normalized(non_null, kind)
+    counts = normalized.value_counts()
+    if kind == "date":
+        counts.index = pd.to_datetime(counts.index)
+    stats["distinct"] = int(len(counts))
+    top = counts.head(TOP_VALUES)
+    stats["top"] = [[_value_key(value, kind), int(count)] for value, count in top.items()]
+    stats["exact"] = (
+        {_value_key(value, kind): int(count) for value, count in counts.items()}
+        if len(counts) <= EXACT_DISTINCT_LIMIT else None
+    )
+    hashes = hash_pandas_object(normalized, index=False).to_numpy()
+    stats["hll"] = _encode_registers(_hll_registers(hashes))
+    return stats
+
+
+def _merge_counts(first: Dict[str, int], second: Dict[str, int]) -> Dict[str, int]:
+    merged = dict(first)
+    for value, count in second.items():
+        merged[value] = merged.get(value, 0) + count
+    return merged
+
+
+def merge_stats(first: Dict[str, Any], second: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Statistiques de la concaténation de deux blocs
+    None si les blocs ne sont pas de même nature (colonne devenue textuelle, dates non reconnues) :
+    l'analyse doit alors être recalculée
+    """
+    if second["kind"] == "empty":
+        return {**first, "count": first["count"] + second["count"], "missing": first["missing"] + second["missing"]}
+    if first["kind"] == "empty":
+        return {**second, "count": first["count"] + second["count"], "missing": first["missing"] + second["missing"],
+                "samples": second["samples"]}
+    if first["kind"] != second["kind"] or first["content_type"] != second["content_type"]:
+        return None
+
+    kind = first["kind"]
+    merged = {
+        "kind": kind,
+        "dtype": first["dtype"],
+        "count": first["count"] + second["count"],
+        "missing": first["missing"] + second["missing"],
+        "content_type": first["content_type"],
+        "invalid": first["invalid"] + second["invalid"],
+        "samples": (first["samples"] + second["samples"])[:SAMPLE_SIZE]
+    }
+    if kind == "numeric":
+        merged["min"] = min(first["min"], second["min"])
+        merged["max"] = max(first["max"], second["max"])
+        merged["sum"] = first["sum"] + second["sum"]
+    elif kind == "date":
+        # Dates ISO de même format : ordre lexicographique = ordre chronologique
+        merged["min"] = min(first["min"], second["min"])
+        merged["max"] = max(first["max"], second["max"])
+
+    registers = np.maximum(_decode_registers(first["hll"]), _decode_registers(second["hll"]))
+    merged["hll"] = _encode_registers(registers)
+
+    if first["exact"] is not None and second["exact"] is not None:
+        exact = _merge_counts(first["exact"], second["exact"])
+        merged["distinct"] = len(exact)
+        merged["exact"] = exact if len(exact) <= EXACT_DISTINCT_LIMIT else None
+        counts = exact
+    else:
+        merged["distinct"] = max(_hll_estimate(registers), first["distinct"], second["distinct"])
+        merged["exact"] = None
+        # Fréquences approchées : valeurs les plus fréquentes de chaque bloc
+        counts = _merge_counts(
+            first["exact"] if first["exact"] is not None else dict(first["top"]),
+            second["exact"] if second["exact"] is not None else dict(second["top"])
+        )
+    merged["top"] = [[value, count] for value, count in sorted(counts.items(), key=lambda item: -item[1])[:TOP_VALUES]]
+    return merged
+
+
+def compute_frame_stats(df: pd.DataFrame,
+                        content_types: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Dict[str, Any]]:
+    return {str(column): compute_stats(df[column], str(column), content_types) for column in df.columns}
+
+
+def merge_frame_stats(first: Dict[str, Dict[str, Any]],
+                      second: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Fusion colonne par colonne (None si les colonnes diffèrent ou si une colonne a changé de nature)"""
+    if list(first) != list(second):
+        return None
+    merged = {}
+    for column in first:
+        stats = merge_stats(first[column], second[column])
+        if stats is None:
+            return None
+        merged[column] = stats
+    return merged
+
+
+def most_common(stats: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+    top: List = stats.get("top") or []
+    return (top[0][0], top[0][1]) if top else None
@@ -0,0 +1,413 @@
+"""
+Exploration ciblée d'un site d'entreprise
+Les pages susceptibles de contenir les champs recherchés (contact, mentions légales, à propos) sont visitées en
+priorité, d'après le texte des liens et le chemin des URL ; l'exploration s'arrête dès que tous les champs sont
+trouvés ou que le budget de pages est épuisé. Le plan du site (sitemap.xml) n'est lu que si les liens de la page
+d'accueil ne mènent à aucune page prometteuse
+"""
+
+import hashlib
+import heapq
+import logging
+import math
+import re
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+import pandas as pd
+import requests
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    SITEMAP_PARSER = "xml"
+except ImportError:
+    from bs4 import XMLParsedAsHTMLWarning
+    import warnings
+    warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+    SITEMAP_PARSER = "html.parser"
+
+from observability.profiling import stage
+
+from .scraping_tools import WebScraper, scraper
+from .validators import EMAIL_PATTERN, PHONE_PATTERN, validator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PAGES = 10
+DEFAULT_MAX_DEPTH = 2
+# URL du plan du site retenues au plus, plans imbriqués (sitemap index) lus au plus
+MAX_SITEMAP_URLS = 500
+MAX_SITEMAP_FILES = 3
+
+SKIPPED_EXTENSIONS = re.compile(
+    r"\.(?:pdf|jpe?g|png|gif|svg|webp|ico|css|js|zip|rar|docx?|xlsx?|pptx?|mp[34]|avi|mov|woff2?|ttf|xml)$",
+    re.IGNORECASE
+)
+TRACKING_PARAMETERS = re.compile(r"^(?:utm_\w+|fbclid|gclid|msclkid|ref)$", re.IGNORECASE)
+
+# Mots des liens et des chemins menant aux pages utiles, par type de contenu recherché
+PAGE_KEYWORDS = {
+    "email": ["contact", "contactez", "nous contacter", "coordonnees", "nous trouver", "ecrire"],
+    "phone": ["contact", "contactez", "nous contacter", "coordonnees", "nous trouver", "appeler", "telephone"],
+    "address": ["contact", "coordonnees", "nous trouver", "acces", "plan", "adresse", "mentions legales"],
+    "postcode": ["contact", "coordonnees", "nous trouver", "acces", "mentions legales"],
+    "siret": ["mentions legales", "mentions", "legal", "cgv", "cgu", "conditions generales", "imprint"],
+    "siren": ["mentions legales", "mentions", "legal", "cgv", "cgu", "conditions generales", "imprint"]
+}
+# Pages de présentation : utiles quel que soit le champ
+GENERIC_KEYWORDS = ["a propos", "about", "qui sommes nous", "societe", "entreprise", "equipe", "presentation"]
+# Sections volumineuses rarement utiles (articles, catalogue)
+PENALIZED_KEYWORDS = ["blog", "actualite", "actualites", "news", "article", "produit", "produits", "boutique",
+                      "shop", "panier", "cart", "tag", "categorie", "category", "recherche", "search", "login"]
+
+LINK_TEXT_WEIGHT = 3.0
+URL_WEIGHT = 2.0
+GENERIC_WEIGHT = 1.0
+PENALTY_WEIGHT = 2.0
+DEPTH_WEIGHT = 0.5
+
+SIRET_CANDIDATE = re.compile(r"(?<!\d)\d{3}[ .]?\d{3}[ .]?\d{3}[ .]?\d{5}(?!\d)")
+SIREN_CANDIDATE = re.compile(r"(?:siren|rcs)[^0-9]{0,40}(\d{3}[ .]?\d{3}[ .]?\d{3})(?!\d)", re.IGNORECASE)
+POSTCODE_CANDIDATE = re.compile(r"(?<!\d)(\d{5})\s+[A-Za-zÀ-ÿ]")
+ADDRESS_CANDIDATE = re.compile(
+    r"\d{1,4}(?:\s?(?:bis|ter))?,?\s+(?:rue|avenue|av\.|boulevard|bd|place|chemin|all[ée]e|impasse|route|quai|cours)"
+    r"\s+[^,\n]{2,60}?,?\s+\d{5}\s+[A-Za-zÀ-ÿ'\- ]{2,40}",
+    re.IGNORECASE
+)
+EMAIL_CANDIDATE = re.compile(EMAIL_PATTERN)
+PHONE_CANDIDATE = re.compile(rf"(?<![\d+])(?:{PHONE_PATTERN})(?!\d)")
+
+
+class BloomFilter:
+    """Ensemble probabiliste d'URL visitées (aucun faux négatif, faux positifs au taux indiqué)"""
+
+    def __init__(self, capacity: int = 10000, error_rate: float = 0.001):
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hachage : k positions dérivées de deux empreintes de 64 bits
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """Ajoute un élément, False s'il était (probablement) déjà présent"""
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        self.count += added
+        return added
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """URL canonique (schéma et hôte en minuscules, sans fragment ni paramètres de suivi), None si non HTTP"""
+    parsed = urlparse(url.strip())
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        return None
+    netloc = parsed.netloc.lower()
+    if (parsed.scheme == "http" and netloc.endswith(":80")) or (parsed.scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = urlencode([(key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+                       if not TRACKING_PARAMETERS.match(key)])
+    return urlunparse((parsed.scheme, netloc, parsed.path or "/", "", query, ""))
+
+
+def site_host(url: str) -> str:
+    host = urlparse(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def _words(text: str) -> str:
+    """Texte sans accents, mots séparés par des espaces (mentions-legales.html -> mentions legales html)"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    return " " + re.sub(r"[^a-z0-9]+", " ", text).strip() + " "
+
+
+def _contains(words: str, keyword: str) -> bool:
+    return f" {keyword} " in words
+
+
+class FocusedCrawler:
+    """Exploration d'un site par ordre de priorité des pages, pour un ensemble de champs à trouver"""
+
+    def __init__(self, web_scraper: WebScraper, max_pages: int = DEFAULT_MAX_PAGES,
+                 max_depth: int = DEFAULT_MAX_DEPTH):
+        """
+        Args:
+            web_scraper: Scraper utilisé pour les requêtes (limite de fréquence et métriques partagées)
+            max_pages: Pages HTML téléchargées au plus par site
+            max_depth: Distance maximale (en liens) depuis la page de départ
+        """
+        self.scraper = web_scraper
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+
+    @staticmethod
+    def field_types(fields: List[str]) -> Dict[str, Optional[str]]:
+        """Type de contenu de chaque champ demandé (telephone -> phone, adresse -> address...)"""
+        types = {}
+        for field in fields:
+            name = str(field).lower()
+            types[field] = name if name in PAGE_KEYWORDS else validator.name_hint(name)
+        return types
+
+    def score(self, url: str, link_text: str, depth: int, wanted: Iterable[str]) -> float:
+        """Priorité d'une page : mots-clés des champs restant à trouver dans le lien et le chemin"""
+        path_words = _words(urlparse(url).path + " " + urlparse(url).query)
+        text_words = _words(link_text)
+        score = 0.0
+        for keyword in {keyword for content_type in wanted for keyword in PAGE_KEYWORDS.get(content_type, [])}:
+            if _contains(text_words, keyword):
+                score += LINK_TEXT_WEIGHT
+            if _contains(path_words, keyword):
+                score += URL_WEIGHT
+        if any(_contains(text_words, keyword) or _contains(path_words, keyword) for keyword in GENERIC_KEYWORDS):
+            score += GENERIC_WEIGHT
+        if any(_contains(path_words, keyword) for keyword in PENALIZED_KEYWORDS):
+            score -= PENALTY_WEIGHT
+        segments = len([segment for segment in urlparse(url).path.split("/") if segment])
+        return score - DEPTH_WEIGHT * (depth + segments)
+
+    @stage("crawl")
+    def crawl(self, start_url: str, fields: List[str]) -> Dict[str, Any]:
+        """
+        Explore un site jusqu'à trouver les champs demandés
+
+        Args:
+            start_url: Page de départ (page d'accueil du site)
+            fields: Champs à trouver (email, telephone, adresse, siret...)
+
+        Returns:
+            Dict avec la valeur et la page de chaque champ trouvé, les pages visitées et la raison de l'arrêt
+        """
+        start = normalize_url(start_url if "://" in start_url else f"https://{start_url}")
+        if start is None:
+            raise ValueError(f"Invalid URL: {start_url}")
+
+        types = self.field_types(fields)
+        unsupported = [field for field, content_type in types.items() if content_type not in PAGE_KEYWORDS]
+        remaining = {field for field in fields if field not in unsupported}
+        found: Dict[str, Dict[str, Any]] = {}
+
+        seen = BloomFilter()
+        seen.add(start)
+        frontier: List[Tuple[float, int, str, int]] = []
+        sequence = 0
+        heapq.heappush(frontier, (0.0, sequence, start, 0))
+        host = site_host(start)
+
+        pages: List[Dict[str, Any]] = []
+        sitemap = {"fetched": False, "urls": 0, "files": 0}
+        requests_made = 0
+        stop_reason = "frontier_exhausted"
+        started_at = time.perf_counter()
+        if not remaining:
+            stop_reason = "no_supported_fields"
+            frontier.clear()
+
+        while frontier:
+            if not remaining:
+                stop_reason = "fields_found"
+                break
+            if len(pages) >= self.max_pages:
+                stop_reason = "page_budget"
+                break
+
+            priority, _, url, depth = heapq.heappop(frontier)
+            page = {"url": url, "depth": depth, "priority": round(-priority, 2)}
+            pages.append(page)
+            requests_made += 1
+            try:
+                response = self.scraper.fetch(url)
+            except requests.exceptions.RequestException as e:
+                page["error"] = str(e)
+                continue
+
+            page["status"] = response.status_code
+            if depth == 0:
+                # Redirection de la page d'accueil (http -> https, domaine principal)
+                host = site_host(response.url) or host
+            if "html" not in response.headers.get("Content-Type", "text/html").lower():
+                continue
+
+            with stage("parse"):
+                soup = BeautifulSoup(response.content, "html.parser")
+            page_fields = self.extract_fields(soup, {field: types[field] for field in remaining})
+            for field, value in page_fields.items():
+                found[field] = {"value": value, "content_type": types[field], "url": url, "depth": depth}
+                remaining.discard(field)
+            page["found"] = list(page_fields)
+
+            if not remaining or depth >= self.max_depth:
+                continue
+            wanted = {types[field] for field in remaining}
+            for link_url, text in self.extract_links(soup, response.url):
+                if site_host(link_url) != host or not seen.add(link_url):
+                    continue
+                sequence += 1
+                heapq.heappush(frontier, (-self.score(link_url, text, depth + 1, wanted), sequence, link_url, depth + 1))
+
+            # Aucune page prometteuse dans les liens de la page d'accueil : pages du plan du site
+            if depth == 0 and not sitemap["fetched"] and not any(-entry[0] > 0 for entry in frontier):
+                sitemap = self._read_sitemap(response.url, host)
+                requests_made += sitemap["files"]
+                for link_url in sitemap.pop("urls_found"):
+                    if not seen.add(link_url):
+                        continue
+                    sequence += 1
+                    heapq.heappush(frontier, (-self.score(link_url, "", 1, wanted), sequence, link_url, 1))
+
+        if found and not remaining:
+            stop_reason = "fields_found"
+
+        result = {
+            "start_url": start,
+            "fields": {field: found.get(field) for field in fields},
+            "found_all": not remaining and not unsupported,
+            "missing_fields": [field for field in fields if field not in found],
+            "unsupported_fields": unsupported,
+            "stop_reason": stop_reason,
+            "pages_fetched": len(pages),
+            "requests": requests_made,
+            "pages": pages,
+            "sitemap": sitemap,
+            "frontier_remaining": len(frontier),
+            "duration_seconds": round(time.perf_counter() - started_at, 3)
+        }
+        logger.info(f"Crawled {start}: {len(pages)} pages, {len(found)}/{len(fields)} fields found ({stop_reason})")
+        return result
+
+    def _read_sitemap(self, base_url: str, host: str) -> Dict[str, Any]:
+        """URL du site listées dans /sitemap.xml (et les plans imbriqués d'un sitemap index)"""
+        sitemap = {"fetched": True, "urls": 0, "files": 0, "urls_found": []}
+        pending = [urljoin(base_url, "/sitemap.xml")]
+        while pending and sitemap["files"] < MAX_SITEMAP_FILES and len(sitemap["urls_found"]) < MAX_SITEMAP_URLS:
+            sitemap_url = pending.pop(0)
+            sitemap["files"] += 1
+            try:
+                response = self.scraper.fetch(sitemap_url)
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"No sitemap at {sitemap_url}: {str(e)}")
+                continue
+
+            soup = BeautifulSoup(response.content, SITEMAP_PARSER)
+            nested = [loc.get_text().strip() for entry in soup.find_all("sitemap") for loc in entry.find_all("loc")]
+            pending.extend(url for url in nested if site_host(url) == host)
+            for entry in soup.find_all("url"):
+                loc = entry.find("loc")
+                url = normalize_url(loc.get_text()) if loc else None
+                if url and site_host(url) == host and not SKIPPED_EXTENSIONS.search(urlparse(url).path):
+                    sitemap["urls_found"].append(url)
+        sitemap["urls_found"] = sitemap["urls_found"][:MAX_SITEMAP_URLS]
+        sitemap["urls"] = len(sitemap["urls_found"])
+        return sitemap
+
+    @staticmethod
+    def extract_links(soup: BeautifulSoup, base_url: str) -> List[Tuple[str, str]]:
+        """Liens HTTP de la page (URL canonique, texte ou title), ressources non HTML exclues"""
+        links = []
+        for link in soup.find_all("a", href=True):
+            url = normalize_url(urljoin(base_url, link["href"]))
+            if url is None or SKIPPED_EXTENSIONS.search(urlparse(url).path):
+                continue
+            links.append((url, link.get_text(" ").strip() or link.get("title", "")))
+        return links
+
+    def extract_fields(self, soup: BeautifulSoup, types: Dict[str, Optional[str]]) -> Dict[str, str]:
+        """Valeurs des champs présentes dans la page (liens mailto: et tel: d'abord, puis texte)"""
+        if not types:
+            return {}
+        hrefs = [link["href"].strip() for link in soup.find_all("a", href=True)]
+        for element in soup(["script", "style", "noscript"]):
+            element.decompose()
+        text = re.sub(r"\s+", " ", soup.get_text(" "))
+
+        values = {}
+        for field, content_type in types.items():
+            value = self._find_value(content_type, hrefs, text)
+            if value:
+                values[field] = value
+        return values
+
+    @staticmethod
+    def _find_value(content_type: str, hrefs: List[str], text: str) -> Optional[str]:
+        if content_type == "email":
+            for href in hrefs:
+                if href.lower().startswith("mailto:"):
+                    address = href[7:].split("?")[0].strip()
+                    if EMAIL_CANDIDATE.fullmatch(address):
+                        return address
+            match = EMAIL_CANDIDATE.search(text)
+            return match.group(0) if match else None
+
+        if content_type == "phone":
+            for href in hrefs:
+                if href.lower().startswith("tel:") and PHONE_CANDIDATE.fullmatch(href[4:].strip()):
+                    return href[4:].strip()
+            match = PHONE_CANDIDATE.search(text)
+            return match.group(0).strip() if match else None
+
+        if content_type in ("siret", "siren"):
+            candidates = SIRET_CANDIDATE.findall(text)
+            if content_type == "siren":
+                # SIREN cité seul (RCS) ou premiers chiffres d'un SIRET valide
+                sirets = FocusedCrawler._find_value("siret", hrefs, text)
+                candidates = SIREN_CANDIDATE.findall(text) + ([sirets[:9]] if sirets else [])
+            if not candidates:
+                return None
+            # Clé de contrôle vérifiée : les autres suites de chiffres sont écartées
+            digits = pd.Series([re.sub(r"\D", "", candidate) for candidate in candidates])
+            valid = validator.valid_mask(digits, content_type)
+            return next((value for value, ok in zip(digits, valid) if ok), None)
+
+        if content_type == "address":
+            match = ADDRESS_CANDIDATE.search(text)
+            return match.group(0).strip() if match else None
+
+        if content_type == "postcode":
+            for candidate in POSTCODE_CANDIDATE.findall(text):
+                if validator.valid_mask(pd.Series([candidate]), "postcode")[0]:
+                    return candidate
+        return None
+
+
+def crawl_site(url: str, extract_fields: Optional[List[str]] = None, max_pages: int = DEFAULT_MAX_PAGES,
+               max_depth: int = DEFAULT_MAX_DEPTH) -> Dict[str, Any]:
+    """
+    Explore un site d'entreprise pour trouver des champs (pages contact et mentions légales en priorité)
+
+    Args:
+        url: Page d'accueil du site
+        extract_fields: Champs à trouver (défaut : email et téléphone)
+        max_pages: Nombre maximum de pages téléchargées
+        max_depth: Profondeur maximale depuis la page d'accueil
+
+    Returns:
+        Dict avec les champs trouvés, leur page d'origine et les pages visitées
+    """
+    try:
+        crawler = FocusedCrawler(scraper, max_pages=max_pages, max_depth=max_depth)
+        result = crawler.crawl(url, extract_fields or ["email", "phone"])
+        result["success"] = True
+        return result
+
+    except Exception as e:
+        logger.error(f"Error crawling {url}: {str(e)}")
+        return {
+            "success": False,
+            "url": url,
+            "error": str(e)
+        }
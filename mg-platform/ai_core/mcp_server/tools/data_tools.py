@@ -4,23 +4,60 @@ Gestion des connexions PostgreSQL et exécution de requêtes
 """
 
 import os
+import io
+import csv
 import logging
+import queue
+import threading
+import time
+import atexit
 import pandas as pd
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable
 from sqlalchemy import create_engine, text, inspect
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 import json
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from .sql_analyzer import SQLAnalyzer
 
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+# Dimensions des KPI pré-agrégés et colonne de regroupement associée
+KPI_DIMENSIONS = {
+    "file": "file_id",
+    "field": "field_name",
+    "source": "source",
+    "day": "day"
+}
 
 class DatabaseManager:
     """Gestionnaire de base de données avec connexion PostgreSQL"""
     
     def __init__(self):
-        self.engine = None
+        self._engine = None
+        self._connection_attempted = False
+        self._connect_lock = threading.Lock()
+        self.sql_analyzer = SQLAnalyzer()
+        self._configure_admission()
         self.connection_string = self._build_connection_string()
-        self._connect()
+    
+    @property
+    def engine(self):
+        """Moteur SQLAlchemy, créé à la première utilisation (None si la base est indisponible)"""
+        if not self._connection_attempted:
+            self.connect()
+        return self._engine
+    
+    def connect(self):
+        """Établit la connexion une seule fois, hors import du module (sûr entre threads)"""
+        with self._connect_lock:
+            if not self._connection_attempted:
+                self._connect()
+                self._connection_attempted = True
+        return self._engine
     
     def _build_connection_string(self) -> str:
         """Construit la chaîne de connexion à partir des variables d'environnement"""
@@ -44,10 +81,27 @@ class DatabaseManager:
         
         return connection_string
     
+    def _configure_admission(self):
+        """Configure le contrôle d'admission des requêtes à partir des variables d'environnement"""
+        
+        # Durée maximale d'une requête (statement_timeout PostgreSQL)
+        self.statement_timeout_ms = int(os.getenv('SQL_STATEMENT_TIMEOUT_MS', '30000'))
+        
+        # Coût estimé (EXPLAIN) au-delà duquel une requête est refusée
+        self.max_query_cost = float(os.getenv('SQL_MAX_QUERY_COST', '5000000'))
+        
+        # Coût estimé au-delà duquel une requête est considérée lourde
+        self.heavy_query_cost = float(os.getenv('SQL_HEAVY_QUERY_COST', '100000'))
+        
+        # Nombre de requêtes lourdes simultanées et attente maximale d'un créneau
+        self.max_heavy_queries = int(os.getenv('SQL_MAX_HEAVY_QUERIES', '2'))
+        self.heavy_queue_timeout = float(os.getenv('SQL_HEAVY_QUEUE_TIMEOUT', '30'))
+        self.heavy_query_slots = threading.BoundedSemaphore(self.max_heavy_queries)
+    
     def _connect(self):
         """Établit la connexion à la base de données"""
         try:
-            self.engine = create_engine(
+            self._engine = create_engine(
                 self.connection_string,
                 pool_size=5,
                 max_overflow=10,
@@ -56,7 +110,7 @@ class DatabaseManager:
             )
             
             # Test de la connexion
-            with self.engine.connect() as conn:
+            with self._engine.connect() as conn:
                 conn.execute(text("SELECT 1"))
             
             logger.info("Database connection established successfully")
@@ -64,7 +118,7 @@ class DatabaseManager:
         except Exception as e:
             logger.warning(f"Database connection failed: {str(e)}")
             logger.info("Database operations will be simulated")
-            self.engine = None
+            self._engine = None
     
     def is_connected(self) -> bool:
         """Vérifie si la connexion à la base de données est active"""
@@ -78,74 +132,201 @@ class DatabaseManager:
         except Exception:
             return False
     
-    def execute_query(self, query: str, limit: int = 100) -> Dict[str, Any]:
-        """Exécute une requête SQL et retourne les résultats"""
+    def execute_query(self, query: str, limit: int = 100, timeout_ms: Optional[int] = None) -> Dict[str, Any]:
+        """Exécute une requête SQL et retourne les résultats (span sql.execute_query)"""
+        with tracer.start_as_current_span("sql.execute_query", kind=SpanKind.CLIENT) as span:
+            span.set_attribute("db.system", "postgresql")
+            span.set_attribute("db.statement", query[:1000])
+            
+            result = self._execute_query(query, limit, timeout_ms)
+            
+            span.set_attribute("db.row_count", result.get("row_count", 0))
+            if result.get("success") is False:
+                span.set_status(Status(StatusCode.ERROR, result.get("error")))
+            return result
+    
+    def _execute_query(self, query: str, limit: int, timeout_ms: Optional[int]) -> Dict[str, Any]:
+        # Vérification de sécurité (lecture seule) et LIMIT sur la requête externe
+        prepared = self.sql_analyzer.prepare(query, limit)
         
         if not self.is_connected():
-            return self._simulate_query_result(query, limit)
+            return self._simulate_query_result(prepared["final_query"], limit)
+        
+        query = prepared["final_query"]
+        timeout_ms = self._statement_timeout(timeout_ms)
         
         try:
-            # Vérification de sécurité basique
-            if not self._is_safe_query(query):
-                raise ValueError("Only SELECT queries are allowed")
+            admission, rejection = self._admit(query, timeout_ms)
+            if rejection:
+                return self._rejected_query(query, rejection, admission)
             
-            # Ajout automatique de LIMIT si pas présent
-            if 'LIMIT' not in query.upper() and limit > 0:
-                query = f"{query.rstrip(';')} LIMIT {limit}"
+            try:
+                start = time.perf_counter()
+                with tracer.start_as_current_span("sql.execute"), self.engine.connect() as conn, conn.begin():
+                    self._configure_transaction(conn, timeout_ms)
+                    result = conn.execute(text(query))
+                    
+                    # Conversion en format JSON-serializable
+                    if result.returns_rows:
+                        rows = [dict(row._mapping) for row in result]
+                        columns = list(result.keys()) if result.keys() else []
+                    else:
+                        rows = []
+                        columns = []
+                execution_time_ms = (time.perf_counter() - start) * 1000
+            finally:
+                if admission["heavy"]:
+                    self.heavy_query_slots.release()
             
-            with self.engine.connect() as conn:
-                result = conn.execute(text(query))
-                
-                # Conversion en format JSON-serializable
-                if result.returns_rows:
-                    rows = [dict(row._mapping) for row in result]
-                    columns = list(result.keys()) if result.keys() else []
-                else:
-                    rows = []
-                    columns = []
-                
-                return {
-                    "success": True,
-                    "query": query,
-                    "rows": rows,
-                    "columns": columns,
-                    "row_count": len(rows),
-                    "execution_time": datetime.now().isoformat()
-                }
+            return {
+                "success": True,
+                "query": query,
+                "rows": rows,
+                "columns": columns,
+                "row_count": len(rows),
+                "execution_time_ms": round(execution_time_ms, 2),
+                "admission": admission
+            }
                 
         except SQLAlchemyError as e:
-            logger.error(f"SQL execution error: {str(e)}")
+            error = str(e)
+            if "statement timeout" in error:
+                error = f"Query cancelled after {timeout_ms} ms (statement_timeout): {error}"
+            logger.error(f"SQL execution error: {error}")
             return {
                 "success": False,
-                "error": str(e),
+                "error": error,
                 "query": query,
                 "rows": [],
                 "columns": []
             }
     
-    def _is_safe_query(self, query: str) -> bool:
-        """Vérifie que la requête est sûre (lecture seule)"""
-        query_upper = query.upper().strip()
+    def stream_query(self, query: str, limit: int = 10000, page_size: int = 500,
+                     timeout_ms: Optional[int] = None):
+        """Exécute une requête et produit les résultats page par page (curseur serveur)"""
         
-        # Mots-clés interdits
-        forbidden_keywords = [
-            'INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'ALTER', 
-            'TRUNCATE', 'GRANT', 'REVOKE', 'EXEC', 'EXECUTE'
-        ]
+        prepared = self.sql_analyzer.prepare(query, limit)
+        query = prepared["final_query"]
         
-        # Vérifie que la requête commence par SELECT
-        if not query_upper.startswith('SELECT'):
-            return False
+        if not self.is_connected():
+            simulated = self._simulate_query_result(query, limit)
+            yield {"page": 0, "columns": simulated["columns"], "rows": simulated["rows"], "note": simulated["note"]}
+            return
         
-        # Vérifie l'absence de mots-clés interdits
-        for keyword in forbidden_keywords:
-            if keyword in query_upper:
-                return False
+        timeout_ms = self._statement_timeout(timeout_ms)
         
-        return True
+        admission, rejection = self._admit(query, timeout_ms)
+        if rejection:
+            raise ValueError(rejection)
+        
+        row_count = 0
+        
+        # Span non courant : chaque page est produite dans un contexte de thread différent
+        span = tracer.start_span("sql.stream_query", kind=SpanKind.CLIENT, attributes={
+            "db.system": "postgresql",
+            "db.statement": query[:1000]
+        })
+        try:
+            start = time.perf_counter()
+            
+            with self.engine.connect() as conn, conn.begin():
+                self._configure_transaction(conn, timeout_ms)
+                result = conn.execution_options(stream_results=True, max_row_buffer=page_size).execute(text(query))
+                columns = list(result.keys())
+                
+                for page, partition in enumerate(result.partitions(page_size)):
+                    rows = [dict(row._mapping) for row in partition]
+                    row_count += len(rows)
+                    yield {"page": page, "columns": columns if page == 0 else None, "rows": rows}
+            
+            yield {
+                "query": query,
+                "row_count": row_count,
+                "execution_time_ms": round((time.perf_counter() - start) * 1000, 2),
+                "admission": admission
+            }
+        except Exception as e:
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+        finally:
+            span.set_attribute("db.row_count", row_count)
+            span.end()
+            if admission["heavy"]:
+                self.heavy_query_slots.release()
+    
+    def _statement_timeout(self, timeout_ms: Optional[int]) -> int:
+        """Timeout demandé (strictement positif), plafonné par le timeout configuré"""
+        if timeout_ms is None:
+            return self.statement_timeout_ms
+        if timeout_ms <= 0:
+            raise ValueError(f"timeout_ms must be a positive number of milliseconds, got {timeout_ms}")
+        return min(int(timeout_ms), self.statement_timeout_ms)
+    
+    def _admit(self, query: str, timeout_ms: int):
+        """
+        Contrôle d'admission : estimation du coût via EXPLAIN, refus au-delà du coût
+        maximal et attente d'un créneau pour les requêtes lourdes.
+        Retourne (admission, motif de refus ou None) ; une requête lourde admise
+        détient un créneau que l'appelant doit libérer.
+        """
+        with tracer.start_as_current_span("sql.admission") as span:
+            estimated_cost = self._estimate_cost(query, timeout_ms)
+            admission = {
+                "estimated_cost": estimated_cost,
+                "heavy": estimated_cost >= self.heavy_query_cost,
+                "queued_ms": 0.0,
+                "statement_timeout_ms": timeout_ms
+            }
+            span.set_attribute("db.estimated_cost", estimated_cost)
+            span.set_attribute("db.heavy_query", admission["heavy"])
+            
+            if estimated_cost > self.max_query_cost:
+                return admission, (
+                    f"Query rejected: estimated cost {estimated_cost:.0f} exceeds the limit of {self.max_query_cost:.0f}. "
+                    "Add filters or aggregate the data before querying."
+                )
+            
+            # Les requêtes lourdes attendent un créneau libre
+            if admission["heavy"]:
+                queue_start = time.perf_counter()
+                if not self.heavy_query_slots.acquire(timeout=self.heavy_queue_timeout):
+                    return admission, f"Query rejected: too many heavy queries running (max {self.max_heavy_queries}), retry later"
+                admission["queued_ms"] = round((time.perf_counter() - queue_start) * 1000, 2)
+                span.set_attribute("db.queued_ms", admission["queued_ms"])
+            
+            return admission, None
+    
+    def _configure_transaction(self, conn, timeout_ms: int):
+        """Transaction en lecture seule avec timeout local à la requête"""
+        conn.execute(text("SET TRANSACTION READ ONLY"))
+        conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+    
+    def _estimate_cost(self, query: str, timeout_ms: int) -> float:
+        """Retourne le coût total estimé par le planificateur PostgreSQL"""
+        with self.engine.connect() as conn, conn.begin():
+            self._configure_transaction(conn, timeout_ms)
+            plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+        
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        
+        return float(plan[0]["Plan"]["Total Cost"])
+    
+    def _rejected_query(self, query: str, reason: str, admission: Dict[str, Any]) -> Dict[str, Any]:
+        """Réponse pour une requête refusée par le contrôle d'admission"""
+        logger.warning(f"{reason} ({query[:50]}...)")
+        return {
+            "success": False,
+            "error": reason,
+            "query": query,
+            "rows": [],
+            "columns": [],
+            "admission": admission
+        }
     
     def _simulate_query_result(self, query: str, limit: int) -> Dict[str, Any]:
         """Simule un résultat de requête quand la DB n'est pas disponible"""
+        start = time.perf_counter()
         
         # Données simulées selon le type de requête
         if 'files_processed' in query.lower():
@@ -176,7 +357,7 @@ class DatabaseManager:
             "rows": sample_data,
             "columns": columns,
             "row_count": len(sample_data),
-            "execution_time": datetime.now().isoformat(),
+            "execution_time_ms": round((time.perf_counter() - start) * 1000, 2),
             "note": "Simulated data - database not connected"
         }
     
@@ -233,6 +414,212 @@ class DatabaseManager:
                 "table_name": table_name
             }
     
+    def upsert_file_analysis(self, file_path: str, analysis_result: Dict[str, Any],
+                             file_size: Optional[int] = None, file_type: Optional[str] = None,
+                             status: str = "analyzed") -> Optional[int]:
+        """Enregistre (ou met à jour) l'analyse d'un fichier en une seule instruction"""
+        
+        if not self.is_connected():
+            return None
+        
+        statement = text("""
+            INSERT INTO files_processed
+                (filename, file_path, file_size, file_type, status, analysis_result, processed_at)
+            VALUES
+                (:filename, :file_path, :file_size, :file_type, :status, CAST(:analysis_result AS JSONB), NOW())
+            ON CONFLICT (file_path) DO UPDATE SET
+                filename = EXCLUDED.filename,
+                file_size = COALESCE(EXCLUDED.file_size, files_processed.file_size),
+                file_type = COALESCE(EXCLUDED.file_type, files_processed.file_type),
+                status = EXCLUDED.status,
+                -- Profil calculé à la réception du fichier conservé avec l'analyse
+                analysis_result = EXCLUDED.analysis_result || jsonb_strip_nulls(
+                    jsonb_build_object('profile', files_processed.analysis_result -> 'profile')
+                ),
+                updated_at = NOW(),
+                processed_at = NOW()
+            RETURNING id
+        """)
+        
+        with self.engine.begin() as conn:
+            file_id = conn.execute(statement, {
+                "filename": os.path.basename(file_path),
+                "file_path": file_path,
+                "file_size": file_size,
+                "file_type": file_type,
+                "status": status,
+                "analysis_result": json.dumps(analysis_result, default=_json_default)
+            }).scalar()
+        
+        return file_id
+    
+    def get_analysis_state(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Statistiques fusionnables de la dernière analyse d'un fichier (None si absentes)"""
+        
+        if not self.is_connected():
+            return None
+        
+        with self.engine.connect() as conn:
+            state = conn.execute(text("""
+                SELECT analysis_result -> 'incremental_state'
+                FROM files_processed
+                WHERE file_path = :file_path
+            """), {"file_path": file_path}).scalar()
+        
+        return state
+    
+    def get_file_id(self, file_path: str) -> Optional[int]:
+        """Identifiant d'un fichier dans files_processed (None s'il n'a pas été enregistré)"""
+        
+        if not self.is_connected():
+            return None
+        
+        with self.engine.connect() as conn:
+            return conn.execute(text(
+                "SELECT id FROM files_processed WHERE file_path = :file_path"
+            ), {"file_path": file_path}).scalar()
+    
+    def register_file(self, file_path: str, file_size: int, file_type: str, content_hash: str,
+                      profile: Dict[str, Any]) -> Optional[int]:
+        """
+        Enregistre un fichier reçu (statut 'uploaded', profil de premier niveau)
+        Un fichier déjà connu conserve son statut et son analyse
+        """
+        
+        if not self.is_connected():
+            return None
+        
+        statement = text("""
+            INSERT INTO files_processed
+                (filename, file_path, file_size, file_type, content_hash, status, analysis_result)
+            VALUES
+                (:filename, :file_path, :file_size, :file_type, :content_hash, 'uploaded',
+                 CAST(:analysis_result AS JSONB))
+            ON CONFLICT (file_path) DO UPDATE SET
+                file_size = EXCLUDED.file_size,
+                file_type = EXCLUDED.file_type,
+                content_hash = EXCLUDED.content_hash,
+                updated_at = NOW()
+            RETURNING id
+        """)
+        
+        with self.engine.begin() as conn:
+            file_id = conn.execute(statement, {
+                "filename": os.path.basename(file_path),
+                "file_path": file_path,
+                "file_size": file_size,
+                "file_type": file_type,
+                "content_hash": content_hash,
+                "analysis_result": json.dumps({"profile": profile}, default=_json_default)
+            }).scalar()
+        
+        return file_id
+
+    def get_kpis(self, dimension: str = "field", file_id: Optional[int] = None,
+                 field_name: Optional[str] = None, since: Optional[str] = None,
+                 limit: int = 100) -> Dict[str, Any]:
+        """Retourne les KPI d'enrichissement pré-agrégés (kpi_enrichment_daily)"""
+        
+        if dimension not in KPI_DIMENSIONS:
+            return {
+                "success": False,
+                "error": f"Unknown KPI dimension '{dimension}'",
+                "available_dimensions": list(KPI_DIMENSIONS.keys())
+            }
+        
+        if not self.is_connected():
+            return self._simulate_kpis(dimension)
+        
+        params = {"limit": limit}
+        
+        if dimension == "file":
+            # Vue de synthèse par fichier (jointure avec l'analyse de files_processed)
+            # Sommes et arrondis NUMERIC convertis : nombres JSON plutôt que Decimal sérialisés en texte
+            query = """
+                SELECT file_id, filename, status, missing_values,
+                       enriched_count::BIGINT AS enriched_count,
+                       filled_count::BIGINT AS filled_count,
+                       fill_rate::FLOAT8 AS fill_rate,
+                       avg_confidence::FLOAT8 AS avg_confidence,
+                       last_enrichment_day
+                FROM kpi_file_summary
+            """
+            if file_id is not None:
+                query += " WHERE file_id = :file_id"
+                params["file_id"] = file_id
+            query += " ORDER BY last_enrichment_day DESC NULLS LAST, file_id LIMIT :limit"
+        else:
+            column = KPI_DIMENSIONS[dimension]
+            filters = []
+            if file_id is not None:
+                filters.append("file_id = :file_id")
+                params["file_id"] = file_id
+            if field_name:
+                filters.append("field_name = :field_name")
+                params["field_name"] = field_name
+            if since:
+                filters.append("day >= CAST(:since AS DATE)")
+                params["since"] = since
+            
+            query = f"""
+                SELECT
+                    {column},
+                    SUM(enriched_count)::BIGINT AS enriched_count,
+                    SUM(filled_count)::BIGINT AS filled_count,
+                    ROUND((SUM(filled_count)::NUMERIC / NULLIF(SUM(enriched_count), 0)) * 100, 2)::FLOAT8 AS success_rate,
+                    SUM(high_confidence_count)::BIGINT AS high_confidence_count,
+                    ROUND((SUM(confidence_sum) / NULLIF(SUM(confidence_count), 0))::NUMERIC, 4)::FLOAT8 AS avg_confidence
+                FROM kpi_enrichment_daily
+                {"WHERE " + " AND ".join(filters) if filters else ""}
+                GROUP BY {column}
+                ORDER BY {"day DESC" if dimension == "day" else "enriched_count DESC"}
+                LIMIT :limit
+            """
+        
+        start = time.perf_counter()
+        with self.engine.connect() as conn:
+            result = conn.execute(text(query), params)
+            rows = [dict(row._mapping) for row in result]
+            columns = list(result.keys())
+            refreshed_until = conn.execute(text(
+                "SELECT refreshed_until FROM kpi_rollup_state WHERE rollup_name = 'kpi_enrichment_daily'"
+            )).scalar()
+        
+        return {
+            "success": True,
+            "dimension": dimension,
+            "rows": rows,
+            "columns": columns,
+            "row_count": len(rows),
+            "refreshed_until": refreshed_until.isoformat() if refreshed_until else None,
+            "execution_time_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+    
+    def _simulate_kpis(self, dimension: str) -> Dict[str, Any]:
+        """Simule des KPI quand la DB n'est pas disponible"""
+        
+        sample_rows = {
+            "file": [{"file_id": 1, "filename": "sample_data.xlsx", "status": "analyzed", "missing_values": 120,
+                      "enriched_count": 95, "filled_count": 80, "fill_rate": 66.67, "avg_confidence": 0.87,
+                      "last_enrichment_day": "2024-01-15"}],
+            "field": [{"field_name": "email", "enriched_count": 60, "filled_count": 52, "success_rate": 86.67,
+                       "high_confidence_count": 45, "avg_confidence": 0.9}],
+            "source": [{"source": "example.com", "enriched_count": 60, "filled_count": 52, "success_rate": 86.67,
+                        "high_confidence_count": 45, "avg_confidence": 0.9}],
+            "day": [{"day": "2024-01-15", "enriched_count": 95, "filled_count": 80, "success_rate": 84.21,
+                     "high_confidence_count": 70, "avg_confidence": 0.87}]
+        }[dimension]
+        
+        return {
+            "success": True,
+            "dimension": dimension,
+            "rows": sample_rows,
+            "columns": list(sample_rows[0].keys()),
+            "row_count": len(sample_rows),
+            "refreshed_until": None,
+            "note": "Simulated data - database not connected"
+        }
+    
     def _simulate_table_schema(self, table_name: str) -> Dict[str, Any]:
         """Simule le schéma d'une table"""
         
@@ -259,7 +646,7 @@ class DatabaseManager:
                     {"name": "source", "type": "VARCHAR(255)", "nullable": True, "default": None},
                     {"name": "confidence", "type": "FLOAT", "nullable": True, "default": None}
                 ],
-                "indexes": ["idx_enrichment_file_id", "idx_enrichment_field"],
+                "indexes": ["idx_enrichment_file_row_field", "idx_enrichment_field_confidence", "idx_enrichment_created_brin"],
                 "foreign_keys": [
                     {"column": "file_id", "referenced_table": "files_processed", "referenced_column": "id"}
                 ]
@@ -281,22 +668,349 @@ class DatabaseManager:
                 "available_tables": list(schemas.keys())
             }
 
+def _json_default(value: Any) -> Any:
+    """Sérialisation JSON des types numpy / pandas"""
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+class EnrichmentWriter:
+    """
+    Écriture par lots de l'historique d'enrichissement via COPY
+    Un lot est envoyé dès qu'il est complet, ou au plus tard max_latency secondes après sa première ligne
+    """
+    
+    COLUMNS = [
+        "file_id", "field_name", "row_index", "original_value",
+        "enriched_value", "source", "confidence", "method", "source_key"
+    ]
+    
+    def __init__(self, db: DatabaseManager, batch_size: int = 20000,
+                 max_pending_batches: int = 8, writer_threads: int = 2, max_latency: float = 1.0):
+        self.db = db
+        self.batch_size = batch_size
+        self.writer_threads = writer_threads
+        self.max_latency = max_latency
+        
+        # File bornée : quand l'écriture prend du retard, add() bloque (backpressure)
+        self.pending = queue.Queue(maxsize=max_pending_batches)
+        self._buffer: List[Any] = []
+        self._lock = threading.Lock()
+        # Lot retiré puis placé dans la file sans qu'un flush() ne s'intercale
+        self._flush_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._flusher: Optional[threading.Thread] = None
+        # Lot en cours non vide, depuis _buffered_since (horloge monotone)
+        self._buffered = threading.Event()
+        self._buffered_since: Optional[float] = None
+        self._first_write: Optional[float] = None
+        self._last_write: Optional[float] = None
+        
+        self.stats = {
+            "rows_written": 0,
+            "batches_written": 0,
+            "rows_failed": 0,
+            "rows_dropped": 0,
+            "timed_flushes": 0,
+            "write_seconds": 0.0,
+            "backpressure_waits": 0,
+            "backpressure_seconds": 0.0
+        }
+    
+    def add(self, row: Any):
+        """Ajoute une ligne d'enrichissement (dict, ou tuple dans l'ordre de COLUMNS)"""
+        self.add_many([row])
+    
+    def add_many(self, rows: Iterable[Any]):
+        """Ajoute plusieurs lignes, envoyées par lots complets au thread d'écriture (lot incomplet : après max_latency)"""
+        batches = []
+        with self._lock:
+            for row in rows:
+                if not self._buffer:
+                    self._buffered_since = time.monotonic()
+                self._buffer.append(row)
+                if len(self._buffer) >= self.batch_size:
+                    batches.append(self._buffer)
+                    self._buffer = []
+            if self._buffer:
+                self._buffered.set()
+            else:
+                self._buffered_since = None
+        
+        self._ensure_threads()
+        for batch in batches:
+            self._submit(batch)
+    
+    def flush(self):
+        """Envoie le lot en cours et attend que tout soit écrit"""
+        with self._flush_lock:
+            batch = self._take_buffer()
+            if batch:
+                self._submit(batch)
+        
+        if self._threads:
+            self.pending.join()
+    
+    def _submit(self, batch: List[Any]):
+        """Place un lot dans la file d'écriture (bloquant si la file est pleine)"""
+        self._ensure_threads()
+        
+        try:
+            self.pending.put_nowait(batch)
+        except queue.Full:
+            wait_start = time.perf_counter()
+            self.pending.put(batch)
+            self._update_stats(backpressure_waits=1, backpressure_seconds=time.perf_counter() - wait_start)
+    
+    def _take_buffer(self) -> List[Any]:
+        """Retire le lot en cours (éventuellement incomplet)"""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            self._buffered_since = None
+            self._buffered.clear()
+        return batch
+    
+    def _ensure_threads(self):
+        """Démarre les threads d'écriture (une connexion COPY chacun) et le thread d'envoi des lots en attente"""
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_pending, name="enrichment-flusher", daemon=True)
+                self._flusher.start()
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.writer_threads:
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f"enrichment-writer-{len(self._threads)}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+    
+    def _update_stats(self, **increments):
+        with self._stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+    
+    def _flush_pending(self):
+        """Envoie le lot en cours max_latency secondes après sa première ligne, même incomplet"""
+        while True:
+            self._buffered.wait()
+            with self._lock:
+                since = self._buffered_since
+            delay = since + self.max_latency - time.monotonic() if since is not None else 0.0
+            if delay > 0:
+                time.sleep(delay)
+                continue
+            with self._flush_lock:
+                batch = self._take_buffer()
+                if batch:
+                    self._update_stats(timed_flushes=1)
+                    self._submit(batch)
+    
+    def _run(self):
+        """Boucle du thread d'écriture"""
+        while True:
+            batch = self.pending.get()
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self._update_stats(rows_failed=len(batch))
+                logger.error(f"Error writing enrichment batch ({len(batch)} rows): {str(e)}")
+            finally:
+                self.pending.task_done()
+    
+    def _write_batch(self, batch: List[Any]):
+        """Charge un lot avec COPY FROM STDIN"""
+        if not self.db.is_connected():
+            self._update_stats(rows_dropped=len(batch))
+            logger.warning(f"Database not connected, {len(batch)} enrichment rows not persisted")
+            return
+        
+        start = time.perf_counter()
+        buffer = self._encode_batch(batch)
+        
+        raw_connection = self.db.engine.raw_connection()
+        try:
+            with raw_connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY enrichment_history ({', '.join(self.COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+            raw_connection.commit()
+        except Exception:
+            raw_connection.rollback()
+            raise
+        finally:
+            raw_connection.close()
+        
+        end = time.perf_counter()
+        self._update_stats(rows_written=len(batch), batches_written=1, write_seconds=end - start)
+        with self._stats_lock:
+            self._first_write = min(self._first_write or start, start)
+            self._last_write = end
+    
+    def _encode_batch(self, batch: List[Any]) -> io.StringIO:
+        """Encode un lot au format CSV de COPY (valeur vide non quotée = NULL)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        columns = self.COLUMNS
+        
+        writer.writerows(
+            row if isinstance(row, tuple) else [row.get(column) for column in columns]
+            for row in batch
+        )
+        
+        buffer.seek(0)
+        return buffer
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques d'écriture"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+            elapsed = (self._last_write - self._first_write) if self._first_write else 0.0
+        
+        return {
+            **stats,
+            "writer_threads": self.writer_threads,
+            "pending_batches": self.pending.qsize(),
+            "buffered_rows": len(self._buffer),
+            "rows_per_second": round(stats["rows_written"] / elapsed, 1) if elapsed else 0.0
+        }
+
 # Instance globale du gestionnaire de base de données
 db_manager = DatabaseManager()
 
-def run_sql(query: str, limit: int = 100) -> Dict[str, Any]:
+# Writer partagé de l'historique d'enrichissement (créé à la première utilisation)
+_enrichment_writer: Optional[EnrichmentWriter] = None
+_enrichment_writer_lock = threading.Lock()
+
+def get_enrichment_writer() -> EnrichmentWriter:
+    """Retourne le writer partagé de l'historique d'enrichissement"""
+    global _enrichment_writer
+    
+    with _enrichment_writer_lock:
+        if _enrichment_writer is None:
+            _enrichment_writer = EnrichmentWriter(
+                db_manager,
+                batch_size=int(os.getenv('ENRICHMENT_BATCH_SIZE', '20000')),
+                writer_threads=int(os.getenv('ENRICHMENT_WRITER_THREADS', '2')),
+                max_latency=float(os.getenv('ENRICHMENT_FLUSH_SECONDS', '1'))
+            )
+            atexit.register(_enrichment_writer.flush)
+    
+    return _enrichment_writer
+
+def record_enrichments(rows: Iterable[Any]):
+    """
+    Enregistre des résultats d'enrichissement dans enrichment_history
+    
+    Args:
+        rows: Lignes avec file_id, field_name, row_index, original_value,
+              enriched_value, source, confidence, method et source_key
+              (identité de la ligne source, voir entity_index.source_keys)
+    """
+    get_enrichment_writer().add_many(rows)
+
+def flush_enrichments():
+    """Écrit les lignes d'historique en attente (fin d'un outil, arrêt du serveur)"""
+    if _enrichment_writer is not None:
+        _enrichment_writer.flush()
+
+def persist_analysis(file_path: str, analysis_result: Dict[str, Any],
+                     file_size: Optional[int] = None, file_type: Optional[str] = None) -> Optional[int]:
+    """
+    Enregistre le résultat d'analyse d'un fichier dans files_processed
+    
+    Args:
+        file_path: Chemin du fichier analysé
+        analysis_result: Résultat de analyze_file
+        file_size: Taille du fichier en octets (optionnel)
+        file_type: Extension du fichier (optionnel)
+    
+    Returns:
+        Identifiant du fichier dans files_processed, None si la base n'est pas disponible
+    """
+    try:
+        return db_manager.upsert_file_analysis(file_path, analysis_result, file_size, file_type)
+    
+    except Exception as e:
+        logger.error(f"Error persisting analysis for {file_path}: {str(e)}")
+        return None
+
+def load_analysis_state(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Retourne les statistiques persistées par la dernière analyse d'un fichier
+    
+    Args:
+        file_path: Chemin du fichier analysé
+    
+    Returns:
+        État de l'analyse incrémentale, None si absent ou si la base n'est pas disponible
+    """
+    try:
+        return db_manager.get_analysis_state(file_path)
+    
+    except Exception as e:
+        logger.error(f"Error loading analysis state for {file_path}: {str(e)}")
+        return None
+
+def get_file_id(file_path: str) -> Optional[int]:
+    """
+    Retourne l'identifiant d'un fichier dans files_processed
+    
+    Args:
+        file_path: Chemin du fichier
+    
+    Returns:
+        Identifiant du fichier, None s'il est inconnu ou si la base n'est pas disponible
+    """
+    try:
+        return db_manager.get_file_id(file_path)
+    
+    except Exception as e:
+        logger.error(f"Error loading file id for {file_path}: {str(e)}")
+        return None
+
+def register_file(file_path: str, file_size: int, file_type: str, content_hash: str,
+                  profile: Dict[str, Any]) -> Optional[int]:
+    """
+    Enregistre un fichier reçu dans files_processed
+    
+    Args:
+        file_path: Chemin du fichier enregistré
+        file_size: Taille du fichier en octets
+        file_type: Extension du fichier
+        content_hash: Empreinte SHA-256 du contenu
+        profile: Profil calculé pendant la réception
+    
+    Returns:
+        Identifiant du fichier dans files_processed, None si la base n'est pas disponible
+    """
+    try:
+        return db_manager.register_file(file_path, file_size, file_type, content_hash, profile)
+    
+    except Exception as e:
+        logger.error(f"Error registering file {file_path}: {str(e)}")
+        return None
+
+def run_sql(query: str, limit: int = 100, timeout_ms: Optional[int] = None) -> Dict[str, Any]:
     """
     Exécute une requête SQL en lecture seule
     
     Args:
         query: Requête SQL à exécuter (SELECT uniquement)
         limit: Nombre maximum de résultats à retourner
+        timeout_ms: Durée maximale de la requête (plafonnée par SQL_STATEMENT_TIMEOUT_MS)
     
     Returns:
         Dict contenant les résultats de la requête
     """
     try:
-        result = db_manager.execute_query(query, limit)
+        result = db_manager.execute_query(query, limit, timeout_ms)
         logger.info(f"SQL query executed successfully: {query[:50]}...")
         return result
         
@@ -310,6 +1024,22 @@ def run_sql(query: str, limit: int = 100) -> Dict[str, Any]:
             "columns": []
         }
 
+def stream_sql(query: str, limit: int = 10000, page_size: int = 500, timeout_ms: Optional[int] = None):
+    """
+    Exécute une requête SQL en lecture seule et produit les résultats par pages
+    
+    Args:
+        query: Requête SQL à exécuter (SELECT uniquement)
+        limit: Nombre maximum de lignes (0 = pas de LIMIT ajouté)
+        page_size: Nombre de lignes par page
+        timeout_ms: Durée maximale de la requête (plafonnée par SQL_STATEMENT_TIMEOUT_MS)
+    
+    Yields:
+        Pages de résultats, puis un résumé (row_count, execution_time_ms)
+    """
+    logger.info(f"Streaming SQL query: {query[:50]}...")
+    yield from db_manager.stream_query(query, limit, page_size, timeout_ms)
+
 def get_table_schema(table_name: str) -> Dict[str, Any]:
     """
     Retourne le schéma d'une table de la base de données
@@ -331,4 +1061,33 @@ def get_table_schema(table_name: str) -> Dict[str, Any]:
             "success": False,
             "error": str(e),
             "table_name": table_name
+        }
+
+def get_kpis(dimension: str = "field", file_id: Optional[int] = None, field_name: Optional[str] = None,
+             since: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+    """
+    Retourne les KPI d'enrichissement pré-agrégés
+    
+    Args:
+        dimension: Axe d'agrégation (file, field, source, day)
+        file_id: Filtre sur un fichier (optionnel)
+        field_name: Filtre sur un champ, hors dimension file (optionnel)
+        since: Date de début AAAA-MM-JJ, hors dimension file (optionnel)
+        limit: Nombre maximum de lignes
+    
+    Returns:
+        Dict contenant les lignes agrégées et la date du dernier rafraîchissement
+    """
+    try:
+        result = db_manager.get_kpis(dimension, file_id, field_name, since, limit)
+        logger.info(f"KPIs retrieved for dimension: {dimension}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error getting KPIs for dimension {dimension}: {str(e)}")
+        return {
+            "success": False,
+            "error": str(e),
+            "dimension": dimension,
+            "rows": []
         }
\ No newline at end of file
@@ -0,0 +1,556 @@
+"""
+Index des entités déjà enrichies (résolution d'entités)
+Les valeurs de enrichment_history sont rattachées à l'entreprise de la ligne source (SIRET, nom, code postal, ville)
+et conservées par entité dans les tables entities / entity_values. Avant toute recherche sur le web, les cellules
+manquantes d'un fichier sont résolues sur cet index : SIRET identique, nom normalisé et localité identiques,
+puis noms proches (blocage MinHash sur les trigrammes, similarité exacte des trigrammes des candidats)
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.util import hash_pandas_object
+from sqlalchemy import text
+
+from observability.profiling import stage
+
+from .data_tools import db_manager
+from .validators import validator
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "entities"
+
+# Signatures MinHash : 8 bandes de 4 valeurs (paires candidates au-delà d'une similarité d'environ 0,6)
+MINHASH_PERMUTATIONS = 32
+MINHASH_BANDS = 8
+_random = np.random.default_rng(4242005)
+_MINHASH_A = _random.integers(1, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_MINHASH_B = _random.integers(0, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+# Confiance d'une correspondance selon la méthode (multipliée par la confiance de la valeur enrichie)
+MATCH_CONFIDENCE = {"siret": 1.0, "name": 0.95}
+FUZZY_MATCH_WEIGHT = 0.95
+# Similarité minimale des trigrammes (coefficient de Dice) pour une correspondance approchée
+FUZZY_MIN_SIMILARITY = 0.8
+# Écart minimal avec le deuxième candidat
+FUZZY_MIN_MARGIN = 0.05
+# Entités au plus par compartiment de bande, candidats comparés au plus par ligne
+MAX_BUCKET_ENTITIES = 50
+MAX_CANDIDATES = 5
+
+# Lignes de l'historique relues à chaque intégration (écritures concurrentes validées en retard)
+SYNC_LOOKBACK = timedelta(minutes=1)
+SYNC_CHUNK_ROWS = 50000
+# Intervalle minimal entre deux intégrations lancées en arrière-plan par l'enrichissement (secondes)
+DEFAULT_SYNC_INTERVAL = 60
+
+# Formes juridiques et mots vides retirés des noms
+NAME_STOPWORDS = (r"\b(?:sarl|sas|sasu|sa|eurl|sci|snc|scop|scp|selarl|ei|ets|etablissements?|societe|ste|cie"
+                  r"|et|de|du|des|la|le|les|l|d)\b")
+
+NAME_COLUMN_PATTERN = re.compile(r"^(?:nom|name|raison_?sociale|denomination|entreprise|societe|company)",
+                                 re.IGNORECASE)
+CITY_COLUMN_PATTERN = re.compile(r"ville|commune|city|localite", re.IGNORECASE)
+
+
+def normalize_text(values: pd.Series, stopwords: bool = False) -> pd.Series:
+    """Minuscules sans accents ni ponctuation (formes juridiques retirées des noms), None si vide"""
+    present = values.dropna()
+    normalized = (present.astype(str).str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+                  .str.lower().str.replace(r"[^a-z0-9]+", " ", regex=True))
+    if stopwords:
+        normalized = normalized.str.replace(NAME_STOPWORDS, " ", regex=True)
+    normalized = normalized.str.replace(r"\s+", " ", regex=True).str.strip()
+    return _reindexed(normalized[normalized != ""], values.index)
+
+
+def _normalize_digits(values: pd.Series, width: int) -> pd.Series:
+    """Identifiants numériques (zéros de tête restaurés pour les colonnes lues comme nombres)"""
+    present = values.dropna()
+    if pd.api.types.is_numeric_dtype(present.dtype):
+        digits = present.astype("int64").astype(str).str.zfill(width)
+    else:
+        digits = present.astype(str).str.replace(r"\D", "", regex=True)
+    return _reindexed(digits[digits.str.len() == width], values.index)
+
+
+def _reindexed(values: pd.Series, index: pd.Index) -> pd.Series:
+    # Chaînes Python (object) : concaténations homogènes quelle que soit la représentation d'origine
+    return values.astype(object).reindex(index).where(lambda series: series.notna(), None)
+
+
+def identity_columns(df: pd.DataFrame) -> Dict[str, Optional[str]]:
+    """Colonnes identifiant l'entreprise d'une ligne : siret, name, postcode, city"""
+    roles = {"siret": None, "name": None, "postcode": None, "city": None}
+    for column in df.columns:
+        hint = validator.name_hint(column)
+        name = str(column)
+        if hint in ("siret", "postcode") and roles[hint] is None:
+            roles[hint] = column
+        elif NAME_COLUMN_PATTERN.search(name) and roles["name"] is None:
+            roles["name"] = column
+        elif CITY_COLUMN_PATTERN.search(name) and roles["city"] is None:
+            roles["city"] = column
+    return roles
+
+
+def identities(df: pd.DataFrame, positions: np.ndarray) -> pd.DataFrame:
+    """
+    Identité normalisée des lignes (index : position de la ligne)
+    Clé : siret:<SIRET> ou nom:<nom normalisé>|<code postal, à défaut ville>
+    """
+    roles = identity_columns(df)
+    rows = df.iloc[positions]
+    empty = pd.Series([None] * len(rows), index=positions, dtype=object)
+
+    def column(role: str) -> pd.Series:
+        return rows[roles[role]].set_axis(positions) if roles[role] is not None else empty
+
+    result = pd.DataFrame({
+        "siret": _normalize_digits(column("siret"), 14),
+        "name": _reindexed(column("name").dropna().astype(str), positions),
+        "normalized_name": normalize_text(column("name"), stopwords=True),
+        "postcode": _normalize_digits(column("postcode"), 5),
+        "city": normalize_text(column("city"))
+    }, index=positions)
+    result["name_key"] = _name_keys(result)
+    result["entity_key"] = ("siret:" + result["siret"]).where(result["siret"].notna(), "nom:" + result["name_key"])
+    return result
+
+
+def source_keys(df: pd.DataFrame, positions: np.ndarray) -> pd.Series:
+    """
+    Empreinte de l'identité des lignes (enrichment_history.source_key), None pour les lignes sans identité
+    Les valeurs enrichies ne sont intégrées que si la ligne source a toujours la même identité
+    """
+    return _key_hashes(identities(df, positions)["entity_key"])
+
+
+def _key_hashes(keys: pd.Series) -> pd.Series:
+    # Entier signé de 64 bits (BIGINT), en texte : les entiers NULL de read_sql passent par float64
+    present = keys.dropna()
+    hashes = hash_pandas_object(present.astype(str), index=False).to_numpy().view(np.int64)
+    return pd.Series(hashes.astype(str), index=present.index, dtype=object).reindex(keys.index)
+
+
+def _name_keys(frame: pd.DataFrame) -> pd.Series:
+    names = frame["normalized_name"].astype(object)
+    locality = frame["postcode"].astype(object).where(frame["postcode"].notna(), frame["city"].astype(object))
+    return (names + "|" + locality.fillna("")).where(names.notna(), None)
+
+
+def _trigrams(name: str) -> set:
+    padded = f" {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def minhash_signatures(names: pd.Series) -> np.ndarray:
+    """Signatures MinHash des trigrammes de noms normalisés (une ligne par nom, uint32)"""
+    signatures = np.full((len(names), MINHASH_PERMUTATIONS), np.iinfo(np.uint32).max, dtype=np.uint32)
+    grams = names.reset_index(drop=True).map(lambda name: sorted(_trigrams(name)) if name else []).explode().dropna()
+    if grams.empty:
+        return signatures
+
+    owners = grams.index.to_numpy()
+    hashes = hash_pandas_object(grams.astype(str), index=False).to_numpy()
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+    # Blocs de noms entiers : matrice des permutations bornée en mémoire
+    block = 20000
+    for first in range(0, len(starts), block):
+        block_starts = starts[first:first + block]
+        end = starts[first + block] if first + block < len(starts) else len(hashes)
+        permuted = (hashes[block_starts[0]:end, None] * _MINHASH_A + _MINHASH_B) >> np.uint64(32)
+        signatures[owners[block_starts]] = np.minimum.reduceat(
+            permuted.astype(np.uint32), block_starts - block_starts[0], axis=0
+        )
+    return signatures
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """Empreinte de chaque bande de la signature (n, MINHASH_BANDS)"""
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    keys = np.empty((len(signatures), MINHASH_BANDS), dtype=np.uint64)
+    for band in range(MINHASH_BANDS):
+        keys[:, band] = hash_pandas_object(
+            pd.DataFrame(signatures[:, band * rows:(band + 1) * rows]), index=False
+        ).to_numpy()
+    return keys
+
+
+class EntityIndex:
+    """
+    Index des entités chargé en mémoire depuis PostgreSQL, rechargé quand une intégration l'a modifié
+    (entity_index_state.synced_at)
+    """
+
+    def __init__(self, threshold: Optional[float] = None, min_confidence: Optional[float] = None,
+                 sync_interval: Optional[float] = None):
+        """
+        Args:
+            threshold: Confiance minimale (correspondance x valeur) pour réutiliser une valeur
+            min_confidence: Confiance minimale d'un enrichissement pour entrer dans l'index
+            sync_interval: Secondes au moins entre deux intégrations en arrière-plan (sync_in_background)
+        """
+        self.threshold = threshold if threshold is not None else float(os.getenv("ENTITY_MATCH_THRESHOLD", "0.7"))
+        self.min_confidence = (min_confidence if min_confidence is not None
+                               else float(os.getenv("ENTITY_MIN_CONFIDENCE", "0.7")))
+        self.sync_interval = (sync_interval if sync_interval is not None
+                              else float(os.getenv("ENTITY_SYNC_INTERVAL", str(DEFAULT_SYNC_INTERVAL))))
+        self._lock = threading.Lock()
+        self._version = None
+        self._sync_thread: Optional[threading.Thread] = None
+        self._last_sync: Optional[float] = None
+        self._set_entities(pd.DataFrame(columns=["siret", "normalized_name", "postcode", "city"]),
+                           pd.DataFrame(columns=["entity_id", "field_name", "value", "confidence", "source"]))
+
+    def _set_entities(self, entities: pd.DataFrame, values: pd.DataFrame):
+        entities["name_key"] = _name_keys(entities)
+        named = entities[entities["normalized_name"].notna()]
+        signatures = minhash_signatures(named["normalized_name"])
+        keys = band_keys(signatures)
+        self.entities = entities
+        self.values = values
+        bands = pd.DataFrame({
+            "band": np.tile(np.arange(MINHASH_BANDS), len(named)),
+            "band_key": keys.ravel(),
+            "entity_id": np.repeat(named.index.to_numpy(), MINHASH_BANDS)
+        })
+        # Compartiments trop peuplés (préfixes communs : "boulangerie", "garage"...) peu discriminants
+        sizes = bands.groupby(["band", "band_key"])["entity_id"].transform("size")
+        self._bands = bands[sizes <= MAX_BUCKET_ENTITIES]
+
+    def refresh(self, force: bool = False) -> bool:
+        """Recharge l'index si une intégration a eu lieu depuis le dernier chargement (tous processus)"""
+        if not db_manager.is_connected():
+            return False
+
+        with db_manager.engine.connect() as conn:
+            version = conn.execute(text(
+                "SELECT synced_at FROM entity_index_state WHERE index_name = :name"
+            ), {"name": INDEX_NAME}).scalar()
+            if version is None or (version == self._version and not force):
+                return False
+            entities = pd.read_sql(text(
+                "SELECT id, siret, normalized_name, postcode, city FROM entities"
+            ), conn, index_col="id")
+            values = pd.read_sql(text(
+                "SELECT entity_id, field_name, value, confidence, source FROM entity_values"
+            ), conn)
+
+        with self._lock:
+            self._set_entities(entities, values)
+            self._version = version
+        logger.info(f"Entity index loaded: {len(entities)} entities, {len(values)} values")
+        return True
+
+    @stage("entity_sync")
+    def sync(self, load_frame: Callable[[str], pd.DataFrame], full: bool = False) -> Dict[str, Any]:
+        """
+        Intègre les enrichissements ajoutés à enrichment_history depuis la dernière intégration
+        Les lignes sources sont relues (load_frame) pour identifier l'entreprise de chaque cellule enrichie
+
+        Args:
+            load_frame: Lecture du DataFrame d'un fichier source
+            full: Relit tout l'historique au lieu des seuls ajouts
+        """
+        if not db_manager.is_connected():
+            return {"success": False, "error": "Database not connected"}
+
+        started_at = datetime.now()
+        with db_manager.engine.connect() as conn:
+            synced_until = None if full else conn.execute(text(
+                "SELECT synced_until FROM entity_index_state WHERE index_name = :name"
+            ), {"name": INDEX_NAME}).scalar()
+        since = synced_until - SYNC_LOOKBACK if synced_until else datetime(1970, 1, 1)
+
+        stats = {"history_rows": 0, "rows_without_source": 0, "rows_source_changed": 0,
+                 "entities_upserted": 0, "values_upserted": 0}
+        frames: Dict[str, Optional[pd.DataFrame]] = {}
+        query = text("""
+            SELECT h.file_id, f.file_path, h.row_index, h.source_key::text AS source_key, h.field_name,
+                   h.enriched_value AS value, h.confidence, h.source, h.created_at AS enriched_at
+            FROM enrichment_history h
+            JOIN files_processed f ON f.id = h.file_id
+            WHERE h.created_at >= :since
+              AND h.row_index IS NOT NULL
+              AND h.enriched_value IS NOT NULL AND h.enriched_value <> ''
+              AND h.confidence >= :min_confidence
+              AND h.method IS DISTINCT FROM 'entity_index'
+            ORDER BY h.created_at
+        """)
+
+        with db_manager.engine.connect() as conn:
+            for history in pd.read_sql(query, conn, params={"since": since, "min_confidence": self.min_confidence},
+                                       chunksize=SYNC_CHUNK_ROWS):
+                stats["history_rows"] += len(history)
+                records, changed = self._attach_identities(history, frames, load_frame)
+                stats["rows_source_changed"] += changed
+                stats["rows_without_source"] += len(history) - len(records) - changed
+                if not records.empty:
+                    entities, values = self._upsert(records)
+                    stats["entities_upserted"] += entities
+                    stats["values_upserted"] += values
+
+        # synced_at (version chargée par les processus) avancé seulement si l'index a changé
+        changed = bool(stats["entities_upserted"] or stats["values_upserted"])
+        with db_manager.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO entity_index_state (index_name, synced_until, synced_at)
+                VALUES (:name, :synced_until, clock_timestamp())
+                ON CONFLICT (index_name) DO UPDATE SET
+                    synced_until = EXCLUDED.synced_until,
+                    synced_at = CASE WHEN :changed THEN EXCLUDED.synced_at ELSE entity_index_state.synced_at END
+            """), {"name": INDEX_NAME, "synced_until": started_at, "changed": changed})
+
+        self.refresh()
+        logger.info(f"Entity index synced: {stats}")
+        return {"success": True, **stats, **self.get_stats()}
+
+    def _attach_identities(self, history: pd.DataFrame, frames: Dict[str, Optional[pd.DataFrame]],
+                           load_frame: Callable[[str], pd.DataFrame]) -> Tuple[pd.DataFrame, int]:
+        """
+        Cellules enrichies complétées de l'identité de leur ligne source (lignes introuvables ignorées)
+        Une ligne dont l'identité a changé depuis l'enrichissement (nouvelle livraison du fichier, autre entreprise
+        à la même position) est écartée ; l'historique sans source_key est rattaché à la ligne actuelle
+
+        Returns:
+            Cellules rattachées et nombre de cellules écartées car leur ligne source a changé
+        """
+        attached = []
+        changed = 0
+        for file_path, cells in history.groupby("file_path", sort=False):
+            if file_path not in frames:
+                try:
+                    frames[file_path] = load_frame(file_path)
+                except Exception as e:
+                    logger.warning(f"Source file {file_path} of enrichment history not readable: {str(e)}")
+                    frames[file_path] = None
+            df = frames[file_path]
+            if df is None:
+                continue
+
+            cells = cells[(cells["row_index"] >= 0) & (cells["row_index"] < len(df))]
+            positions = np.unique(cells["row_index"].to_numpy())
+            rows = identities(df, positions)
+            rows = rows[rows["entity_key"].notna()]
+            cells = cells.merge(rows, left_on="row_index", right_index=True)
+            moved = cells["source_key"].notna() & (cells["source_key"] != _key_hashes(cells["entity_key"]))
+            changed += int(moved.sum())
+            attached.append(cells[~moved])
+
+        if not attached:
+            return pd.DataFrame(), changed
+        return pd.concat(attached, ignore_index=True), changed
+
+    def _upsert(self, records: pd.DataFrame):
+        """Entités puis meilleure valeur de chaque champ (la plus sûre, la plus récente à égalité)"""
+        records = records.sort_values(["confidence", "enriched_at"])
+        entities = records.drop_duplicates("entity_key", keep="last")
+        values = records.drop_duplicates(["entity_key", "field_name"], keep="last")
+
+        entity_rows = entities[["entity_key", "siret", "name", "normalized_name", "postcode", "city"]]
+        entity_rows = entity_rows.astype(object).where(entity_rows.notna(), None).to_dict("records")
+        with db_manager.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO entities (entity_key, siret, name, normalized_name, postcode, city)
+                VALUES (:entity_key, :siret, :name, :normalized_name, :postcode, :city)
+                ON CONFLICT (entity_key) DO UPDATE SET
+                    siret = COALESCE(EXCLUDED.siret, entities.siret),
+                    name = COALESCE(EXCLUDED.name, entities.name),
+                    normalized_name = COALESCE(EXCLUDED.normalized_name, entities.normalized_name),
+                    postcode = COALESCE(EXCLUDED.postcode, entities.postcode),
+                    city = COALESCE(EXCLUDED.city, entities.city),
+                    updated_at = NOW()
+            """), entity_rows)
+            ids = dict(conn.execute(text(
+                "SELECT entity_key, id FROM entities WHERE entity_key = ANY(:keys)"
+            ), {"keys": list(entities["entity_key"])}).all())
+
+            value_rows = [
+                {
+                    "entity_id": ids[row.entity_key],
+                    "field_name": row.field_name,
+                    "value": str(row.value),
+                    "confidence": float(row.confidence),
+                    "source": row.source,
+                    "file_id": int(row.file_id),
+                    "enriched_at": row.enriched_at
+                }
+                for row in values.itertuples(index=False)
+            ]
+            conn.execute(text("""
+                INSERT INTO entity_values (entity_id, field_name, value, confidence, source, file_id, enriched_at)
+                VALUES (:entity_id, :field_name, :value, :confidence, :source, :file_id, :enriched_at)
+                ON CONFLICT (entity_id, field_name) DO UPDATE SET
+                    value = EXCLUDED.value,
+                    confidence = EXCLUDED.confidence,
+                    source = EXCLUDED.source,
+                    file_id = EXCLUDED.file_id,
+                    enriched_at = EXCLUDED.enriched_at,
+                    updated_at = NOW()
+                WHERE (EXCLUDED.confidence, EXCLUDED.enriched_at)
+                      >= (entity_values.confidence, entity_values.enriched_at)
+            """), value_rows)
+        return len(entity_rows), len(value_rows)
+
+    def sync_in_background(self, load_frame: Callable[[str], pd.DataFrame]) -> bool:
+        """
+        Lance une intégration dans un thread, sauf si une intégration est en cours ou date de moins de
+        sync_interval secondes (l'enrichissement n'attend pas la relecture de l'historique)
+
+        Returns:
+            True si une intégration a été lancée
+        """
+        with self._lock:
+            if self._sync_thread is not None and self._sync_thread.is_alive():
+                return False
+            if self._last_sync is not None and time.monotonic() - self._last_sync < self.sync_interval:
+                return False
+            self._last_sync = time.monotonic()
+            self._sync_thread = threading.Thread(target=self._sync_quietly, args=(load_frame,),
+                                                 name="entity-sync", daemon=True)
+            self._sync_thread.start()
+        return True
+
+    def _sync_quietly(self, load_frame: Callable[[str], pd.DataFrame]):
+        try:
+            self.sync(load_frame)
+        except Exception as e:
+            logger.warning(f"Background entity index sync failed: {str(e)}")
+
+    @stage("entity_resolution")
+    def resolve(self, df: pd.DataFrame, positions: np.ndarray, fields: List[str]) -> pd.DataFrame:
+        """
+        Valeurs connues des champs demandés pour les lignes d'un fichier
+
+        Returns:
+            DataFrame (row, field_name, value, confidence, source, entity_id, match) avec au plus une valeur
+            par ligne et par champ, de confiance au moins égale au seuil
+        """
+        columns = ["row", "field_name", "value", "confidence", "source", "entity_id", "match"]
+        with self._lock:
+            entities, values, bands = self.entities, self.values, self._bands
+        values = values[values["field_name"].isin(fields)]
+        if len(positions) == 0 or values.empty:
+            return pd.DataFrame(columns=columns)
+
+        rows = identities(df, np.asarray(positions))
+        matches = [self._exact_matches(rows, entities, "siret", "siret")]
+        remaining = rows[~rows.index.isin(matches[0]["row"])]
+        matches.append(self._exact_matches(remaining, entities, "name_key", "name"))
+        remaining = remaining[~remaining.index.isin(matches[1]["row"])]
+        matches.append(self._fuzzy_matches(remaining, entities, bands))
+
+        matched = pd.concat(matches, ignore_index=True).merge(values, on="entity_id")
+        matched["confidence"] = matched["match_confidence"] * matched["confidence"]
+        matched = matched[matched["confidence"] >= self.threshold]
+        matched = matched.sort_values("confidence", ascending=False).drop_duplicates(["row", "field_name"])
+        return matched[columns].reset_index(drop=True)
+
+    @staticmethod
+    def _exact_matches(rows: pd.DataFrame, entities: pd.DataFrame, key: str, match: str) -> pd.DataFrame:
+        left = rows[rows[key].notna()][[key]].rename_axis("row").reset_index()
+        right = entities[entities[key].notna()][[key]].rename_axis("entity_id").reset_index()
+        matched = left.merge(right, on=key)[["row", "entity_id"]]
+        matched["match"] = match
+        matched["match_confidence"] = MATCH_CONFIDENCE[match]
+        return matched
+
+    @staticmethod
+    def _fuzzy_matches(rows: pd.DataFrame, entities: pd.DataFrame, bands: pd.DataFrame) -> pd.DataFrame:
+        """Candidats partageant une bande MinHash, retenus sur la similarité exacte des trigrammes (Dice)"""
+        empty = pd.DataFrame(columns=["row", "entity_id", "match", "match_confidence"])
+        named = rows[rows["normalized_name"].notna()]
+        if named.empty or bands.empty:
+            return empty
+
+        keys = band_keys(minhash_signatures(named["normalized_name"]))
+        queries = pd.DataFrame({
+            "row": np.repeat(named.index.to_numpy(), MINHASH_BANDS),
+            "band": np.tile(np.arange(MINHASH_BANDS), len(named)),
+            "band_key": keys.ravel()
+        })
+        candidates = queries.merge(bands, on=["band", "band_key"])
+        if candidates.empty:
+            return empty
+        candidates = candidates.groupby(["row", "entity_id"]).size().rename("shared").reset_index()
+
+        # Localités renseignées des deux côtés : elles doivent correspondre
+        query_rows = named.loc[candidates["row"]]
+        entity_rows = entities.loc[candidates["entity_id"]]
+        both_postcodes = query_rows["postcode"].notna().to_numpy() & entity_rows["postcode"].notna().to_numpy()
+        both_cities = query_rows["city"].notna().to_numpy() & entity_rows["city"].notna().to_numpy()
+        compatible = np.where(
+            both_postcodes, query_rows["postcode"].to_numpy() == entity_rows["postcode"].to_numpy(),
+            np.where(both_cities, query_rows["city"].to_numpy() == entity_rows["city"].to_numpy(), True)
+        )
+        # Sans localité commune vérifiable, la correspondance est moins sûre
+        candidates["weight"] = np.where(both_postcodes | both_cities, FUZZY_MATCH_WEIGHT, FUZZY_MATCH_WEIGHT * 0.9)
+
+        # Candidats partageant le plus de bandes (similarité estimée la plus élevée)
+        candidates = (candidates[compatible].sort_values("shared", ascending=False, kind="stable")
+                      .groupby("row").head(MAX_CANDIDATES).reset_index(drop=True))
+        if candidates.empty:
+            return empty
+
+        names = entities["normalized_name"]
+        candidates["similarity"] = [
+            2 * len(first & second) / (len(first) + len(second))
+            for first, second in zip(named.loc[candidates["row"], "normalized_name"].map(_trigrams),
+                                     names.loc[candidates["entity_id"]].map(_trigrams))
+        ]
+        candidates = candidates[candidates["similarity"] >= FUZZY_MIN_SIMILARITY]
+        # Correspondance ambiguë (noms voisins "garage martin 1" / "garage martin 2") : écartée
+        candidates = candidates.sort_values(["row", "similarity"], ascending=[True, False])
+        best = candidates.groupby("row").head(1)
+        runner_up = candidates.groupby("row").nth(1).set_index("row")["similarity"]
+        gap = best["similarity"] - best["row"].map(runner_up).fillna(0.0)
+        best = best[gap >= FUZZY_MIN_MARGIN]
+
+        best = best.assign(match="fuzzy", match_confidence=best["similarity"] * best["weight"])
+        return best[["row", "entity_id", "match", "match_confidence"]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entities": len(self.entities),
+                "values": len(self.values),
+                "threshold": self.threshold,
+                "loaded_version": self._version.isoformat() if self._version else None
+            }
+
+
+# Instance globale de l'index (chargé au premier usage)
+entity_index = EntityIndex()
+
+
+def sync_entity_index(full: bool = False) -> Dict[str, Any]:
+    """
+    Intègre les nouveaux enrichissements de enrichment_history à l'index des entités
+
+    Args:
+        full: Relit tout l'historique (reconstruction) au lieu des seuls ajouts
+
+    Returns:
+        Dict avec le nombre de lignes d'historique lues et d'entités / valeurs mises à jour
+    """
+    # Import local : file_tools utilise l'index pendant l'enrichissement
+    from .file_tools import analyzer
+
+    try:
+        return entity_index.sync(lambda file_path: analyzer.load_file(file_path)[0], full=full)
+
+    except Exception as e:
+        logger.error(f"Error syncing entity index: {str(e)}")
+        return {
+            "error": str(e),
+            "success": False
+        }
@@ -4,20 +4,71 @@ Supporte Excel, CSV, JSON avec détection automatique des données manquantes
 """
 
 import pandas as pd
+import csv
+import hashlib
+import io
 import json
 import logging
+import os
+import re
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 import numpy as np
 from datetime import datetime
 
+try:
+    import pyarrow  # noqa: F401
+    ARROW_STRINGS_AVAILABLE = True
+except ImportError:
+    ARROW_STRINGS_AVAILABLE = False
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+from observability.profiling import stage
+
+from .change_index import RowIndex, detect_key_columns, diff_indexes, file_version, index_path
+from .column_stats import column_kind, compute_frame_stats, merge_frame_stats, most_common
+from .data_tools import flush_enrichments, get_file_id, load_analysis_state, persist_analysis, record_enrichments
+from .entity_index import entity_index, source_keys
+from .frame_store import frame_store
+from .output_writers import CHUNK_ROWS, open_writer
+from .process_pool import run_in_process
+from .validators import validator
+
 logger = logging.getLogger(__name__)
 
+# Version du format des statistiques persistées (analyse incrémentale)
+INCREMENTAL_STATE_VERSION = 2
+
+CSV_DELIMITERS = ";,\t|"
+CSV_SAMPLE_SIZE = 64 * 1024
+
+
+def sniff_delimiter(text: str) -> Optional[str]:
+    """Séparateur CSV déduit des premières lignes (None si aucun séparateur reconnu)"""
+    try:
+        return csv.Sniffer().sniff(text, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        header = text.split("\n", 1)[0]
+        counts = {delimiter: header.count(delimiter) for delimiter in CSV_DELIMITERS}
+        best = max(counts, key=counts.get)
+        return best if counts[best] else None
+
+
 class FileAnalyzer:
     """Classe principale pour l'analyse de fichiers"""
     
     SUPPORTED_FORMATS = ['.xlsx', '.xls', '.csv', '.json']
     
+    # Texte converti en catégorie si le nombre de valeurs distinctes reste sous cette part des lignes
+    CATEGORY_MAX_UNIQUE_RATIO = 0.5
+    # Valeurs examinées avant de tenter la conversion d'une colonne texte en dates
+    DATE_SAMPLE_SIZE = 100
+    DATE_PATTERN = re.compile(r'^\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}([ T]\d{1,2}:\d{2}(:\d{2})?)?$')
+    
     def __init__(self):
         self.analysis_cache = {}
     
@@ -33,6 +84,7 @@ class FileAnalyzer:
         
         return extension
     
+    @stage("read")
     def read_file(self, file_path: str) -> pd.DataFrame:
         """Lit un fichier et retourne un DataFrame"""
         file_type = self.detect_file_type(file_path)
@@ -41,8 +93,12 @@ class FileAnalyzer:
             if file_type in ['.xlsx', '.xls']:
                 df = pd.read_excel(file_path)
             elif file_type == '.csv':
-                # Détection automatique du séparateur
-                df = pd.read_csv(file_path, sep=None, engine='python')
+                # Séparateur détecté sur les premières lignes (moteur C), sinon détection par le moteur Python
+                delimiter = self.detect_delimiter(file_path)
+                if delimiter:
+                    df = pd.read_csv(file_path, sep=delimiter)
+                else:
+                    df = pd.read_csv(file_path, sep=None, engine='python')
             elif file_type == '.json':
                 with open(file_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
@@ -55,34 +111,202 @@ class FileAnalyzer:
             logger.error(f"Error reading file {file_path}: {str(e)}")
             raise
     
+    @staticmethod
+    def detect_delimiter(file_path: str) -> Optional[str]:
+        with open(file_path, 'rb') as f:
+            sample = f.read(CSV_SAMPLE_SIZE)
+        text = sample.decode('utf-8', errors='replace')
+        # Dernière ligne de l'échantillon probablement tronquée
+        if len(sample) == CSV_SAMPLE_SIZE and "\n" in text:
+            text = text[:text.rindex("\n")]
+        return sniff_delimiter(text)
+    
+    @stage("read_tail")
+    def read_csv_tail(self, file_path: str, offset: int, delimiter: str,
+                      text_columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Lignes d'un CSV situées après offset (précédées de la ligne d'en-tête du fichier)
+        
+        Args:
+            text_columns: Colonnes lues en texte sans inférence de type
+        """
+        with open(file_path, 'rb') as f:
+            header = f.readline()
+            f.seek(offset)
+            tail = f.read()
+        dtype = {column: str for column in text_columns} if text_columns else None
+        return pd.read_csv(io.BytesIO(header + tail), sep=delimiter, dtype=dtype)
+
+    def read_original_chunks(self, file_path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """
+        Lignes du fichier par blocs, valeurs des cellules telles qu'écrites dans le fichier (fichier enrichi)
+        CSV lu en texte sans inférence de type (zéros de tête des codes postaux, SIRET et téléphones conservés),
+        cellules Excel et JSON avec leur type d'origine, sans compaction
+        """
+        file_type = self.detect_file_type(file_path)
+        if file_type == '.csv':
+            delimiter = self.detect_delimiter(file_path)
+            options = {"sep": delimiter} if delimiter else {"sep": None, "engine": "python"}
+            # Seules les cellules vides sont manquantes : "NA", "null"... recopiés tels quels
+            yield from pd.read_csv(file_path, dtype=str, keep_default_na=False, na_values=[""],
+                                   chunksize=chunk_rows, **options)
+            return
+
+        df = self.read_file(file_path)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+    def load_file(self, file_path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Retourne le DataFrame compacté d'un fichier avec le rapport mémoire
+        Lu une seule fois puis projeté depuis le FrameStore par tous les processus tant que le fichier ne change pas
+        """
+        self.detect_file_type(file_path)
+        shared = frame_store.get(file_path)
+        if shared is not None:
+            logger.debug(f"Frame of {file_path} mapped from shared store")
+            return shared
+        
+        df, memory_report = self.compact_dataframe(self.read_file(file_path))
+        frame_store.put(file_path, df, memory_report)
+        return df, memory_report
+    
+    @stage("compact")
+    def compact_dataframe(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Réduit l'empreinte mémoire d'un DataFrame sans modifier ses valeurs
+        
+        Entiers réduits au plus petit type, flottants entiers convertis en entiers nullables,
+        dates textuelles analysées une seule fois, texte peu varié en catégories et
+        texte restant en chaînes Arrow
+        """
+        memory_before = int(df.memory_usage(deep=True).sum())
+        df = df.copy(deep=False)
+        converted = {}
+        
+        for column in df.columns:
+            series = df[column]
+            compacted = self._compact_series(series)
+            if compacted is not series:
+                converted[column] = f"{series.dtype} -> {compacted.dtype}"
+                df[column] = compacted
+        
+        memory_after = int(df.memory_usage(deep=True).sum())
+        report = {
+            "before_mb": round(memory_before / (1024 * 1024), 3),
+            "after_mb": round(memory_after / (1024 * 1024), 3),
+            "reduction_pct": round((1 - memory_after / memory_before) * 100, 1) if memory_before else 0.0,
+            "converted_columns": converted
+        }
+        logger.debug(f"DataFrame compacted from {report['before_mb']} MB to {report['after_mb']} MB")
+        return df, report
+    
+    def _compact_series(self, series: pd.Series) -> pd.Series:
+        """Type le plus compact d'une colonne (la série d'origine si aucune conversion ne s'applique)"""
+        dtype = series.dtype
+        
+        if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+            return series
+        
+        if pd.api.types.is_integer_dtype(dtype):
+            downcast = "unsigned" if len(series) and series.min() >= 0 else "integer"
+            compacted = pd.to_numeric(series, downcast=downcast)
+            return compacted if compacted.dtype != dtype else series
+        
+        if pd.api.types.is_float_dtype(dtype):
+            # Les entiers avec valeurs manquantes sont lus en float64 : entier nullable si aucune perte
+            non_null = series.dropna()
+            if len(non_null) == 0 or not np.array_equal(non_null, np.floor(non_null)) or np.abs(non_null).max() >= 2**53:
+                return series
+            downcast = "unsigned" if non_null.min() >= 0 else "integer"
+            target = str(pd.to_numeric(non_null, downcast=downcast).dtype)
+            return series.astype(f"UInt{target[4:]}" if target.startswith("uint") else f"Int{target[3:]}")
+        
+        if not (pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)):
+            return series
+        
+        # Colonnes mixtes (nombres et texte, listes issues du JSON) laissées telles quelles
+        if pd.api.types.infer_dtype(series, skipna=True) != "string":
+            return series
+        
+        non_null_count = int(series.notna().sum())
+        if non_null_count == 0:
+            return series
+        
+        dates = self._parse_dates(series)
+        if dates is not None:
+            return dates
+        
+        if series.nunique() <= self.CATEGORY_MAX_UNIQUE_RATIO * non_null_count:
+            return series.astype("category")
+        
+        if ARROW_STRINGS_AVAILABLE and not (isinstance(dtype, pd.StringDtype) and dtype.storage == "pyarrow"):
+            return series.astype(pd.StringDtype("pyarrow"))
+        return series
+    
+    def _parse_dates(self, series: pd.Series) -> Optional[pd.Series]:
+        """Dates d'une colonne texte, si toutes ses valeurs renseignées en sont (None sinon)"""
+        non_null = series.dropna()
+        sample = non_null.head(self.DATE_SAMPLE_SIZE).astype(str).str.strip()
+        if not sample.str.match(self.DATE_PATTERN).all():
+            return None
+        
+        # Format déduit de l'échantillon puis appliqué à toute la colonne
+        # (jour en premier pour les exports français, sauf dates ISO commençant par l'année)
+        first_value = sample.iloc[0]
+        date_format = guess_datetime_format(first_value, dayfirst=not re.match(r'^\d{4}', first_value))
+        if date_format is None:
+            return None
+        dates = pd.to_datetime(series, format=date_format, errors="coerce")
+        if dates.notna().sum() != len(non_null):
+            return None
+        return dates
+    
+    @stage("missing_analysis")
     def analyze_missing_data(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Analyse les données manquantes"""
+        """Analyse les données manquantes et les valeurs invalides (format non conforme au type de contenu)"""
         missing_analysis = {}
         
         for column in df.columns:
             missing_count = df[column].isnull().sum()
-            missing_percentage = (missing_count / len(df)) * 100
             
             # Détection du type de données
             non_null_series = df[column].dropna()
             if len(non_null_series) > 0:
                 dtype = str(non_null_series.dtype)
                 sample_values = non_null_series.head(3).tolist()
+                if pd.api.types.is_datetime64_any_dtype(non_null_series):
+                    sample_values = [value.isoformat() for value in sample_values]
             else:
                 dtype = "unknown"
                 sample_values = []
             
-            missing_analysis[column] = {
-                "missing_count": int(missing_count),
-                "missing_percentage": round(missing_percentage, 2),
-                "total_rows": len(df),
-                "data_type": dtype,
-                "sample_values": sample_values,
-                "is_critical": missing_percentage > 50  # Plus de 50% manquant = critique
-            }
+            content_type, invalid_count = validator.validate(non_null_series, column)
+            missing_analysis[column] = self._missing_info(
+                int(missing_count), invalid_count, len(df), dtype, content_type, sample_values
+            )
         
         return missing_analysis
     
+    @staticmethod
+    def _missing_info(missing_count: int, invalid_count: int, total_rows: int, dtype: str,
+                      content_type: Optional[str], sample_values: List[Any]) -> Dict[str, Any]:
+        missing_percentage = (missing_count / total_rows) * 100 if total_rows else 0.0
+        invalid_percentage = (invalid_count / total_rows) * 100 if total_rows else 0.0
+        return {
+            "missing_count": missing_count,
+            "missing_percentage": round(missing_percentage, 2),
+            "invalid_count": invalid_count,
+            "invalid_percentage": round(invalid_percentage, 2),
+            "total_rows": total_rows,
+            "data_type": dtype,
+            "content_type": content_type,
+            "sample_values": sample_values,
+            # Plus de 50% de valeurs manquantes ou invalides = critique
+            "is_critical": bool(missing_percentage + invalid_percentage > 50)
+        }
+    
+    @stage("patterns")
     def detect_data_patterns(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Détecte des patterns dans les données"""
         patterns = {}
@@ -101,7 +325,7 @@ class FileAnalyzer:
             }
             
             # Analyse selon le type
-            if non_null_data.dtype == 'object':
+            if self._is_text(non_null_data):
                 # Données textuelles
                 most_common = non_null_data.value_counts().head(1)
                 if len(most_common) > 0:
@@ -110,41 +334,186 @@ class FileAnalyzer:
                         "count": int(most_common.iloc[0])
                     }
                 
-                # Détection de patterns spécifiques
-                if column.lower() in ['email', 'mail', 'e-mail']:
-                    pattern_info["pattern_type"] = "email"
-                elif column.lower() in ['phone', 'telephone', 'tel']:
-                    pattern_info["pattern_type"] = "phone"
-                elif column.lower() in ['address', 'adresse', 'addr']:
-                    pattern_info["pattern_type"] = "address"
-                elif column.lower() in ['website', 'site', 'url']:
-                    pattern_info["pattern_type"] = "url"
-                else:
-                    pattern_info["pattern_type"] = "text"
+                # Détection de patterns spécifiques (nom de la colonne et échantillon des valeurs)
+                pattern_info["pattern_type"] = validator.infer_type(non_null_data, column) or "text"
             
             elif pd.api.types.is_numeric_dtype(non_null_data):
-                # Données numériques
-                pattern_info["pattern_type"] = "numeric"
+                # Données numériques (identifiants et codes lus comme nombres)
+                pattern_info["pattern_type"] = validator.infer_type(non_null_data, column) or "numeric"
                 pattern_info["min_value"] = float(non_null_data.min())
                 pattern_info["max_value"] = float(non_null_data.max())
                 pattern_info["mean"] = float(non_null_data.mean())
             
+            elif pd.api.types.is_datetime64_any_dtype(non_null_data):
+                # Dates analysées lors du chargement
+                pattern_info["pattern_type"] = "date"
+                pattern_info["min_value"] = non_null_data.min().isoformat()
+                pattern_info["max_value"] = non_null_data.max().isoformat()
+            
             patterns[column] = pattern_info
         
         return patterns
     
+    @stage("column_stats")
+    def update_csv_stats(self, file_path: str, previous_state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Statistiques fusionnables des colonnes d'un CSV, avec la position et l'empreinte du contenu analysé
+        Si le contenu analysé précédemment n'a pas changé, seules les lignes ajoutées sont lues et fusionnées
+        
+        Returns:
+            État (columns, rows, offset, prefix_hash, delimiter), complété de mode
+            (full, incremental, unchanged), rows_appended et memory (rapport de compaction des lignes lues)
+        """
+        size = os.path.getsize(file_path)
+        
+        if self._can_resume(file_path, size, previous_state):
+            # Colonnes persistées sous forme de paires (nom, statistiques) : JSONB ne conserve pas l'ordre des clés
+            previous_state = {**previous_state, "columns": dict(previous_state["columns"])}
+            offset = previous_state["offset"]
+            digest = _file_digest(file_path, 0, offset)
+            if digest.hexdigest() == previous_state["prefix_hash"]:
+                if size == offset:
+                    return {**previous_state, "mode": "unchanged", "rows_appended": 0, "memory": None}
+                
+                tail, memory_report = self._read_tail_as(file_path, offset, previous_state)
+                # Types de contenu de l'analyse précédente imposés aux lignes ajoutées
+                content_types = {column: stats["content_type"] for column, stats in previous_state["columns"].items()
+                                 if stats["kind"] != "empty"}
+                columns = merge_frame_stats(previous_state["columns"], compute_frame_stats(tail, content_types))
+                if columns is not None:
+                    _update_digest(digest, file_path, offset, size)
+                    logger.info(f"Incremental analysis of {file_path}: {len(tail)} appended rows")
+                    return {
+                        **self._csv_state(columns, previous_state["rows"] + len(tail), size, digest.hexdigest(),
+                                          previous_state["delimiter"]),
+                        "mode": "incremental",
+                        "rows_appended": len(tail),
+                        "memory": memory_report
+                    }
+                logger.info(f"Appended rows of {file_path} change column types, full re-analysis")
+            else:
+                logger.info(f"Previously analyzed content of {file_path} changed, full re-analysis")
+        
+        df, memory_report = self.load_file(file_path)
+        return {
+            **self._csv_state(compute_frame_stats(df), len(df), size, _file_digest(file_path, 0, size).hexdigest(),
+                              self.detect_delimiter(file_path)),
+            "mode": "full",
+            "rows_appended": None,
+            "memory": memory_report
+        }
+    
+    def _read_tail_as(self, file_path: str, offset: int,
+                      previous_state: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Lignes ajoutées compactées puis ramenées à la nature des colonnes de l'analyse précédente : des lignes
+        ajoutées ne contenant que des dates ou des nombres dans une colonne de texte restent du texte
+        """
+        kinds = {column: stats["kind"] for column, stats in previous_state["columns"].items()}
+        text_columns = [column for column, kind in kinds.items() if kind == "text"]
+        raw = self.read_csv_tail(file_path, offset, previous_state["delimiter"], text_columns)
+        tail, memory_report = self.compact_dataframe(raw)
+        for column in text_columns:
+            if column in tail.columns and column_kind(tail[column].dropna()) != "text":
+                tail[column] = raw[column].astype(pd.StringDtype("pyarrow") if ARROW_STRINGS_AVAILABLE else object)
+        return tail, memory_report
+    
+    @staticmethod
+    def _csv_state(columns: Dict[str, Any], rows: int, offset: int, prefix_hash: str,
+                   delimiter: Optional[str]) -> Dict[str, Any]:
+        return {
+            "version": INCREMENTAL_STATE_VERSION,
+            "columns": columns,
+            "rows": rows,
+            "offset": offset,
+            "prefix_hash": prefix_hash,
+            "delimiter": delimiter
+        }
+    
+    @staticmethod
+    def _can_resume(file_path: str, size: int, state: Optional[Dict[str, Any]]) -> bool:
+        """Reprise possible : état compatible, fichier au moins aussi long, contenu analysé terminé par une fin de ligne"""
+        if not state or state.get("version") != INCREMENTAL_STATE_VERSION or not state.get("delimiter"):
+            return False
+        offset = state.get("offset", 0)
+        if offset <= 0 or size < offset:
+            return False
+        with open(file_path, 'rb') as f:
+            f.seek(offset - 1)
+            return f.read(1) == b"\n"
+    
+    def missing_analysis_from_stats(self, stats: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Équivalent de analyze_missing_data à partir des statistiques de colonnes"""
+        missing_analysis = {}
+        
+        for column, column_stats in stats.items():
+            missing_analysis[column] = self._missing_info(
+                column_stats["missing"], column_stats["invalid"], column_stats["count"], column_stats["dtype"],
+                column_stats["content_type"], column_stats["samples"]
+            )
+        
+        return missing_analysis
+    
+    def patterns_from_stats(self, stats: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Équivalent de detect_data_patterns à partir des statistiques de colonnes
+        (valeurs distinctes estimées au-delà de la limite de comptage exact après une fusion)
+        """
+        patterns = {}
+        
+        for column, column_stats in stats.items():
+            kind = column_stats["kind"]
+            if kind == "empty":
+                continue
+            
+            pattern_info = {
+                "unique_values": column_stats["distinct"],
+                "most_common": None,
+                "pattern_type": "unknown"
+            }
+            
+            if kind in ("text", "other"):
+                top = most_common(column_stats)
+                if top:
+                    pattern_info["most_common"] = {"value": top[0], "count": top[1]}
+                pattern_info["pattern_type"] = column_stats["content_type"] or "text"
+            
+            elif kind == "numeric":
+                pattern_info["pattern_type"] = column_stats["content_type"] or "numeric"
+                pattern_info["min_value"] = column_stats["min"]
+                pattern_info["max_value"] = column_stats["max"]
+                pattern_info["mean"] = column_stats["sum"] / (column_stats["count"] - column_stats["missing"])
+            
+            elif kind == "date":
+                pattern_info["pattern_type"] = "date"
+                pattern_info["min_value"] = column_stats["min"]
+                pattern_info["max_value"] = column_stats["max"]
+            
+            patterns[column] = pattern_info
+        
+        return patterns
+    
+    @staticmethod
+    def _is_text(series: pd.Series) -> bool:
+        """Colonne textuelle : objet, chaînes (y compris Arrow) ou catégories"""
+        dtype = series.dtype
+        return (pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+                or isinstance(dtype, pd.CategoricalDtype))
+    
+    @stage("suggestions")
     def generate_enrichment_suggestions(self, missing_analysis: Dict, patterns: Dict) -> List[Dict]:
         """Génère des suggestions d'enrichissement"""
         suggestions = []
         
         for column, missing_info in missing_analysis.items():
-            if missing_info["missing_count"] > 0:
+            if missing_info["missing_count"] > 0 or missing_info.get("invalid_count", 0) > 0:
                 pattern_info = patterns.get(column, {})
                 pattern_type = pattern_info.get("pattern_type", "unknown")
                 
                 suggestion = {
                     "column": column,
                     "missing_count": missing_info["missing_count"],
+                    "invalid_count": missing_info.get("invalid_count", 0),
                     "priority": "high" if missing_info["is_critical"] else "medium",
                     "suggested_actions": []
                 }
@@ -174,6 +543,18 @@ class FileAnalyzer:
                         "Check domain variations",
                         "Use web directory services"
                     ]
+                elif pattern_type in ("siret", "siren"):
+                    suggestion["suggested_actions"] = [
+                        "Search the SIRENE directory (INSEE) by company name",
+                        "Check the check digit of existing identifiers",
+                        "Search official business registries"
+                    ]
+                elif pattern_type == "postcode":
+                    suggestion["suggested_actions"] = [
+                        "Use geocoding services",
+                        "Derive from the city name (official postcode database)",
+                        "Search official business registries"
+                    ]
                 else:
                     suggestion["suggested_actions"] = [
                         f"Web search for '{column}' information",
@@ -188,6 +569,92 @@ class FileAnalyzer:
 # Instance globale de l'analyseur
 analyzer = FileAnalyzer()
 
+def _file_digest(file_path: str, start: int, end: int) -> "hashlib._Hash":
+    """Empreinte SHA-256 des octets [start, end[ d'un fichier"""
+    return _update_digest(hashlib.sha256(), file_path, start, end)
+
+def _update_digest(digest, file_path: str, start: int, end: int):
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest
+
+def _analyze_frame(file_path: str, detailed: bool,
+                   previous_state: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Analyse du DataFrame d'un fichier, exécutée dans le pool de processus s'il est activé
+    Seuls le chemin, l'état précédent et le résultat sont échangés : le DataFrame est lu depuis le FrameStore
+    
+    Les CSV sont analysés à partir de statistiques fusionnables (retournées pour être persistées) :
+    une nouvelle livraison complétée en fin de fichier n'est lue qu'à partir de la fin de l'analyse précédente
+    """
+    file_type = analyzer.detect_file_type(file_path)
+    state = None
+    
+    if file_type == '.csv':
+        state = analyzer.update_csv_stats(file_path, previous_state)
+        stats = state.pop("columns")
+        memory_report = state.pop("memory")
+        rows_count = state["rows"]
+        columns = list(stats)
+        missing_analysis = analyzer.missing_analysis_from_stats(stats)
+    else:
+        # Lecture du fichier (DataFrame compacté pour toutes les étapes suivantes)
+        df, memory_report = analyzer.load_file(file_path)
+        rows_count = len(df)
+        columns = list(df.columns)
+        missing_analysis = analyzer.analyze_missing_data(df)
+    
+    # Informations de base
+    basic_info = {
+        "file_path": file_path,
+        "file_type": file_type,
+        "rows_count": rows_count,
+        "columns_count": len(columns),
+        "columns": columns,
+        "memory": memory_report,
+        "analysis_timestamp": datetime.now().isoformat()
+    }
+    if state is not None:
+        basic_info["analysis_mode"] = state.pop("mode")
+        basic_info["rows_appended"] = state.pop("rows_appended")
+        state["columns"] = list(stats.items())
+    
+    # Résumé des données manquantes
+    total_missing = sum(info["missing_count"] for info in missing_analysis.values())
+    total_invalid = sum(info["invalid_count"] for info in missing_analysis.values())
+    critical_columns = [col for col, info in missing_analysis.items() if info["is_critical"]]
+    total_cells = rows_count * len(columns)
+    
+    result = {
+        "basic_info": basic_info,
+        "missing_data_summary": {
+            "total_missing_values": total_missing,
+            "columns_with_missing": len([col for col, info in missing_analysis.items() if info["missing_count"] > 0]),
+            "total_invalid_values": total_invalid,
+            "columns_with_invalid": len([col for col, info in missing_analysis.items() if info["invalid_count"] > 0]),
+            "critical_columns": critical_columns,
+            "completion_rate": round(((total_cells - total_missing) / total_cells) * 100, 2) if total_cells else 100.0
+        },
+        "missing_data_details": missing_analysis
+    }
+    
+    # Analyse détaillée si demandée
+    if detailed:
+        patterns = analyzer.patterns_from_stats(stats) if state is not None else analyzer.detect_data_patterns(df)
+        suggestions = analyzer.generate_enrichment_suggestions(missing_analysis, patterns)
+        
+        result["data_patterns"] = patterns
+        result["enrichment_suggestions"] = suggestions
+    
+    return result, state
+
 def analyze_file(file_path: str, detailed: bool = False) -> Dict[str, Any]:
     """
     Analyse un fichier et identifie les données manquantes
@@ -200,44 +667,21 @@ def analyze_file(file_path: str, detailed: bool = False) -> Dict[str, Any]:
         Dict contenant l'analyse complète du fichier
     """
     try:
-        # Lecture du fichier
-        df = analyzer.read_file(file_path)
+        # Statistiques de l'analyse précédente (reprise d'un CSV complété)
+        previous_state = load_analysis_state(file_path) if file_path.lower().endswith('.csv') else None
+        result, state = run_in_process(_analyze_frame, file_path, detailed, previous_state)
+        basic_info = result["basic_info"]
         
-        # Informations de base
-        basic_info = {
-            "file_path": file_path,
-            "file_type": analyzer.detect_file_type(file_path),
-            "rows_count": len(df),
-            "columns_count": len(df.columns),
-            "columns": list(df.columns),
-            "analysis_timestamp": datetime.now().isoformat()
-        }
-        
-        # Analyse des données manquantes
-        missing_analysis = analyzer.analyze_missing_data(df)
-        
-        # Résumé des données manquantes
-        total_missing = sum(info["missing_count"] for info in missing_analysis.values())
-        critical_columns = [col for col, info in missing_analysis.items() if info["is_critical"]]
-        
-        result = {
-            "basic_info": basic_info,
-            "missing_data_summary": {
-                "total_missing_values": total_missing,
-                "columns_with_missing": len([col for col, info in missing_analysis.items() if info["missing_count"] > 0]),
-                "critical_columns": critical_columns,
-                "completion_rate": round(((len(df) * len(df.columns) - total_missing) / (len(df) * len(df.columns))) * 100, 2)
-            },
-            "missing_data_details": missing_analysis
-        }
-        
-        # Analyse détaillée si demandée
-        if detailed:
-            patterns = analyzer.detect_data_patterns(df)
-            suggestions = analyzer.generate_enrichment_suggestions(missing_analysis, patterns)
-            
-            result["data_patterns"] = patterns
-            result["enrichment_suggestions"] = suggestions
+        # Persistance du résultat (et des statistiques fusionnables) dans files_processed
+        with stage("persist"):
+            file_id = persist_analysis(
+                file_path,
+                {**result, "incremental_state": state} if state else result,
+                file_size=Path(file_path).stat().st_size,
+                file_type=basic_info["file_type"]
+            )
+        if file_id is not None:
+            basic_info["file_id"] = file_id
         
         logger.info(f"File analysis completed for {file_path}")
         return result
@@ -250,32 +694,300 @@ def analyze_file(file_path: str, detailed: bool = False) -> Dict[str, Any]:
             "success": False
         }
 
-def enrich_file(file_path: str, missing_fields: List[str]) -> Dict[str, Any]:
+def _row_index(file_path: str, key_columns: Optional[List[str]] = None) -> RowIndex:
+    """Index des lignes de la version actuelle d'un fichier (relu à côté du fichier s'il est à jour)"""
+    version = file_version(file_path)
+    stored = RowIndex.load(index_path(file_path))
+    if stored is not None and stored.is_current(version) and (
+            stored.key_columns == key_columns or (key_columns is None and stored.metadata.get("key_detected"))):
+        return stored
+    
+    df, _ = analyzer.load_file(file_path)
+    if key_columns is None:
+        index = RowIndex.build(df, detect_key_columns(df), version, key_detected=True)
+    else:
+        index = RowIndex.build(df, key_columns, version)
+    index.save(index_path(file_path))
+    return index
+
+def _compare_versions(file_path: str, previous_file_path: Optional[str] = None,
+                      key_columns: Optional[List[str]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Changements d'un fichier par rapport à une version précédente : un autre fichier (livraison précédente)
+    ou, sans previous_file_path, la version du même fichier indexée lors du dernier appel
+    Sans version précédente indexée, toutes les lignes sont considérées comme ajoutées
+    
+    Returns:
+        Changements (positions des lignes, voir diff_indexes) et description des deux versions
+    """
+    analyzer.detect_file_type(file_path)
+    if isinstance(key_columns, str):
+        key_columns = [key_columns]
+    same_file = previous_file_path is None or Path(previous_file_path).resolve() == Path(file_path).resolve()
+    if same_file:
+        # Lu avant la reconstruction de l'index, qui le remplace
+        previous = RowIndex.load(index_path(file_path))
+    else:
+        previous = _row_index(previous_file_path, key_columns)
+    if previous is not None:
+        key_columns = key_columns or previous.key_columns
+    
+    current = _row_index(file_path, key_columns)
+    if previous is None:
+        changes = {
+            "inserted": np.arange(len(current)),
+            "deleted": np.array([], dtype=np.int64),
+            "modified": np.array([], dtype=np.int64),
+            "unchanged": 0,
+            "columns_added": current.columns,
+            "columns_removed": []
+        }
+    else:
+        changes = diff_indexes(previous, current)
+    
+    versions = {
+        "key_columns": current.key_columns,
+        "previous_file_path": previous_file_path or file_path,
+        "previous_rows": len(previous) if previous is not None else 0,
+        "previous_indexed_at": previous.metadata.get("indexed_at") if previous is not None else None,
+        "rows": len(current),
+        # Lignes appariées par ordre d'apparition de leur clé : clé peu discriminante si nombreuses
+        "duplicate_keys": current.metadata.get("duplicate_keys", 0),
+        "current": current,
+        "previous": previous
+    }
+    return changes, versions
+
+def _diff_versions(file_path: str, previous_file_path: Optional[str], key_columns: Optional[List[str]],
+                   limit: int) -> Dict[str, Any]:
+    """Résumé des changements avec les premières lignes de chaque catégorie (exécuté dans le pool)"""
+    changes, versions = _compare_versions(file_path, previous_file_path, key_columns)
+    current, previous = versions.pop("current"), versions.pop("previous")
+    
+    def rows(positions: np.ndarray, index: RowIndex) -> List[Dict[str, Any]]:
+        return [{"row": int(position), "key": index.keys[position]} for position in positions[:limit]]
+    
+    return {
+        "file_path": file_path,
+        **versions,
+        "summary": {
+            "inserted": len(changes["inserted"]),
+            "deleted": len(changes["deleted"]),
+            "modified": len(changes["modified"]),
+            "unchanged": changes["unchanged"]
+        },
+        "columns_added": changes["columns_added"],
+        "columns_removed": changes["columns_removed"],
+        "inserted": rows(changes["inserted"], current),
+        "deleted": rows(changes["deleted"], previous) if previous is not None else [],
+        "modified": rows(changes["modified"], current),
+        "truncated": any(len(changes[name]) > limit for name in ("inserted", "deleted", "modified"))
+    }
+
+def _rows_to_enrich(file_path: str, previous_file_path: Optional[str],
+                    key_columns: Optional[List[str]]) -> Tuple[np.ndarray, Dict[str, Any]]:
+    changes, versions = _compare_versions(file_path, previous_file_path, key_columns)
+    rows = np.sort(np.concatenate([changes["inserted"], changes["modified"]]))
+    summary = {
+        "key_columns": versions["key_columns"],
+        "previous_file_path": versions["previous_file_path"],
+        "inserted": len(changes["inserted"]),
+        "modified": len(changes["modified"]),
+        "deleted": len(changes["deleted"]),
+        "unchanged": changes["unchanged"]
+    }
+    return rows, summary
+
+def _resolve_known_entities(file_path: str, df: pd.DataFrame, rows: np.ndarray,
+                            fields: List[str]) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    """
+    Cellules manquantes complétées par l'index des entités déjà enrichies (même entreprise dans une autre
+    ligne ou un autre fichier) : seules les cellules restantes sont à rechercher sur le web
+    
+    Returns:
+        Résumé par champ et cellules résolues (row, field_name, value, confidence, source, entity_id, match)
+    """
+    missing = {
+        field: rows[df[field].isnull().to_numpy()[rows]] if field in df.columns else rows
+        for field in fields
+    }
+    cells_missing = sum(len(positions) for positions in missing.values())
+    summary = {"cells_missing": cells_missing, "cells_resolved": 0, "cells_to_fetch": cells_missing,
+               "by_field": {}, "matches": {}}
+    positions = np.unique(np.concatenate(list(missing.values()))) if fields else rows[:0]
+    if len(positions) == 0:
+        return summary, entity_index.resolve(df, positions, fields)
+    
+    # Index rechargé seulement s'il a changé, intégration des nouveaux enrichissements en arrière-plan
+    try:
+        entity_index.refresh()
+        entity_index.sync_in_background(lambda path: analyzer.load_file(path)[0])
+    except Exception as e:
+        logger.warning(f"Entity index not refreshed, using loaded entities: {str(e)}")
+    
+    resolved = entity_index.resolve(df, positions, fields)
+    # Valeurs retenues pour les seules cellules manquantes de chaque champ
+    wanted = pd.concat([pd.DataFrame({"row": positions, "field_name": field}) for field, positions in missing.items()])
+    resolved = resolved.merge(wanted, on=["row", "field_name"])
+    
+    for field, positions in missing.items():
+        count = int((resolved["field_name"] == field).sum())
+        summary["by_field"][field] = {"missing": len(positions), "resolved": count,
+                                      "to_fetch": len(positions) - count}
+    summary["cells_resolved"] = len(resolved)
+    summary["cells_to_fetch"] = cells_missing - len(resolved)
+    summary["matches"] = {match: int(count) for match, count in resolved["match"].value_counts().items()}
+    
+    file_id = get_file_id(file_path)
+    if file_id is not None and len(resolved):
+        keys = source_keys(df, np.unique(resolved["row"].to_numpy()))
+        record_enrichments(
+            (file_id, row.field_name, int(row.row), None, row.value, row.source, round(float(row.confidence), 4),
+             "entity_index", keys.get(row.row))
+            for row in resolved.itertuples(index=False)
+        )
+        # Historique visible des agrégats et de l'index des entités dès la fin de l'appel
+        flush_enrichments()
+    return summary, resolved
+
+def _enriched_frame(frame: pd.DataFrame, resolved: pd.DataFrame, fields: List[str]) -> pd.DataFrame:
+    """
+    Colonnes d'un bloc du fichier produit : champs absents ajoutés, champs recevant des valeurs convertis en texte
+    (nombres recevant du texte) ; les autres colonnes ne sont pas copiées
+    """
+    frame = frame.copy(deep=False)
+    text_dtype = "str" if ARROW_STRINGS_AVAILABLE else object
+    for field in fields:
+        values = resolved.loc[resolved["field_name"] == field, "value"]
+        if field not in frame.columns:
+            frame[field] = pd.Series(pd.NA, index=frame.index, dtype=text_dtype)
+        elif len(values) and not pd.api.types.is_string_dtype(frame[field].dtype):
+            numeric = pd.api.types.is_numeric_dtype(frame[field].dtype) and not pd.api.types.is_bool_dtype(frame[field].dtype)
+            if not numeric or pd.to_numeric(values, errors="coerce").isna().any():
+                frame[field] = frame[field].astype(text_dtype)
+            elif not pd.api.types.is_float_dtype(frame[field].dtype):
+                frame[field] = frame[field].astype("float64")
+    return frame
+
+@stage("write_output")
+def _write_enriched_file(file_path: str, df: pd.DataFrame, resolved: pd.DataFrame, fields: List[str],
+                         output_path: str) -> Dict[str, Any]:
+    """
+    Écrit le fichier enrichi par blocs de CHUNK_ROWS lignes relus depuis le fichier source : les cellules
+    d'origine sont recopiées telles quelles (sans les conversions du DataFrame compacté), seules les cellules
+    enrichies sont remplacées
+    """
+    delimiter = None
+    if analyzer.detect_file_type(file_path) == '.csv':
+        delimiter = analyzer.detect_delimiter(file_path)
+    
+    cells = resolved.sort_values("row", kind="stable").assign(method="entity_index")
+    cell_rows = cells["row"].to_numpy()
+    columns = list(df.columns) + [field for field in fields if field not in df.columns]
+    positions = {column: position for position, column in enumerate(columns)}
+    
+    start_time = datetime.now()
+    start = 0
+    with open_writer(output_path, columns, delimiter) as writer:
+        for chunk in analyzer.read_original_chunks(file_path, CHUNK_ROWS):
+            end = start + len(chunk)
+            chunk = _enriched_frame(chunk, cells, fields).reset_index(drop=True)
+            if list(chunk.columns) != columns:
+                raise ValueError(f"Columns of {file_path} changed since it was loaded")
+            first, last = np.searchsorted(cell_rows, [start, end])
+            enriched = cells.iloc[first:last].assign(row=lambda block: block["row"] - start)
+            for field, values in enriched.groupby("field_name", sort=False):
+                converted = values["value"]
+                if pd.api.types.is_float_dtype(chunk[field].dtype):
+                    converted = pd.to_numeric(converted)
+                chunk.iloc[values["row"].to_numpy(), positions[field]] = converted.to_numpy()
+            writer.write(chunk, enriched)
+            start = end
+    
+    if start != len(df):
+        logger.warning(f"{file_path} has {start} rows, {len(df)} were loaded for enrichment")
+    stats = writer.get_stats()
+    stats["file_size"] = os.path.getsize(output_path)
+    stats["seconds"] = round((datetime.now() - start_time).total_seconds(), 3)
+    return stats
+
+def diff_file_versions(file_path: str, previous_file_path: Optional[str] = None,
+                       key_columns: Optional[List[str]] = None, limit: int = 100) -> Dict[str, Any]:
+    """
+    Compare deux versions d'un jeu de données ligne à ligne, par clé
+    
+    Args:
+        file_path: Chemin vers la nouvelle version
+        previous_file_path: Chemin vers la version précédente (défaut : version de file_path indexée lors
+            du dernier appel, avant son remplacement)
+        key_columns: Colonnes identifiant une ligne (défaut : colonne d'identifiant unique, SIRET par exemple)
+        limit: Nombre maximum de lignes retournées par catégorie
+    
+    Returns:
+        Dict avec le nombre de lignes ajoutées, supprimées, modifiées et inchangées et les premières d'entre elles
+    """
+    try:
+        result = run_in_process(_diff_versions, file_path, previous_file_path, key_columns, limit)
+        logger.info(f"Version diff completed for {file_path}: {result['summary']}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error comparing versions of {file_path}: {str(e)}")
+        return {
+            "error": str(e),
+            "file_path": file_path,
+            "success": False
+        }
+
+def enrich_file(file_path: str, missing_fields: List[str], only_changed: bool = False,
+                previous_file_path: Optional[str] = None, key_columns: Optional[List[str]] = None,
+                output_path: Optional[str] = None) -> Dict[str, Any]:
     """
     Enrichit un fichier avec des données manquantes
     
     Args:
         file_path: Chemin vers le fichier à enrichir
         missing_fields: Liste des champs à enrichir
+        only_changed: Si True, seules les lignes ajoutées ou modifiées depuis la version précédente
+            sont enrichies (voir diff_file_versions)
+        previous_file_path: Version précédente déjà enrichie (défaut : dernière version indexée de file_path)
+        key_columns: Colonnes identifiant une ligne
+        output_path: Fichier enrichi à produire (.xlsx, .csv, .tsv, .json, .ndjson, .jsonl, .parquet),
+            avec la provenance des cellules enrichies (colonne _enrichment)
     
     Returns:
         Dict contenant le résultat de l'enrichissement
     """
     try:
-        # Pour l'instant, on retourne une structure de base
-        # L'enrichissement réel sera implémenté avec les scrapers
-        
-        df = analyzer.read_file(file_path)
+        df, _ = analyzer.load_file(file_path)
         
         result = {
             "file_path": file_path,
             "fields_to_enrich": missing_fields,
             "original_rows": len(df),
-            "enrichment_status": "pending",
-            "message": "Enrichment functionality will be implemented with web scrapers",
+            "rows_to_enrich": len(df),
             "timestamp": datetime.now().isoformat()
         }
         
+        rows = np.arange(len(df))
+        if only_changed:
+            rows, changes = run_in_process(_rows_to_enrich, file_path, previous_file_path, key_columns)
+            result["rows_to_enrich"] = len(rows)
+            result["skipped_unchanged_rows"] = changes["unchanged"]
+            result["changes"] = changes
+        
+        resolution, resolved = _resolve_known_entities(file_path, df, rows, missing_fields)
+        result["entity_resolution"] = resolution
+        # Cellules non résolues par l'index des entités : à rechercher sur le web
+        result["enrichment_status"] = "completed" if resolution["cells_to_fetch"] == 0 else "pending"
+        message = (f"{resolution['cells_resolved']} of {resolution['cells_missing']} missing cells resolved "
+                   f"from known entities, {resolution['cells_to_fetch']} left to fetch")
+        
+        if output_path:
+            result["output"] = _write_enriched_file(file_path, df, resolved, missing_fields, output_path)
+            message += f"; enriched file written to {output_path}"
+        result["message"] = message
+        
         logger.info(f"Enrichment request processed for {file_path}")
         return result
         
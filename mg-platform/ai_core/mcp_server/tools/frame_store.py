@@ -0,0 +1,166 @@
+"""
+Stockage partagé des DataFrames chargés
+Chaque fichier analysé est conservé au format Arrow IPC (non compressé) en mémoire partagée (/dev/shm) ;
+les processus (workers uvicorn, pool d'analyse) l'ouvrent par projection mémoire au lieu de relire le fichier
+source ou de recevoir une copie sérialisée du DataFrame
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = "/dev/shm/mg_frames" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "mg_frames")
+
+# Rapport de compaction enregistré dans les métadonnées du schéma Arrow
+REPORT_METADATA_KEY = b"mg_frame_report"
+
+
+class FrameStore:
+    """DataFrames compactés indexés par fichier source (chemin, date de modification et taille)"""
+
+    def __init__(self, directory: Optional[str] = None, max_mb: Optional[float] = None):
+        """
+        Args:
+            directory: Répertoire des fichiers Arrow (de préférence sur un tmpfs)
+            max_mb: Taille totale au-delà de laquelle les entrées les moins récemment utilisées sont supprimées
+                (0 désactive le stockage)
+        """
+        self.directory = Path(directory or os.getenv("MCP_FRAME_STORE_DIR") or DEFAULT_DIRECTORY)
+        self.max_bytes = int((max_mb if max_mb is not None else float(os.getenv("MCP_FRAME_STORE_MAX_MB", "1024"))) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return pa is not None and self.max_bytes > 0
+
+    def _source_prefix(self, file_path: str) -> str:
+        return hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:20]
+
+    def _entry_path(self, file_path: str) -> Path:
+        """Entrée correspondant à la version actuelle du fichier (une modification change le nom)"""
+        stat = os.stat(file_path)
+        return self.directory / f"{self._source_prefix(file_path)}_{stat.st_mtime_ns:x}_{stat.st_size:x}.arrow"
+
+    def get(self, file_path: str) -> Optional[Tuple[pd.DataFrame, Dict[str, Any]]]:
+        """DataFrame projeté en mémoire et rapport de compaction (None si absent ou périmé)"""
+        if not self.enabled:
+            return None
+
+        try:
+            path = self._entry_path(file_path)
+            # La projection reste ouverte tant que des colonnes du DataFrame y font référence
+            table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+            os.utime(path)
+        except (OSError, pa.ArrowInvalid):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        metadata = table.schema.metadata or {}
+        report = json.loads(metadata.get(REPORT_METADATA_KEY, b"{}"))
+        with self._lock:
+            self.hits += 1
+        # Un bloc par colonne : les colonnes numériques et dates sans valeur manquante restent des vues sur la
+        # projection (la consolidation en blocs 2D les copierait) ; entiers nullables copiés par pandas
+        return table.to_pandas(split_blocks=True, zero_copy_only=False), report
+
+    def put(self, file_path: str, df: pd.DataFrame, report: Dict[str, Any]) -> Optional[Path]:
+        """Enregistre le DataFrame d'un fichier (remplace les versions précédentes du même fichier)"""
+        if not self.enabled:
+            return None
+
+        try:
+            path = self._entry_path(file_path)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                REPORT_METADATA_KEY: json.dumps(report).encode("utf-8")
+            })
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with pa.OSFile(str(temporary), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(temporary, path)
+        except (OSError, pa.ArrowException) as e:
+            # Colonnes mixtes (listes JSON, nombres et texte) non représentables en Arrow
+            logger.warning(f"Frame of {file_path} not stored: {str(e)}")
+            return None
+
+        for stale in self.directory.glob(f"{self._source_prefix(file_path)}_*.arrow"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+        self._evict()
+        return path
+
+    def invalidate(self, file_path: str) -> int:
+        """Supprime toutes les versions stockées d'un fichier"""
+        removed = 0
+        for entry in self.directory.glob(f"{self._source_prefix(file_path)}_*.arrow"):
+            entry.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def clear(self) -> int:
+        removed = 0
+        for entry in self.directory.glob("*.arrow"):
+            entry.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def _entries(self):
+        entries = []
+        for entry in self.directory.glob("*.arrow"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        return entries
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de la taille maximale"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            # Les processus qui projettent encore ce fichier conservent leurs pages jusqu'à la fermeture
+            entry.unlink(missing_ok=True)
+            total -= size
+            logger.info(f"Frame {entry.name} evicted from store")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Entrées stockées (tous processus) et succès / échecs de lecture du processus courant"""
+        entries = self._entries() if self.enabled else []
+        return {
+            "enabled": self.enabled,
+            "directory": str(self.directory),
+            "entries": len(entries),
+            "size_mb": round(sum(size for _, size, _ in entries) / (1024 * 1024), 3),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 3),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Instance globale du stockage
+frame_store = FrameStore()
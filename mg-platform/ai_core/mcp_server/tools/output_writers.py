@@ -0,0 +1,353 @@
+"""
+Écriture en flux des fichiers enrichis
+Les lignes sont écrites bloc par bloc sans construire le fichier complet en mémoire : classeur Excel en mode
+write-only (lignes sérialisées au fil de l'eau), ajouts successifs en CSV et JSON, un groupe de lignes par bloc
+en Parquet
+
+Les cellules enrichies sont signalées par une colonne de provenance (champ, source, confiance, méthode) et,
+dans les classeurs Excel, par un fond coloré
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+except ImportError:
+    Workbook = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Colonne ajoutée aux fichiers produits : provenance des cellules enrichies de la ligne
+PROVENANCE_COLUMN = "_enrichment"
+# Lignes écrites par bloc (et par groupe de lignes Parquet)
+CHUNK_ROWS = 10000
+
+EXCEL_MAX_ROWS = 1048576
+EXCEL_ENRICHED_FILL = "E2EFDA"
+# Caractères de contrôle refusés dans les cellules Excel
+EXCEL_ILLEGAL_CHARACTERS = r"[\x00-\x08\x0b\x0c\x0e-\x1f]"
+
+
+def provenance_records(row_count: int, enriched: Optional[pd.DataFrame]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Provenance de chaque ligne d'un bloc : {champ: {source, confidence, method}} ou None si rien n'a été enrichi
+
+    Args:
+        enriched: Cellules enrichies du bloc (row relatif au bloc, field_name, source, confidence, method)
+    """
+    records: List[Optional[Dict[str, Any]]] = [None] * row_count
+    if enriched is None or enriched.empty:
+        return records
+    for row in enriched.itertuples(index=False):
+        cell = {
+            "source": row.source,
+            "confidence": round(float(row.confidence), 4),
+            "method": row.method
+        }
+        record = records[row.row]
+        if record is None:
+            records[row.row] = {row.field_name: cell}
+        else:
+            record[row.field_name] = cell
+    return records
+
+
+class OutputWriter:
+    """
+    Écriture d'un fichier par blocs de lignes, dans un fichier temporaire renommé à la fermeture
+    (un fichier interrompu ne remplace pas une version précédente)
+    """
+
+    format_name = ""
+
+    def __init__(self, path: str, columns: List[str]):
+        self.path = Path(path)
+        self.columns = [str(column) for column in columns]
+        self.temporary = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        self.rows = 0
+        self.enriched_cells = 0
+        self.chunks = 0
+
+    def __enter__(self) -> "OutputWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._close()
+            os.replace(self.temporary, self.path)
+        else:
+            self._abort()
+            self.temporary.unlink(missing_ok=True)
+        return False
+
+    def write(self, chunk: pd.DataFrame, enriched: Optional[pd.DataFrame] = None):
+        """
+        Écrit un bloc de lignes
+
+        Args:
+            chunk: Lignes du bloc, valeurs enrichies comprises (colonnes dans l'ordre de columns)
+            enriched: Cellules enrichies du bloc (row relatif au bloc, field_name, source, confidence, method)
+        """
+        chunk = chunk.set_axis(self.columns, axis=1)
+        self._write(chunk, provenance_records(len(chunk), enriched), enriched)
+        self.rows += len(chunk)
+        self.enriched_cells += 0 if enriched is None else len(enriched)
+        self.chunks += 1
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _write(self, chunk: pd.DataFrame, provenance: List[Optional[Dict[str, Any]]],
+               enriched: Optional[pd.DataFrame]):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+    def _abort(self):
+        """Libère les ressources sans finaliser le fichier"""
+        self._close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "format": self.format_name,
+            "rows": self.rows,
+            "enriched_cells": self.enriched_cells,
+            "chunks": self.chunks
+        }
+
+
+class CsvOutputWriter(OutputWriter):
+    """Ajouts successifs au fichier CSV (provenance sérialisée en JSON)"""
+
+    format_name = "csv"
+
+    def __init__(self, path: str, columns: List[str], delimiter: str = ","):
+        super().__init__(path, columns)
+        self.delimiter = delimiter
+        self._handle = None
+
+    def _open(self):
+        self._handle = open(self.temporary, "w", encoding="utf-8", newline="")
+
+    def _write(self, chunk, provenance, enriched):
+        chunk = chunk.assign(**{PROVENANCE_COLUMN: [
+            json.dumps(record, ensure_ascii=False) if record is not None else None for record in provenance
+        ]})
+        chunk.to_csv(self._handle, sep=self.delimiter, index=False, header=self.chunks == 0)
+
+    def _close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+class JsonOutputWriter(OutputWriter):
+    """Enregistrements JSON, un par ligne (NDJSON) ou dans un tableau écrit au fil des blocs"""
+
+    format_name = "json"
+
+    def __init__(self, path: str, columns: List[str], lines: bool = True):
+        super().__init__(path, columns)
+        self.lines = lines
+        self.format_name = "ndjson" if lines else "json"
+        self._handle = None
+
+    def _open(self):
+        self._handle = open(self.temporary, "w", encoding="utf-8")
+        if not self.lines:
+            self._handle.write("[\n")
+
+    def _write(self, chunk, provenance, enriched):
+        chunk = chunk.assign(**{PROVENANCE_COLUMN: provenance})
+        records = chunk.to_json(orient="records", lines=True, date_format="iso", force_ascii=False)
+        if self.lines:
+            self._handle.write(records)
+            return
+        if not len(chunk):
+            return
+        # Sauts de ligne des valeurs échappés par to_json : un enregistrement par ligne
+        if self.rows:
+            self._handle.write(",\n")
+        self._handle.write(",\n".join(records.rstrip("\n").split("\n")))
+
+    def _close(self):
+        if self._handle is not None:
+            if not self.lines:
+                self._handle.write("\n]\n")
+            self._handle.close()
+            self._handle = None
+
+    def _abort(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+class ParquetOutputWriter(OutputWriter):
+    """Un groupe de lignes par bloc (schéma fixé par le premier bloc)"""
+
+    format_name = "parquet"
+
+    def __init__(self, path: str, columns: List[str]):
+        if pa is None:
+            raise ImportError("pyarrow is required to write Parquet files")
+        super().__init__(path, columns)
+        self._writer = None
+        self._schema = None
+
+    def _open(self):
+        pass
+
+    def _write(self, chunk, provenance, enriched):
+        chunk = chunk.assign(**{PROVENANCE_COLUMN: [
+            json.dumps(record, ensure_ascii=False) if record is not None else None for record in provenance
+        ]})
+        if self._writer is None:
+            schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+            # Colonnes vides dans le premier bloc : texte (le type nul refuserait les blocs suivants)
+            for index, field in enumerate(schema):
+                if pa.types.is_null(field.type):
+                    schema = schema.set(index, field.with_type(pa.string()))
+            self._schema = schema
+            self._writer = pq.ParquetWriter(str(self.temporary), schema)
+        table = pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table, row_group_size=len(chunk) or None)
+
+    def _close(self):
+        if self._writer is None:
+            # Fichier sans ligne : schéma des seules colonnes, en texte
+            schema = pa.schema([(column, pa.string()) for column in self.columns + [PROVENANCE_COLUMN]])
+            self._writer = pq.ParquetWriter(str(self.temporary), schema)
+        self._writer.close()
+        self._writer = None
+
+
+class ExcelOutputWriter(OutputWriter):
+    """
+    Classeur en mode write-only : chaque ligne est sérialisée dès son ajout, seules les cellules enrichies
+    sont des objets cellule (fond coloré)
+    """
+
+    format_name = "xlsx"
+
+    def __init__(self, path: str, columns: List[str], sheet_name: str = "Data"):
+        if Workbook is None:
+            raise ImportError("openpyxl is required to write Excel files")
+        super().__init__(path, columns)
+        self.sheet_name = sheet_name
+        self._workbook = None
+        self._sheet = None
+
+    def _open(self):
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(self.sheet_name)
+        self._fill = PatternFill(fill_type="solid", start_color=EXCEL_ENRICHED_FILL, end_color=EXCEL_ENRICHED_FILL)
+        header = []
+        for column in self.columns + [PROVENANCE_COLUMN]:
+            cell = WriteOnlyCell(self._sheet, value=column)
+            cell.font = Font(bold=True)
+            header.append(cell)
+        self._sheet.append(header)
+
+    def _write(self, chunk, provenance, enriched):
+        if self.rows + len(chunk) > EXCEL_MAX_ROWS - 1:
+            raise ValueError(f"Excel sheets are limited to {EXCEL_MAX_ROWS - 1} data rows, "
+                             f"use a CSV or Parquet output")
+
+        styled: Dict[int, List[int]] = {}
+        if enriched is not None and not enriched.empty:
+            positions = pd.Index(self.columns).get_indexer(enriched["field_name"])
+            for row, column in zip(enriched["row"].to_numpy(), positions):
+                styled.setdefault(int(row), []).append(int(column))
+
+        for position, values in enumerate(self._cell_values(chunk)):
+            record = provenance[position]
+            values.append(json.dumps(record, ensure_ascii=False) if record is not None else None)
+            for column in styled.get(position, ()):
+                cell = WriteOnlyCell(self._sheet, value=values[column])
+                cell.fill = self._fill
+                values[column] = cell
+            self._sheet.append(values)
+
+    @staticmethod
+    def _cell_values(chunk: pd.DataFrame):
+        """Valeurs Python des lignes (manquantes : None, texte sans caractères de contrôle)"""
+        columns = []
+        for column in chunk.columns:
+            series = chunk[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype(object)
+            if pd.api.types.is_string_dtype(series.dtype) or pd.api.types.is_object_dtype(series.dtype):
+                text = series.astype(str)
+                series = series.where(series.isna(), text.str.replace(EXCEL_ILLEGAL_CHARACTERS, "", regex=True))
+            elif pd.api.types.is_datetime64_any_dtype(series.dtype) and series.dt.tz is not None:
+                # Excel ne stocke pas de fuseau horaire
+                series = series.dt.tz_localize(None)
+            values = series.astype(object).to_numpy(copy=True)
+            values[pd.isna(values)] = None
+            columns.append(values)
+        for row in zip(*columns):
+            yield [value.item() if isinstance(value, np.generic) else value for value in row]
+
+    def _close(self):
+        if self._workbook is not None:
+            self._workbook.save(str(self.temporary))
+            self._workbook = None
+
+    def _abort(self):
+        # Feuille terminée sans enregistrer le classeur, fichier temporaire des lignes supprimé
+        writer = getattr(self._sheet, "_writer", None)
+        try:
+            self._sheet.close()
+        except Exception as e:
+            logger.debug(f"Write-only sheet not closed: {str(e)}")
+        if writer is not None and isinstance(writer.out, str):
+            Path(writer.out).unlink(missing_ok=True)
+        self._workbook = None
+
+
+WRITERS = {
+    ".csv": CsvOutputWriter,
+    ".tsv": CsvOutputWriter,
+    ".ndjson": JsonOutputWriter,
+    ".jsonl": JsonOutputWriter,
+    ".json": JsonOutputWriter,
+    ".parquet": ParquetOutputWriter,
+    ".xlsx": ExcelOutputWriter
+}
+
+
+def open_writer(path: str, columns: List[str], delimiter: Optional[str] = None) -> OutputWriter:
+    """
+    Writer correspondant à l'extension du fichier produit
+
+    Args:
+        delimiter: Séparateur des fichiers CSV (défaut : virgule, tabulation pour .tsv)
+    """
+    extension = Path(path).suffix.lower()
+    if extension not in WRITERS:
+        raise ValueError(f"Unsupported output format: {extension or path} (supported: {', '.join(WRITERS)})")
+    if extension in (".csv", ".tsv"):
+        return CsvOutputWriter(path, columns, delimiter or ("\t" if extension == ".tsv" else ","))
+    if extension == ".json":
+        return JsonOutputWriter(path, columns, lines=False)
+    return WRITERS[extension](path, columns)
@@ -0,0 +1,100 @@
+"""
+Pool de processus pour les analyses de fichiers (pandas garde le GIL sur la plupart des opérations)
+Les tâches ne reçoivent que des chemins : les DataFrames transitent par le FrameStore (mémoire partagée),
+jamais par sérialisation entre le processus du serveur et les workers
+"""
+
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from observability.profiling import active_session, format_stack, run_profiled
+from observability.tracing import capture_spans, export_remote_spans, inject_context
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _initialize_worker():
+    """Journalisation des workers configurée comme celle du serveur"""
+    from observability.log_config import configure_logging
+    configure_logging()
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """Pool créé au premier usage (None si MCP_ANALYSIS_PROCESSES vaut 0 : exécution dans le thread appelant)"""
+    global _pool
+    processes = int(os.getenv("MCP_ANALYSIS_PROCESSES", "0"))
+    if processes <= 0:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            # spawn : le serveur est multi-thread, un fork pourrait hériter de verrous tenus
+            _pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initialize_worker
+            )
+            logger.info(f"Analysis process pool started ({processes} processes)")
+        return _pool
+
+
+def _run_instrumented(func: Callable, carrier: Mapping[str, str], profile_interval: Optional[float],
+                      args: Tuple, kwargs: Dict[str, Any]):
+    """
+    Exécution dans un worker sous le contexte de trace et le profilage de l'appelant
+    Retourne le résultat avec les étapes, les piles échantillonnées et les spans du worker
+    """
+    with capture_spans(carrier) as spans:
+        if profile_interval is None:
+            result, stages, samples = func(*args, **kwargs), [], {}
+        else:
+            result, stages, samples = run_profiled(func, profile_interval, *args, **kwargs)
+    return result, stages, samples, spans
+
+
+def run_in_process(func: Callable, *args, **kwargs) -> Any:
+    """
+    Exécute une fonction de niveau module dans le pool et attend son résultat
+    Les arguments et le résultat sont sérialisés : ils doivent rester petits (chemins, dictionnaires de résultats)
+    Un appel tracé ou profilé retrouve les spans et les étapes du worker dans la trace et le profil de l'appelant
+    """
+    pool = get_pool()
+    if pool is None:
+        return func(*args, **kwargs)
+
+    session = active_session()
+    carrier = inject_context()
+    try:
+        if session is None and not carrier:
+            return pool.submit(func, *args, **kwargs).result()
+
+        start_ms = session.elapsed_ms() if session else 0.0
+        result, stages, samples, spans = pool.submit(
+            _run_instrumented, func, carrier, session.interval if session else None, args, kwargs
+        ).result()
+        export_remote_spans(spans)
+        if session:
+            session.merge_remote(stages, samples, start_ms, format_stack(sys._getframe()))
+        return result
+    except BrokenProcessPool:
+        # Worker arrêté brutalement (mémoire insuffisante) : pool recréé au prochain appel
+        logger.error(f"Analysis process pool broken while running {func.__name__}, running in-process")
+        shutdown_pool()
+        return func(*args, **kwargs)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -5,13 +5,18 @@ Recherche et extraction d'informations depuis le web
 
 import requests
 import logging
-from typing import Dict, List, Any, Optional
+import os
+from typing import Any, Callable, Dict, List, Optional
 from urllib.parse import urljoin, urlparse
 import time
 import json
 from datetime import datetime
 import re
 from bs4 import BeautifulSoup
+from opentelemetry import propagate, trace
+
+from observability.profiling import stage
+from shared_state import get_state
 
 logger = logging.getLogger(__name__)
 
@@ -23,18 +28,30 @@ class WebScraper:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
-        self.request_delay = 1  # Délai entre les requêtes (en secondes)
-        self.last_request_time = 0
+        self.request_delay = float(os.getenv('SCRAPER_REQUEST_DELAY', '1'))  # Délai entre les requêtes (en secondes)
+        
+        # Fonctions appelées après chaque requête HTTP (hôte, durée en secondes, statut)
+        self.request_listeners: List[Callable[[str, float, str], None]] = []
+    
+    def add_request_listener(self, listener: Callable[[str, float, str], None]):
+        """Enregistre une fonction notifiée de la durée de chaque requête (ex: métriques)"""
+        self.request_listeners.append(listener)
+    
+    def _notify_request(self, url: str, duration: float, status: str):
+        """Transmet la durée d'une requête aux listeners sans jamais faire échouer le scraping"""
+        host = urlparse(url).netloc or "unknown"
+        for listener in self.request_listeners:
+            try:
+                listener(host, duration, status)
+            except Exception as e:
+                logger.warning(f"Request listener failed: {str(e)}")
     
     def _respect_rate_limit(self):
-        """Respecte les limites de fréquence des requêtes"""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        
-        if time_since_last_request < self.request_delay:
-            time.sleep(self.request_delay - time_since_last_request)
-        
-        self.last_request_time = time.time()
+        """Respecte les limites de fréquence des requêtes (sûr entre threads et entre workers)"""
+        # Réservation atomique du prochain créneau dans l'état partagé, attente hors verrou
+        delay = get_state().reserve_slot("scraper", self.request_delay)
+        if delay > 0:
+            time.sleep(delay)
     
     def search_google(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
         """
@@ -83,6 +100,34 @@ class WebScraper:
         
         return search_results
     
+    def fetch(self, url: str, timeout: float = 10) -> requests.Response:
+        """
+        Requête GET d'une URL (limite de fréquence, propagation de la trace, durée transmise aux listeners)
+        Lève requests.exceptions.RequestException si la requête échoue ou si le statut est une erreur
+        """
+        with stage("rate_limit"):
+            self._respect_rate_limit()
+        
+        with stage("fetch"):
+            span = trace.get_current_span()
+            span.set_attribute("http.url", url)
+            
+            # Propagation du contexte de trace (traceparent) vers le site appelé
+            headers = {}
+            propagate.inject(headers)
+            
+            request_start = time.perf_counter()
+            try:
+                response = self.session.get(url, timeout=timeout, headers=headers)
+            except requests.exceptions.RequestException:
+                self._notify_request(url, time.perf_counter() - request_start, "error")
+                raise
+            self._notify_request(url, time.perf_counter() - request_start, str(response.status_code))
+            span.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+        
+        return response
+    
     def scrape_url(self, url: str, extract_fields: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Scrape le contenu d'une URL spécifique
@@ -94,33 +139,32 @@ class WebScraper:
         Returns:
             Dict contenant le contenu extrait
         """
-        self._respect_rate_limit()
-        
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
+            response = self.fetch(url)
             
             # Parse HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
+            with stage("parse"):
+                soup = BeautifulSoup(response.content, 'html.parser')
             
             # Extraction basique du contenu
-            extracted_data = {
-                "url": url,
-                "title": self._extract_title(soup),
-                "description": self._extract_description(soup),
-                "text_content": self._extract_text_content(soup),
-                "links": self._extract_links(soup, url),
-                "images": self._extract_images(soup, url),
-                "metadata": self._extract_metadata(soup),
-                "extraction_timestamp": datetime.now().isoformat()
-            }
-            
-            # Extraction de champs spécifiques si demandé
-            if extract_fields:
-                specific_data = {}
-                for field in extract_fields:
-                    specific_data[field] = self._extract_specific_field(soup, field)
-                extracted_data["specific_fields"] = specific_data
+            with stage("extract"):
+                extracted_data = {
+                    "url": url,
+                    "title": self._extract_title(soup),
+                    "description": self._extract_description(soup),
+                    "text_content": self._extract_text_content(soup),
+                    "links": self._extract_links(soup, url),
+                    "images": self._extract_images(soup, url),
+                    "metadata": self._extract_metadata(soup),
+                    "extraction_timestamp": datetime.now().isoformat()
+                }
+                
+                # Extraction de champs spécifiques si demandé
+                if extract_fields:
+                    specific_data = {}
+                    for field in extract_fields:
+                        specific_data[field] = self._extract_specific_field(soup, field)
+                    extracted_data["specific_fields"] = specific_data
             
             logger.info(f"Successfully scraped content from: {url}")
             return extracted_data
@@ -0,0 +1,383 @@
+"""
+Analyseur de requêtes SQL pour le serveur MCP
+Tokenisation, validation lecture seule et gestion du LIMIT de la requête externe
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Types de tokens produits par le tokenizer
+WHITESPACE = "ws"
+COMMENT = "comment"
+STRING = "string"
+QUOTED_IDENT = "quoted_ident"
+WORD = "word"
+NUMBER = "number"
+PARAM = "param"
+PUNCT = "punct"
+OPERATOR = "op"
+
+_TOKEN_PATTERNS = [
+    (WHITESPACE, re.compile(r"\s+")),
+    (COMMENT, re.compile(r"--[^\n]*")),
+    (STRING, re.compile(r"[eE]'(?:[^'\\]|\\.|'')*'")),
+    (STRING, re.compile(r"(?:[bBxXnN]|[uU]&)?'(?:[^']|'')*'")),
+    (QUOTED_IDENT, re.compile(r'(?:[uU]&)?"(?:[^"]|"")*"')),
+    (NUMBER, re.compile(r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")),
+    (WORD, re.compile(r"[A-Za-z_\u0080-\uffff][A-Za-z0-9_$\u0080-\uffff]*")),
+    (PARAM, re.compile(r"\$\d+|:[A-Za-z_]\w*|%\([A-Za-z_]\w*\)s|%s|\?")),
+    (PUNCT, re.compile(r"[(),;\[\]]")),
+    (OPERATOR, re.compile(r"::|[+\-*/<>=~!@#%^&|`.:]+")),
+]
+
+_DOLLAR_QUOTE = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)?\$")
+
+# Mots-clés autorisés en tête de requête
+READ_ONLY_LEADING = {"SELECT", "WITH", "VALUES", "TABLE"}
+
+# Instructions modifiantes interdites en tête de sous-requête ou de CTE
+DATA_MODIFYING = {"INSERT", "UPDATE", "DELETE", "MERGE"}
+
+# Mot attendu après une instruction modifiante (INSERT INTO, DELETE FROM, MERGE INTO)
+DATA_MODIFYING_FOLLOWERS = {"INSERT": "INTO", "DELETE": "FROM", "MERGE": "INTO"}
+
+# Fonctions avec effets de bord ou accès au système
+FORBIDDEN_FUNCTIONS = {
+    "PG_SLEEP", "PG_SLEEP_FOR", "PG_SLEEP_UNTIL", "PG_TERMINATE_BACKEND",
+    "PG_CANCEL_BACKEND", "PG_RELOAD_CONF", "PG_ROTATE_LOGFILE", "SET_CONFIG",
+    "PG_READ_FILE", "PG_READ_BINARY_FILE", "PG_LS_DIR", "PG_STAT_FILE",
+    "LO_IMPORT", "LO_EXPORT", "LO_UNLINK", "LO_CREATE", "LO_FROM_BYTEA", "LO_PUT",
+    "DBLINK", "DBLINK_EXEC", "DBLINK_CONNECT", "NEXTVAL", "SETVAL",
+    "PG_ADVISORY_LOCK", "PG_ADVISORY_XACT_LOCK", "PG_TRY_ADVISORY_LOCK",
+    "PG_ADVISORY_LOCK_SHARED", "PG_TRY_ADVISORY_XACT_LOCK", "TXID_CURRENT",
+    "PG_SWITCH_WAL", "PG_CREATE_RESTORE_POINT", "PG_LOGICAL_EMIT_MESSAGE",
+}
+
+# Clauses de verrouillage (FOR UPDATE / FOR SHARE / FOR NO KEY UPDATE / FOR KEY SHARE)
+LOCKING_FOLLOWERS = {"UPDATE", "SHARE", "NO", "KEY"}
+
+
+class SQLAnalyzer:
+    """Analyse lexicale des requêtes SQL avec cache des analyses par empreinte"""
+
+    def __init__(self, cache_size: int = 1024):
+        self.cache_size = cache_size
+        self.analysis_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def query_hash(query: str) -> str:
+        """Empreinte stable d'une requête"""
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    def tokenize(self, query: str) -> List[Tuple[str, str]]:
+        """Découpe une requête en tokens (type, valeur)"""
+        tokens = []
+        position = 0
+        length = len(query)
+
+        while position < length:
+            # Commentaires de bloc (imbriqués en PostgreSQL)
+            if query.startswith("/*", position):
+                depth = 0
+                end = position
+                while end < length:
+                    if query.startswith("/*", end):
+                        depth += 1
+                        end += 2
+                    elif query.startswith("*/", end):
+                        depth -= 1
+                        end += 2
+                        if depth == 0:
+                            break
+                    else:
+                        end += 1
+                if depth != 0:
+                    raise ValueError("Unterminated block comment")
+                tokens.append((COMMENT, query[position:end]))
+                position = end
+                continue
+
+            # Chaînes dollar-quoted ($$...$$ ou $tag$...$tag$)
+            dollar = _DOLLAR_QUOTE.match(query, position)
+            if dollar:
+                delimiter = dollar.group(0)
+                end = query.find(delimiter, dollar.end())
+                if end < 0:
+                    raise ValueError("Unterminated dollar-quoted string")
+                end += len(delimiter)
+                tokens.append((STRING, query[position:end]))
+                position = end
+                continue
+
+            for kind, pattern in _TOKEN_PATTERNS:
+                match = pattern.match(query, position)
+                if match and match.end() > position:
+                    tokens.append((kind, match.group(0)))
+                    position = match.end()
+                    break
+            else:
+                if query[position] in "'\"":
+                    raise ValueError("Unterminated quoted string or identifier")
+                raise ValueError(f"Unexpected character at position {position}: {query[position]!r}")
+
+        return tokens
+
+    def analyze(self, query: str) -> Dict[str, Any]:
+        """Analyse une requête (résultat mis en cache par empreinte)"""
+        key = self.query_hash(query)
+
+        with self._cache_lock:
+            cached = self.analysis_cache.get(key)
+            if cached is not None:
+                self.analysis_cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+
+        analysis = self._analyze(query)
+        analysis["query_hash"] = key
+
+        with self._cache_lock:
+            self.analysis_cache[key] = analysis
+            if len(self.analysis_cache) > self.cache_size:
+                self.analysis_cache.popitem(last=False)
+
+        return analysis
+
+    def _analyze(self, query: str) -> Dict[str, Any]:
+        """Valide la requête et localise la clause LIMIT de la requête externe"""
+        try:
+            tokens = self.tokenize(query)
+        except ValueError as e:
+            return self._rejected(f"Invalid SQL: {str(e)}")
+
+        # Tokens significatifs uniquement (sans espaces ni commentaires)
+        significant = [token for token in tokens if token[0] not in (WHITESPACE, COMMENT)]
+
+        # Un seul statement, point-virgule final toléré
+        while significant and significant[-1] == (PUNCT, ";"):
+            significant.pop()
+        if not significant:
+            return self._rejected("Empty query")
+        if (PUNCT, ";") in significant:
+            return self._rejected("Only a single statement is allowed")
+
+        # Calcul de la profondeur de parenthèses de chaque token
+        depths = []
+        depth = 0
+        for kind, value in significant:
+            if kind == PUNCT and value in "([":
+                depth += 1
+                depths.append(depth)
+                continue
+            if kind == PUNCT and value in ")]":
+                depths.append(depth)
+                depth -= 1
+                if depth < 0:
+                    return self._rejected("Unbalanced parentheses")
+                continue
+            depths.append(depth)
+        if depth != 0:
+            return self._rejected("Unbalanced parentheses")
+
+        # Premier mot-clé, seules des parenthèses ouvrantes peuvent le précéder
+        first_word = next((index for index, (kind, _) in enumerate(significant) if kind == WORD), None)
+        leading = significant[first_word][1].upper() if first_word is not None else None
+        if leading not in READ_ONLY_LEADING or any(token != (PUNCT, "(") for token in significant[:first_word]):
+            return self._rejected(f"Only read-only queries are allowed (SELECT, WITH, VALUES, TABLE), got {leading or 'no keyword'}")
+
+        for index, (kind, value) in enumerate(significant):
+            if kind not in (WORD, QUOTED_IDENT):
+                continue
+
+            previous = significant[index - 1] if index > 0 else None
+            following = significant[index + 1] if index + 1 < len(significant) else None
+
+            # Fonction appelée par un identifiant entre guillemets ("pg_sleep"(10))
+            if kind == QUOTED_IDENT:
+                # Caractère d'échappement personnalisé : nom non décodable de façon sûre
+                if following is not None and following[0] == WORD and following[1].upper() == "UESCAPE":
+                    return self._rejected("UESCAPE is not allowed on quoted identifiers")
+                name = self._unquote_identifier(value)
+                if name.upper() in FORBIDDEN_FUNCTIONS and following == (PUNCT, "("):
+                    return self._rejected(f"Function '{name}' is not allowed in read-only queries")
+                continue
+
+            word = value.upper()
+
+            # Instruction modifiante dans une CTE ou en statement principal après un WITH
+            if word in DATA_MODIFYING and previous in ((PUNCT, "("), (PUNCT, ")")) \
+                    and self._starts_statement(word, following):
+                return self._rejected(f"Statement '{word}' is not allowed in read-only queries")
+
+            # SELECT ... INTO crée une table
+            if word == "INTO":
+                return self._rejected("SELECT INTO is not allowed in read-only queries")
+
+            # Clauses de verrouillage de lignes
+            if word == "FOR" and following is not None and following[0] == WORD \
+                    and following[1].upper() in LOCKING_FOLLOWERS:
+                return self._rejected("Row locking clauses (FOR UPDATE/SHARE) are not allowed")
+
+            # Appels de fonctions avec effets de bord
+            if word in FORBIDDEN_FUNCTIONS and following == (PUNCT, "("):
+                return self._rejected(f"Function '{value}' is not allowed in read-only queries")
+
+        statement = "".join(value for _, value in self._strip_trailing(tokens))
+        limit_info = self._find_outer_limit(significant, depths)
+
+        return {
+            "read_only": True,
+            "reason": None,
+            "statement_type": leading,
+            "statement": statement,
+            **limit_info
+        }
+
+    @staticmethod
+    def _unquote_identifier(value: str) -> str:
+        """Nom désigné par un identifiant entre guillemets (guillemets doublés et échappements U& décodés)"""
+        if value[0] in "uU":
+            name = value[3:-1].replace('""', '"')
+            return re.sub(
+                r"\\(\\|[0-9A-Fa-f]{4}|\+[0-9A-Fa-f]{6})",
+                lambda match: "\\" if match.group(1) == "\\" else chr(int(match.group(1).lstrip("+"), 16)),
+                name
+            )
+        return value[1:-1].replace('""', '"')
+
+    def _starts_statement(self, word: str, following: Optional[Tuple[str, str]]) -> bool:
+        """Distingue une instruction modifiante d'une colonne homonyme (ex: count(update))"""
+        if following is None:
+            return False
+
+        expected = DATA_MODIFYING_FOLLOWERS.get(word)
+        if expected:
+            return following[0] == WORD and following[1].upper() == expected
+
+        # UPDATE [ONLY] table
+        return following[0] in (WORD, QUOTED_IDENT)
+
+    def _strip_trailing(self, tokens: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Retire espaces, commentaires et points-virgules en fin de requête"""
+        end = len(tokens)
+        while end > 0 and (tokens[end - 1][0] in (WHITESPACE, COMMENT) or tokens[end - 1] == (PUNCT, ";")):
+            end -= 1
+
+        start = 0
+        while start < end and tokens[start][0] == WHITESPACE:
+            start += 1
+
+        return tokens[start:end]
+
+    def _find_outer_limit(self, significant: List[Tuple[str, str]], depths: List[int]) -> Dict[str, Any]:
+        """Localise LIMIT / FETCH au niveau de la requête externe"""
+        outer = [
+            (index, value.upper())
+            for index, ((kind, value), depth) in enumerate(zip(significant, depths))
+            if kind == WORD and depth == 0
+        ]
+        outer_words = {word for _, word in outer}
+
+        if "FETCH" in outer_words:
+            return {"limit_mode": "wrap", "outer_limit": None}
+
+        limit_positions = [index for index, word in outer if word == "LIMIT"]
+        if not limit_positions:
+            return {"limit_mode": "append", "outer_limit": None}
+
+        # LIMIT littéral : remplaçable directement ; sinon (ALL, paramètre, expression) on encapsule
+        position = limit_positions[-1]
+        following = significant[position + 1] if position + 1 < len(significant) else None
+        after = significant[position + 2] if position + 2 < len(significant) else None
+        literal_limit = (
+            following is not None and following[0] == NUMBER and following[1].isdigit()
+            and (after is None or (after[0] == WORD and after[1].upper() == "OFFSET"))
+        )
+
+        if literal_limit:
+            return {"limit_mode": "replace", "outer_limit": int(following[1])}
+
+        return {"limit_mode": "wrap", "outer_limit": None}
+
+    def _rejected(self, reason: str) -> Dict[str, Any]:
+        return {
+            "read_only": False,
+            "reason": reason,
+            "statement_type": None,
+            "statement": None,
+            "limit_mode": None,
+            "outer_limit": None
+        }
+
+    def apply_limit(self, analysis: Dict[str, Any], limit: int) -> str:
+        """Injecte ou plafonne le LIMIT de la requête externe"""
+        statement = analysis["statement"]
+
+        if limit <= 0:
+            return statement
+
+        mode = analysis["limit_mode"]
+
+        if mode == "append":
+            return f"{statement} LIMIT {limit}"
+
+        if mode == "replace":
+            if analysis["outer_limit"] <= limit:
+                return statement
+            return self._replace_outer_limit(statement, limit)
+
+        return f"SELECT * FROM ({statement}) AS limited_query LIMIT {limit}"
+
+    def _replace_outer_limit(self, statement: str, limit: int) -> str:
+        """Remplace la valeur littérale du dernier LIMIT de premier niveau"""
+        tokens = self.tokenize(statement)
+        depth = 0
+        target = None
+
+        for index, (kind, value) in enumerate(tokens):
+            if kind == PUNCT and value in "([":
+                depth += 1
+            elif kind == PUNCT and value in ")]":
+                depth -= 1
+            elif kind == WORD and depth == 0 and value.upper() == "LIMIT":
+                target = index
+
+        # Le littéral suit le mot-clé LIMIT (après espaces / commentaires)
+        for index in range(target + 1, len(tokens)):
+            if tokens[index][0] == NUMBER:
+                tokens[index] = (NUMBER, str(limit))
+                break
+
+        return "".join(value for _, value in tokens)
+
+    def prepare(self, query: str, limit: int) -> Dict[str, Any]:
+        """Analyse une requête et retourne la version exécutable"""
+        analysis = self.analyze(query)
+
+        if not analysis["read_only"]:
+            raise ValueError(analysis["reason"])
+
+        return {
+            **analysis,
+            "final_query": self.apply_limit(analysis, limit)
+        }
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Statistiques du cache d'analyse"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            "entries": len(self.analysis_cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_ratio": round(self.cache_hits / total, 4) if total else 0.0
+        }
@@ -0,0 +1,302 @@
+"""
+Réception de fichiers envoyés par des agents distants
+Le corps multipart est écrit sur disque au fil de l'eau (jamais entièrement en mémoire) pendant que sont calculés
+l'empreinte SHA-256 du contenu (clé de déduplication) et un profil de premier niveau (lignes, séparateur, encodage)
+"""
+
+import asyncio
+import codecs
+import hashlib
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from .data_tools import register_file
+from .file_tools import FileAnalyzer, sniff_delimiter
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+# Données accumulées avant écriture sur disque (dans le pool de threads)
+FLUSH_BYTES = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Envoi refusé (code HTTP à retourner au client)"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FileProfiler:
+    """
+    Profil calculé sur les blocs reçus : empreinte, taille, nombre de lignes, encodage et séparateur
+    Le nombre de lignes est une première estimation (retours à la ligne dans des champs entre guillemets comptés)
+    """
+
+    SAMPLE_SIZE = 64 * 1024
+
+    def __init__(self):
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.newlines = 0
+        self.last_byte = b""
+        self.sample = bytearray()
+        self._utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._utf8_valid = True
+
+    def update(self, data: bytes):
+        self.hash.update(data)
+        self.size += len(data)
+        self.newlines += data.count(b"\n")
+        if data:
+            self.last_byte = data[-1:]
+        if len(self.sample) < self.SAMPLE_SIZE:
+            self.sample += data[:self.SAMPLE_SIZE - len(self.sample)]
+        if self._utf8_valid:
+            try:
+                self._utf8_decoder.decode(data)
+            except UnicodeDecodeError:
+                self._utf8_valid = False
+
+    @property
+    def content_hash(self) -> str:
+        return self.hash.hexdigest()
+
+    def encoding(self) -> str:
+        """Encodage du texte : BOM, UTF-8 valide sur tout le contenu, sinon Windows-1252 (exports Excel français)"""
+        sample = bytes(self.sample)
+        if sample.startswith(codecs.BOM_UTF8):
+            return "utf-8-sig"
+        if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return "utf-16"
+        if self._utf8_valid:
+            try:
+                self._utf8_decoder.decode(b"", final=True)
+                return "utf-8"
+            except UnicodeDecodeError:
+                self._utf8_valid = False
+        return "cp1252"
+
+    def delimiter(self, encoding: str) -> Optional[str]:
+        """Séparateur des colonnes CSV déduit des premières lignes"""
+        text = bytes(self.sample).decode(encoding, errors="replace")
+        # Dernière ligne de l'échantillon probablement tronquée
+        if len(self.sample) >= self.SAMPLE_SIZE and "\n" in text:
+            text = text[:text.rindex("\n")]
+        return sniff_delimiter(text)
+
+    def profile(self, file_type: str) -> Dict[str, Any]:
+        profile = {
+            "content_hash": self.content_hash,
+            "file_size": self.size
+        }
+        if file_type in (".csv", ".json"):
+            profile["encoding"] = self.encoding()
+        if file_type == ".csv":
+            lines = self.newlines + (1 if self.size and self.last_byte != b"\n" else 0)
+            profile["delimiter"] = self.delimiter(profile["encoding"])
+            profile["rows_count"] = max(lines - 1, 0)  # Ligne d'en-tête exclue
+        return profile
+
+
+class MultipartUpload:
+    """
+    Analyse en flux d'un corps multipart/form-data : le contenu de la partie fichier est écrit dans un fichier
+    temporaire du répertoire de destination au fur et à mesure de sa réception
+    """
+
+    def __init__(self, content_type: str, directory: Path, max_bytes: int, field_name: str = "file"):
+        media_type, options = parse_options_header(content_type)
+        if media_type != b"multipart/form-data" or b"boundary" not in options:
+            raise UploadError("Expected a multipart/form-data body", status_code=415)
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.file_type: Optional[str] = None
+        self.temporary_path: Optional[Path] = None
+        self.profiler = FileProfiler()
+
+        self._file = None
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file_part = False
+
+        self.parser = MultipartParser(options[b"boundary"], callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end
+        })
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._pending_bytes
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        filename = options.get(b"filename")
+        # Seule la première partie fichier du champ attendu est conservée
+        if name != self.field_name or filename is None or self.filename is not None:
+            return
+
+        self.filename = safe_filename(filename.decode("utf-8", errors="replace"))
+        self.file_type = Path(self.filename).suffix.lower()
+        if self.file_type not in FileAnalyzer.SUPPORTED_FORMATS:
+            raise UploadError(f"Unsupported file format: {self.file_type or 'none'}", status_code=415)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.temporary_path = self.directory / f".upload_{uuid.uuid4().hex}.tmp"
+        self._file = open(self.temporary_path, "wb")
+        self._in_file_part = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if not self._in_file_part:
+            return
+        if self.profiler.size + self._pending_bytes + (end - start) > self.max_bytes:
+            raise UploadError(f"File too large (max {self.max_bytes // (1024 * 1024)} MB)", status_code=413)
+        self._pending.append(data[start:end])
+        self._pending_bytes += end - start
+
+    def _on_part_end(self):
+        self._in_file_part = False
+
+    def feed(self, chunk: bytes):
+        """Analyse un bloc du corps (les données du fichier restent en attente jusqu'au prochain flush)"""
+        self.parser.write(chunk)
+
+    def flush(self):
+        """Écrit les données en attente et met à jour l'empreinte et le profil (bloquant)"""
+        for data in self._pending:
+            self._file.write(data)
+            self.profiler.update(data)
+        self._pending = []
+        self._pending_bytes = 0
+
+    def finish(self):
+        """Termine l'analyse du corps et ferme le fichier temporaire (bloquant)"""
+        self.parser.finalize()
+        if self._file is None:
+            raise UploadError(f"Missing file field '{self.field_name}'")
+        self.flush()
+        self._file.close()
+
+    def discard(self):
+        """Supprime le fichier temporaire d'un envoi interrompu ou refusé"""
+        if self._file is not None:
+            self._file.close()
+        if self.temporary_path is not None:
+            self.temporary_path.unlink(missing_ok=True)
+
+
+def safe_filename(filename: str) -> str:
+    """Nom de fichier sans répertoire ni caractères spéciaux"""
+    name = re.sub(r"[^\w.\-]+", "_", Path(filename.replace("\\", "/")).name).strip("._")
+    return name[-200:] or "upload"
+
+
+def store_upload(upload: MultipartUpload) -> Dict[str, Any]:
+    """
+    Range le fichier reçu sous son empreinte (<répertoire>/<empreinte>/<nom>) et l'enregistre dans files_processed
+    Un contenu déjà reçu sous le même nom n'est pas réécrit : sa date de modification, et donc la clé de cache
+    de analyze_file, restent inchangées
+    """
+    profile = upload.profiler.profile(upload.file_type)
+    content_hash = profile["content_hash"]
+    target = upload.directory / content_hash[:16] / upload.filename
+
+    deduplicated = target.exists()
+    if deduplicated:
+        upload.temporary_path.unlink(missing_ok=True)
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(upload.temporary_path, target)
+
+    file_path = str(target.resolve())
+    file_id = register_file(file_path, profile["file_size"], upload.file_type, content_hash, profile)
+
+    logger.info(f"File uploaded: {file_path} ({profile['file_size']} bytes{', duplicate' if deduplicated else ''})")
+    return {
+        "success": True,
+        "file_path": file_path,
+        "filename": upload.filename,
+        "file_type": upload.file_type,
+        "file_id": file_id,
+        "deduplicated": deduplicated,
+        "profile": profile
+    }
+
+
+async def receive_upload(content_type: str, body: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """
+    Reçoit un fichier envoyé en multipart/form-data (champ 'file') et l'enregistre
+
+    Args:
+        content_type: En-tête Content-Type de la requête (avec la frontière multipart)
+        body: Blocs du corps de la requête
+
+    Returns:
+        Dict avec le chemin du fichier enregistré, son identifiant dans files_processed et son profil
+    """
+    directory = Path(os.getenv("MCP_UPLOAD_DIR") or PROJECT_ROOT / "data" / "uploads")
+    max_bytes = int(float(os.getenv("MCP_UPLOAD_MAX_MB", "512")) * 1024 * 1024)
+
+    upload = None
+    try:
+        upload = MultipartUpload(content_type, directory, max_bytes)
+        async for chunk in body:
+            upload.feed(chunk)
+            if upload.pending_bytes >= FLUSH_BYTES:
+                await asyncio.to_thread(upload.flush)
+        await asyncio.to_thread(upload.finish)
+        return await asyncio.to_thread(store_upload, upload)
+
+    except asyncio.CancelledError:
+        if upload is not None:
+            upload.discard()
+        raise
+
+    except Exception as e:
+        if upload is not None:
+            upload.discard()
+        logger.error(f"Upload failed: {str(e)}")
+        if isinstance(e, UploadError):
+            status_code = e.status_code
+        else:
+            # Corps multipart invalide ou connexion interrompue (400), écriture impossible (500)
+            status_code = 500 if isinstance(e, OSError) else 400
+        return {
+            "error": str(e),
+            "status_code": status_code,
+            "success": False
+        }
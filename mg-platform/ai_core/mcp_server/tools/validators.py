@@ -0,0 +1,279 @@
+"""
+Validation du contenu des colonnes
+Le type de contenu (email, téléphone, SIRET...) est déduit du nom de la colonne et d'un échantillon de valeurs,
+puis les valeurs invalides sont comptées sur toute la colonne par opérations vectorisées : expressions régulières
+exécutées par Arrow (RE2) sur les chaînes, arithmétique numpy pour les sommes de contrôle et les colonnes numériques
+"""
+
+import re
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+try:
+    import pyarrow  # noqa: F401
+    TEXT_DTYPE = pd.StringDtype("pyarrow")
+    INTEGER_DTYPE = "int64[pyarrow]"
+except ImportError:
+    TEXT_DTYPE = pd.StringDtype()
+    INTEGER_DTYPE = "int64"
+
+# Expressions compatibles RE2 (sans assertions ni références arrière)
+EMAIL_PATTERN = r"[A-Za-z0-9._%+\-]+@[A-Za-z0-9\-]+(?:\.[A-Za-z0-9\-]+)*\.[A-Za-z]{2,}"
+URL_PATTERN = r"(?:https?://)?[A-Za-z0-9\-]+(?:\.[A-Za-z0-9\-]+)*\.[A-Za-z]{2,}(?::\d{1,5})?(?:[/?#]\S*)?"
+# Numéro national ou international (+33, 0033), préfixe (0) toléré, séparateurs libres : +33 (0)1 64 ...
+PHONE_PATTERN = r"(?:(?:\+|00)33[\s.\-]*(?:\(0\))?|0)[\s.\-]*[1-9](?:[\s.\-]*\d){8}"
+# Départements 01 à 95, outre-mer 97 et 98
+POSTCODE_PATTERN = r"(?:0[1-9]|[1-8]\d|9[0-5]|9[78])\d{3}"
+DATE_TEXT_PATTERN = r"\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?"
+
+# SIREN de La Poste : ses établissements ne respectent pas la clé de Luhn (somme des chiffres multiple de 5)
+LA_POSTE_SIREN = 356000000
+
+
+# Contribution à la somme de Luhn d'une paire de chiffres (chiffre des dizaines doublé)
+_DOUBLED = np.array([0, 2, 4, 6, 8, 1, 3, 5, 7, 9], dtype=np.int64)
+_LUHN_PAIRS = (np.arange(100) % 10) + _DOUBLED[np.arange(100) // 10]
+
+
+def _luhn_valid(values: np.ndarray, digits: int) -> np.ndarray:
+    """Clé de Luhn d'entiers de digits chiffres (zéros de tête compris), chiffres traités deux par deux"""
+    remaining = values.astype(np.int64)
+    total = np.zeros(len(remaining), dtype=np.int64)
+    for _ in range(digits // 2):
+        remaining, pair = np.divmod(remaining, 100)
+        total += _LUHN_PAIRS[pair]
+    if digits % 2:
+        total += remaining % 10
+    return total % 10 == 0
+
+
+def _digit_sum(values: np.ndarray, digits: int) -> np.ndarray:
+    remaining = values.astype(np.int64)
+    total = np.zeros(len(remaining), dtype=np.int64)
+    for _ in range(digits):
+        remaining, digit = np.divmod(remaining, 10)
+        total += digit
+    return total
+
+
+def _siret_valid(values: np.ndarray) -> np.ndarray:
+    valid = (values >= 0) & (values < 10 ** 14) & _luhn_valid(values, 14)
+    la_poste = np.flatnonzero(values // 10 ** 5 == LA_POSTE_SIREN)
+    if len(la_poste):
+        valid[la_poste] = _digit_sum(values[la_poste], 14) % 5 == 0
+    return valid
+
+
+def _siren_valid(values: np.ndarray) -> np.ndarray:
+    return (values >= 0) & (values < 10 ** 9) & _luhn_valid(values, 9)
+
+
+def _postcode_valid(values: np.ndarray) -> np.ndarray:
+    department = values // 1000
+    return (values >= 1000) & (values < 99000) & ((department <= 95) | (department >= 97))
+
+
+def _phone_valid(values: np.ndarray) -> np.ndarray:
+    """Numéros lus comme entiers : zéro initial perdu (9 chiffres) ou indicatif 33 (11 chiffres)"""
+    national = (values >= 10 ** 8) & (values < 10 ** 9)
+    international = (values >= 33 * 10 ** 9 + 10 ** 8) & (values < 34 * 10 ** 9)
+    return national | international
+
+
+class ColumnValidator:
+    """Type de contenu et valeurs invalides d'une colonne"""
+
+    # Part minimale de l'échantillon au bon format pour retenir un type déduit du contenu
+    MIN_VALID_RATIO = 0.8
+    SAMPLE_SIZE = 1000
+
+    # Types suggérés par le nom de la colonne (retenus même si le contenu est majoritairement invalide)
+    NAME_HINTS = [
+        ("email", re.compile(r"mail|courriel")),
+        ("siret", re.compile(r"siret")),
+        ("siren", re.compile(r"siren")),
+        ("postcode", re.compile(r"code_?postal|postcode|zip|^cp$")),
+        ("phone", re.compile(r"phone|t[eé]l[eé]phone|^tel|mobile|portable|fax")),
+        ("address", re.compile(r"address|adresse|addr")),
+        ("url", re.compile(r"url|website|site|web")),
+        ("date", re.compile(r"date|^dt_"))
+    ]
+
+    # Types reconnus sur le contenu des colonnes textuelles, dans l'ordre de préférence
+    TEXT_TYPES = ["email", "url", "phone", "siret", "siren", "postcode", "date"]
+
+    # Séparateurs à supprimer (identifiants à clé de contrôle) et expression attendue, espaces autour tolérés
+    TEXT_FORMATS = {
+        "email": (None, rf"\s*(?:{EMAIL_PATTERN})\s*"),
+        "url": (None, rf"\s*(?:{URL_PATTERN})\s*"),
+        "phone": (None, rf"\s*(?:{PHONE_PATTERN})\s*"),
+        "siret": (r"[\s.]", r"\d{14}"),
+        "siren": (r"[\s.]", r"\d{9}"),
+        "postcode": (None, rf"\s*(?:{POSTCODE_PATTERN})\s*")
+    }
+
+    # Contrôles des identifiants (sur les valeurs entières)
+    CHECKSUMS = {
+        "siret": _siret_valid,
+        "siren": _siren_valid
+    }
+
+    # Types vérifiables sur des entiers (identifiants et numéros lus comme nombres depuis un CSV)
+    NUMERIC_CHECKS = {
+        "siret": _siret_valid,
+        "siren": _siren_valid,
+        "postcode": _postcode_valid,
+        "phone": _phone_valid
+    }
+
+    def name_hint(self, column: str) -> Optional[str]:
+        name = str(column).lower()
+        for content_type, pattern in self.NAME_HINTS:
+            if pattern.search(name):
+                return content_type
+        return None
+
+    def infer_type(self, series: pd.Series, column: str) -> Optional[str]:
+        """
+        Type de contenu d'une colonne sans valeurs manquantes (None : texte libre ou nombre quelconque)
+        Les colonnes numériques ne reçoivent un type que si leur nom l'indique (un nombre seul est ambigu)
+        """
+        if len(series) == 0:
+            return None
+        hint = self.name_hint(column)
+
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return "date"
+        if pd.api.types.is_bool_dtype(series.dtype):
+            return None
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            if hint not in self.NUMERIC_CHECKS or not self._is_integral(series):
+                return None
+            return hint
+
+        sample = self._sample(series)
+        if hint is not None:
+            if hint not in self.TEXT_TYPES or self._valid_ratio(sample, hint) >= self.MIN_VALID_RATIO:
+                return hint
+
+        best_type, best_ratio = hint, self.MIN_VALID_RATIO
+        for content_type in self.TEXT_TYPES:
+            if content_type == hint:
+                continue
+            ratio = self._valid_ratio(sample, content_type)
+            if ratio > best_ratio or (best_type is None and ratio >= best_ratio):
+                best_type, best_ratio = content_type, ratio
+        return best_type
+
+    def count_invalid(self, series: pd.Series, content_type: Optional[str]) -> int:
+        """Valeurs (non manquantes) ne respectant pas le format du type"""
+        if len(series) == 0 or content_type is None or pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return 0
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Validation des seules catégories, comptage par les codes
+            valid = self.valid_mask(pd.Series(series.cat.categories), content_type)
+            codes = series.cat.codes.to_numpy()
+            return int(np.count_nonzero(~valid[codes[codes >= 0]]))
+
+        return int(np.count_nonzero(~self.valid_mask(series, content_type)))
+
+    def validate(self, series: pd.Series, column: str) -> Tuple[Optional[str], int]:
+        """Type de contenu et nombre de valeurs invalides d'une colonne sans valeurs manquantes"""
+        content_type = self.infer_type(series, column)
+        return content_type, self.count_invalid(series, content_type)
+
+    def valid_mask(self, series: pd.Series, content_type: str) -> np.ndarray:
+        if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            check = self.NUMERIC_CHECKS.get(content_type)
+            if check is None or not self._is_integral(series):
+                return np.zeros(len(series), dtype=bool)
+            if pd.api.types.is_integer_dtype(series.dtype):
+                return check(series.to_numpy(dtype=np.int64))
+            return check(series.to_numpy(dtype=np.float64).astype(np.int64))
+
+        text = self._as_text(series)
+        if content_type == "date":
+            return self._date_mask(text)
+        if content_type not in self.TEXT_FORMATS:
+            # Adresses et autres types sans format vérifiable
+            return np.ones(len(text), dtype=bool)
+
+        separators, pattern = self.TEXT_FORMATS[content_type]
+        if separators:
+            # Remplacement limité aux valeurs contenant des séparateurs (identifiants souvent déjà compacts)
+            has_separators = text.str.contains(separators)
+            if has_separators.any():
+                text = text.where(~has_separators, text[has_separators].str.replace(separators, "", regex=True))
+        valid = text.str.fullmatch(pattern).to_numpy(dtype=bool, na_value=False)
+
+        checksum = self.CHECKSUMS.get(content_type)
+        if checksum is not None and valid.any():
+            positions = np.flatnonzero(valid)
+            numbers = text.iloc[positions].astype(INTEGER_DTYPE).to_numpy(dtype=np.int64)
+            valid[positions] = checksum(numbers)
+        return valid
+
+    def _date_mask(self, text: pd.Series) -> np.ndarray:
+        """
+        Dates au format de la première valeur reconnue (jour en premier sauf format ISO) ; les valeurs d'un autre
+        format (colonne mêlant 15/03/2020 et 2020-01-01) sont revérifiées en ISO 8601 puis valeur par valeur
+        """
+        text = text.str.strip()
+        date_format = None
+        for value in text.head(20):
+            value = str(value)
+            date_format = guess_datetime_format(value, dayfirst=not re.match(r"\d{4}", value))
+            if date_format:
+                break
+        valid = np.zeros(len(text), dtype=bool)
+        if date_format is not None:
+            valid = pd.to_datetime(text, format=date_format, errors="coerce").notna().to_numpy(copy=True)
+
+        positions = np.flatnonzero(~valid & text.notna().to_numpy())
+        if len(positions) == 0:
+            return valid
+        remaining = text.iloc[positions]
+        parsed = pd.to_datetime(remaining, format="ISO8601", errors="coerce")
+        # Analyse valeur par valeur réservée aux valeurs en forme de date ("12" serait lu comme un jour du mois)
+        retry = parsed.isna() & remaining.str.fullmatch(DATE_TEXT_PATTERN).fillna(False).astype(bool)
+        if retry.any():
+            parsed[retry] = pd.to_datetime(remaining[retry], format="mixed", dayfirst=True, errors="coerce")
+        valid[positions] = parsed.notna().to_numpy()
+        return valid
+
+    def _valid_ratio(self, sample: pd.Series, content_type: str) -> float:
+        return float(self.valid_mask(sample, content_type).mean()) if len(sample) else 0.0
+
+    def _sample(self, series: pd.Series) -> pd.Series:
+        """Valeurs réparties sur toute la colonne (positions régulières, sans tirage aléatoire)"""
+        if len(series) <= self.SAMPLE_SIZE:
+            return series
+        positions = np.linspace(0, len(series) - 1, self.SAMPLE_SIZE).astype(np.int64)
+        return series.iloc[positions]
+
+    @staticmethod
+    def _as_text(series: pd.Series) -> pd.Series:
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(object)
+        if pd.api.types.is_object_dtype(series.dtype) or not pd.api.types.is_string_dtype(series.dtype):
+            series = series.astype(str)
+        return series.astype(TEXT_DTYPE)
+
+    @staticmethod
+    def _is_integral(series: pd.Series) -> bool:
+        if pd.api.types.is_integer_dtype(series.dtype):
+            return True
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return bool(np.all(np.isfinite(values)) and np.all(values == np.floor(values)))
+
+
+# Instance globale du validateur
+validator = ColumnValidator()
@@ -0,0 +1,192 @@
+"""
+Jeux de données et site web synthétiques pour les benchmarks
+Fichiers CSV/XLSX/JSON de taille configurable et serveur HTTP local remplaçant les sites externes
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+CITIES = [
+    ("Lagny-sur-Marne", "77400"), ("Bussy-Saint-Georges", "77600"), ("Chanteloup-en-Brie", "77600"),
+    ("Montévrain", "77144"), ("Torcy", "77200"), ("Thorigny-sur-Marne", "77400"),
+    ("Saint-Thibault-des-Vignes", "77400"), ("Collégien", "77090"), ("Chalifert", "77144")
+]
+SECTORS = ["Commerce", "Restauration", "BTP", "Services", "Santé", "Industrie", "Transport"]
+FORMATS = ("csv", "xlsx", "json")
+
+
+def make_dataframe(rows: int, missing_rate: float = 0.15, seed: int = 42) -> pd.DataFrame:
+    """Entreprises fictives du territoire avec une part de valeurs manquantes"""
+    rng = np.random.default_rng(seed)
+    city_index = rng.integers(0, len(CITIES), rows)
+    ids = np.arange(rows)
+
+    df = pd.DataFrame({
+        "nom": [f"Entreprise {i:06d}" for i in ids],
+        "siret": [f"{n:014d}" for n in rng.integers(10**13, 10**14 - 1, rows, dtype=np.int64)],
+        "secteur": np.array(SECTORS)[rng.integers(0, len(SECTORS), rows)],
+        "ville": [CITIES[i][0] for i in city_index],
+        "code_postal": [CITIES[i][1] for i in city_index],
+        "email": [f"contact{i}@entreprise{i % 997}.fr" for i in ids],
+        "telephone": [f"01 {n // 10**6 % 100:02d} {n // 10**4 % 100:02d} {n // 100 % 100:02d} {n % 100:02d}"
+                      for n in rng.integers(0, 10**8, rows)],
+        "site_web": [f"https://www.entreprise{i % 997}.fr" for i in ids],
+        "date_creation": pd.to_datetime("1990-01-01") + pd.to_timedelta(rng.integers(0, 12000, rows), unit="D"),
+        "effectif": rng.integers(1, 500, rows),
+        "chiffre_affaires": rng.lognormal(12, 1.5, rows).round(2)
+    })
+
+    # Valeurs manquantes réparties sur les colonnes enrichissables
+    for column in ("email", "telephone", "site_web", "effectif", "chiffre_affaires"):
+        df.loc[rng.random(rows) < missing_rate, column] = None
+    return df
+
+
+def write_dataset(directory: Path, rows: int, file_format: str, missing_rate: float = 0.15) -> Path:
+    """Écrit le jeu de données au format demandé (réutilisé s'il existe déjà)"""
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"entreprises_{rows}.{file_format}"
+    if path.exists():
+        return path
+
+    df = make_dataframe(rows, missing_rate)
+    if file_format == "csv":
+        df.to_csv(path, index=False, sep=";")
+    elif file_format == "xlsx":
+        df.to_excel(path, index=False)
+    else:
+        df["date_creation"] = df["date_creation"].dt.strftime("%Y-%m-%d")
+        path.write_text(df.to_json(orient="records", force_ascii=False), encoding="utf-8")
+    return path
+
+
+def render_page(page: int, links: int = 20, paragraphs: int = 12) -> str:
+    """Page HTML réaliste (méta-données, contacts, liens internes et externes, images)"""
+    city, postcode = CITIES[page % len(CITIES)]
+    body = "\n".join(
+        f"<p>Paragraphe {i} de la page {page} : activité {SECTORS[(page + i) % len(SECTORS)].lower()} "
+        f"à {city}, informations pratiques, horaires et actualités du territoire.</p>"
+        for i in range(paragraphs)
+    )
+    anchors = "\n".join(
+        f'<li><a href="/page/{(page + i + 1) % 1000}">Page {(page + i + 1) % 1000}</a></li>' if i % 4
+        else f'<li><a href="https://partenaire{i}.example.org/">Partenaire {i}</a></li>'
+        for i in range(links)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="fr">
+<head>
+<title>Entreprise {page:06d} - {city}</title>
+<meta name="description" content="Fiche de l'entreprise {page:06d} située à {city}">
+<meta name="keywords" content="entreprise, {city}, marne et gondoire">
+<meta property="og:title" content="Entreprise {page:06d}">
+</head>
+<body>
+<header><h1>Entreprise {page:06d}</h1><nav><ul>{anchors}</ul></nav></header>
+<main>
+{body}
+<address>12 rue de la Marne, {postcode} {city}<br>
+Tél : 01 64 {page % 100:02d} {page * 7 % 100:02d} {page * 13 % 100:02d}<br>
+<a href="mailto:contact{page}@entreprise{page}.fr">contact{page}@entreprise{page}.fr</a></address>
+<img src="/static/logo{page}.png" alt="Logo {page}"><img src="/static/photo{page}.jpg" alt="Locaux">
+</main>
+<footer>SIRET 123 456 789 {page % 100000:05d}</footer>
+</body>
+</html>"""
+
+
+class StubSiteHandler(BaseHTTPRequestHandler):
+    """
+    Site local remplaçant les sites externes :
+    /page/<n> (page HTML), /slow/<ms> (réponse retardée), /status/<code> (code HTTP imposé)
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            if len(parts) == 2 and parts[0] == "page":
+                self._send(200, render_page(int(parts[1])))
+            elif len(parts) == 2 and parts[0] == "slow":
+                threading.Event().wait(int(parts[1]) / 1000)
+                self._send(200, render_page(int(parse_qs(url.query).get("page", ["0"])[0])))
+            elif len(parts) == 2 and parts[0] == "status":
+                self._send(int(parts[1]), f"<html><body>Status {parts[1]}</body></html>")
+            else:
+                self._send(404, "<html><body>Not found</body></html>")
+        except ValueError:
+            self._send(400, "<html><body>Bad request</body></html>")
+
+    def _send(self, status: int, html: str):
+        payload = html.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubSite:
+    """Serveur HTTP local exécuté dans un thread (port choisi par le système si port=0)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), StubSiteHandler)
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def start(self) -> "StubSite":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="stub-site", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StubSite":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def generate_datasets(directory: Path, sizes: List[int], formats: Sequence[str] = FORMATS) -> Dict[str, Path]:
+    """Génère les fichiers de toutes les tailles et formats demandés, indexés par '<format>_<lignes>'"""
+    return {
+        f"{file_format}_{rows}": write_dataset(directory, rows, file_format)
+        for rows in sizes
+        for file_format in formats
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Génère les jeux de données des benchmarks")
+    parser.add_argument("--output", default="benchmarks/data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    args = parser.parse_args()
+
+    for name, path in generate_datasets(Path(args.output), args.rows, args.formats).items():
+        print(f"{name}: {path} ({path.stat().st_size / 1024:.0f} KiB)")
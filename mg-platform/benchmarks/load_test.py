@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Test de charge du serveur MCP, exécuté entièrement en local
+Démarre le serveur, génère les fichiers de test, remplace les sites externes par un site local
+et mesure débit, latences (p50/p95/p99) et mémoire du serveur par outil
+
+Usage:
+    python benchmarks/load_test.py [--rows 1000 10000] [--requests 200] [--concurrency 8]
+    python benchmarks/load_test.py --compare benchmarks/results/<précédent>.json
+    python benchmarks/load_test.py --url http://localhost:8080 --scenarios run_sql scrape_url
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+import psutil
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from fixtures import StubSite, generate_datasets  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SERVER_DIR = PROJECT_ROOT / "ai_core" / "mcp_server"
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+
+# Variables de cache mises à zéro par --cache off (chaque appel exécute réellement l'outil)
+CACHE_TTL_VARIABLES = ("CACHE_TTL_ANALYZE_FILE", "CACHE_TTL_TABLE_SCHEMA", "CACHE_TTL_SEARCH_WEB")
+
+
+class Scenario:
+    """Appels d'un outil avec des arguments éventuellement différents à chaque requête"""
+
+    def __init__(self, name: str, tool: str, arguments: Callable[[int], Dict[str, Any]], streaming: bool = False):
+        self.name = name
+        self.tool = tool
+        self.arguments = arguments
+        self.streaming = streaming
+
+
+def build_scenarios(datasets: Dict[str, Path], site: StubSite) -> List[Scenario]:
+    scenarios = [
+        Scenario(f"analyze_file:{name}", "analyze_file", lambda i, path=path: {"file_path": str(path)})
+        for name, path in datasets.items()
+    ]
+    scenarios += [
+        Scenario("run_sql", "run_sql", lambda i: {"query": f"SELECT {i} AS n, now() AS ts"}),
+        Scenario("run_sql:aggregate", "run_sql", lambda i: {
+            "query": "SELECT g % 100 AS bucket, count(*), avg(g) FROM generate_series(1, 100000) g GROUP BY 1",
+            "limit": 100
+        }),
+        Scenario("stream_sql", "stream_sql", lambda i: {
+            "query": "SELECT g, md5(g::text) FROM generate_series(1, 20000) g", "limit": 20000
+        }, streaming=True),
+        Scenario("get_table_schema", "get_table_schema", lambda i: {"table_name": "files_processed"}),
+        Scenario("get_kpis", "get_kpis", lambda i: {"dimension": "field"}),
+        Scenario("search_web", "search_web", lambda i: {"query": f"entreprise lagny {i % 50}"}),
+        Scenario("scrape_url", "scrape_url", lambda i: {"url": site.url(f"page/{i}")}),
+        Scenario("scrape_url:slow", "scrape_url", lambda i: {"url": site.url(f"slow/200?page={i}")})
+    ]
+    return scenarios
+
+
+def percentile(values: np.ndarray, q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 2) if len(values) else None
+
+
+class MemorySampler:
+    """Relève périodiquement la mémoire résidente (RSS) du serveur pendant un scénario"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.05):
+        self.process = psutil.Process(pid) if pid else None
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _rss(self) -> int:
+        # Processus du serveur et éventuels workers
+        processes = [self.process] + self.process.children(recursive=True)
+        return sum(process.memory_info().rss for process in processes)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.samples.append(self._rss())
+            except psutil.Error:
+                return
+
+    def __enter__(self) -> "MemorySampler":
+        if self.process:
+            self.samples.append(self._rss())
+            self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self.samples.append(self._rss())
+
+    def to_dict(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {}
+        mib = 1024 * 1024
+        return {
+            "rss_start_mb": round(self.samples[0] / mib, 1),
+            "rss_peak_mb": round(max(self.samples) / mib, 1),
+            "rss_end_mb": round(self.samples[-1] / mib, 1),
+            "rss_growth_mb": round((self.samples[-1] - self.samples[0]) / mib, 1)
+        }
+
+
+async def call_tool(client: httpx.AsyncClient, scenario: Scenario, index: int) -> Dict[str, Any]:
+    """Un appel mesuré de bout en bout (réponse complète reçue, y compris en streaming)"""
+    payload = {"name": scenario.tool, "arguments": scenario.arguments(index)}
+    start = time.perf_counter()
+    try:
+        if scenario.streaming:
+            async with client.stream("POST", f"/tools/{scenario.tool}", json=payload) as response:
+                last_line = ""
+                async for line in response.aiter_lines():
+                    if line:
+                        last_line = line
+            success = response.status_code == 200 and json.loads(last_line or "{}").get("type") == "end"
+        else:
+            response = await client.post(f"/tools/{scenario.tool}", json=payload)
+            body = response.json()
+            success = response.status_code == 200 and body.get("success") and body["result"].get("success", True)
+        error = None if success else f"HTTP {response.status_code}"
+    except (httpx.HTTPError, ValueError) as e:
+        success, error = False, f"{e.__class__.__name__}: {str(e)}"
+
+    return {"latency_ms": (time.perf_counter() - start) * 1000, "success": bool(success), "error": error}
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int,
+                       warmup: int, server_pid: Optional[int]) -> Dict[str, Any]:
+    """Exécute le scénario avec au plus `concurrency` appels simultanés"""
+    for index in range(warmup):
+        await call_tool(client, scenario, -1 - index)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(index: int):
+        async with semaphore:
+            return await call_tool(client, scenario, index)
+
+    with MemorySampler(server_pid) as memory:
+        start = time.perf_counter()
+        calls = await asyncio.gather(*(bounded(index) for index in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies = np.array([call["latency_ms"] for call in calls if call["success"]])
+    errors = [call["error"] for call in calls if not call["success"]]
+    return {
+        "tool": scenario.tool,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:3],
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(float(latencies.mean()), 2) if len(latencies) else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(float(latencies.max()), 2) if len(latencies) else None
+        },
+        "memory": memory.to_dict()
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, cache: bool, workers: int = 1) -> subprocess.Popen:
+    """Démarre le serveur MCP (uvicorn sans rechargement) et attend qu'il réponde"""
+    env = {**os.environ, "SCRAPER_REQUEST_DELAY": "0", "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING")}
+    if not cache:
+        env.update({variable: "0" for variable in CACHE_TTL_VARIABLES})
+    if workers > 1:
+        # Même configuration que le mode production de server.py (état et métriques partagés)
+        if env.get("MCP_STATE_BACKEND", "local") == "local":
+            env["MCP_STATE_BACKEND"] = "sqlite"
+        env["MCP_STATE_PATH"] = str(Path(tempfile.mkdtemp(prefix="mcp_bench_")) / "state.sqlite")
+        env["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="mcp_bench_metrics_")
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=SERVER_DIR, env=env
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+
+    process.terminate()
+    raise RuntimeError("Server did not start within 60 s")
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args) -> str:
+        return subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain"))}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Scénarios dont le p95 ou le débit se dégrade de plus de `threshold` (%) par rapport à la référence"""
+    regressions = []
+    print(f"\nComparaison avec {baseline['revision'].get('commit')} ({baseline['started_at']})")
+    print(f"{'scénario':<32}{'p95 ref':>10}{'p95':>10}{'Δ p95':>9}{'rps ref':>10}{'rps':>10}{'Δ rps':>9}")
+
+    for name, result in current["scenarios"].items():
+        reference = baseline["scenarios"].get(name)
+        if not reference or not reference["latency_ms"]["p95"] or not result["latency_ms"]["p95"]:
+            continue
+        p95_change = (result["latency_ms"]["p95"] / reference["latency_ms"]["p95"] - 1) * 100
+        rps_change = (result["throughput_rps"] / reference["throughput_rps"] - 1) * 100 if reference["throughput_rps"] else 0
+        regressed = p95_change > threshold or rps_change < -threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<32}{reference['latency_ms']['p95']:>10}{result['latency_ms']['p95']:>10}{p95_change:>+8.1f}%"
+              f"{reference['throughput_rps']:>10}{result['throughput_rps']:>10}{rps_change:>+8.1f}%"
+              f"{'  ⚠' if regressed else ''}")
+    return regressions
+
+
+def print_report(results: Dict[str, Any]):
+    print(f"\n{'scénario':<32}{'req':>6}{'err':>5}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'RSS max':>10}")
+    for name, result in results["scenarios"].items():
+        latency = result["latency_ms"]
+        print(f"{name:<32}{result['requests']:>6}{result['errors']:>5}{result['throughput_rps']:>9}"
+              f"{latency['p50'] or '-':>9}{latency['p95'] or '-':>9}{latency['p99'] or '-':>9}"
+              f"{result['memory'].get('rss_peak_mb', '-'):>10}")
+
+
+async def run(args: argparse.Namespace, base_url: str, server_pid: Optional[int], scenarios: List[Scenario]) -> Dict[str, Any]:
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        for scenario in scenarios:
+            print(f"→ {scenario.name}", flush=True)
+            results[scenario.name] = await run_scenario(
+                client, scenario, args.requests, args.concurrency, args.warmup, server_pid
+            )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge local du serveur MCP")
+    parser.add_argument("--url", help="Serveur déjà démarré (sinon démarré par le benchmark)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="Tailles des fichiers générés")
+    parser.add_argument("--formats", nargs="+", default=["csv", "xlsx", "json"])
+    parser.add_argument("--requests", type=int, default=100, help="Appels par scénario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=1, help="Workers du serveur démarré par le benchmark")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--cache", choices=["on", "off"], default="off",
+                        help="off : TTL à zéro, chaque appel exécute l'outil (serveur démarré par le benchmark)")
+    parser.add_argument("--scenarios", nargs="+", help="Préfixes des scénarios à exécuter (ex: analyze_file run_sql)")
+    parser.add_argument("--data-dir", default=str(PROJECT_ROOT / "benchmarks" / "data"))
+    parser.add_argument("--output", help="Fichier de résultats (défaut : benchmarks/results/<date>_<commit>.json)")
+    parser.add_argument("--compare", help="Résultats de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Dégradation tolérée en %% (p95, débit)")
+    args = parser.parse_args(argv)
+
+    datasets = generate_datasets(Path(args.data_dir), args.rows, args.formats)
+    revision = git_revision()
+    started_at = datetime.now()
+
+    with StubSite() as site:
+        scenarios = build_scenarios(datasets, site)
+        if args.scenarios:
+            scenarios = [s for s in scenarios if any(s.name.startswith(prefix) for prefix in args.scenarios)]
+
+        server = None
+        if args.url:
+            base_url, server_pid = args.url.rstrip("/"), None
+        else:
+            port = free_port()
+            server = start_server(port, args.cache == "on", args.workers)
+            base_url, server_pid = f"http://127.0.0.1:{port}", server.pid
+
+        try:
+            scenario_results = asyncio.run(run(args, base_url, server_pid, scenarios))
+        finally:
+            if server:
+                server.terminate()
+                server.wait(timeout=30)
+
+    results = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "revision": revision,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "parameters": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "rows": args.rows,
+            "cache": args.cache,
+            "workers": args.workers,
+            "server": args.url or "local"
+        },
+        "scenarios": scenario_results
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{started_at:%Y%m%d_%H%M%S}_{revision['commit'] or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print_report(results)
+    print(f"\nRésultats enregistrés dans {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold}% : {', '.join(regressions)}")
+            return 1
+
+    failed = [name for name, result in scenario_results.items() if result["errors"] == result["requests"]]
+    if failed:
+        print(f"\nScénarios en échec complet : {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks des fonctions critiques de FileAnalyzer et WebScraper
+Temps (min/médiane sur plusieurs exécutions) et pic d'allocation (tracemalloc) par fonction et taille
+
+Usage:
+    python benchmarks/micro.py [--rows 1000 10000 100000 1000000] [--repeat 5]
+    python benchmarks/micro.py --rows 10000000 --groups analyze_missing_data detect_data_patterns
+    python benchmarks/micro.py --compare benchmarks/results/micro_<précédent>.json
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from fixtures import make_dataframe, write_dataset  # noqa: E402
+from load_test import PROJECT_ROOT, RESULTS_DIR, SERVER_DIR, git_revision  # noqa: E402
+
+sys.path.insert(0, str(SERVER_DIR))
+from bs4 import BeautifulSoup  # noqa: E402
+from tools.file_tools import FileAnalyzer  # noqa: E402
+from tools.scraping_tools import WebScraper  # noqa: E402
+
+HTML_DIR = Path(__file__).resolve().parent / "html"
+FIXTURE_BASE_URL = "https://www.marneetgondoire.fr/annuaire/"
+
+# Au-delà, l'écriture du fichier de test prend plusieurs minutes (limite Excel : 1 048 576 lignes)
+MAX_XLSX_ROWS = 100_000
+
+# Groupes nécessitant la génération des jeux de données
+FILE_GROUPS = ("read_file", "compact_dataframe", "analyze_missing_data", "detect_data_patterns", "generate_enrichment_suggestions")
+
+
+class Benchmark:
+    """
+    Fonction mesurée : setup() prépare les arguments d'une exécution (hors mesure),
+    func(*arguments) est chronométrée
+    """
+
+    def __init__(self, group: str, param: str, func: Callable, setup: Callable[[], Tuple]):
+        self.group = group
+        self.param = param
+        self.func = func
+        self.setup = setup
+
+    @property
+    def name(self) -> str:
+        return f"{self.group}[{self.param}]"
+
+
+def measure(benchmark: Benchmark, repeat: int, max_time: float) -> Dict[str, Any]:
+    """Chronométrage répété (arrêté après max_time secondes) puis une exécution sous tracemalloc"""
+    timings = []
+    budget_start = time.perf_counter()
+    while len(timings) < repeat and (not timings or time.perf_counter() - budget_start < max_time):
+        arguments = benchmark.setup()
+        gc.collect()
+        start = time.perf_counter()
+        benchmark.func(*arguments)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    arguments = benchmark.setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        benchmark.func(*arguments)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "group": benchmark.group,
+        "param": benchmark.param,
+        "runs": len(timings),
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "peak_alloc_mb": round(peak / (1024 * 1024), 3)
+    }
+
+
+def file_benchmarks(analyzer: FileAnalyzer, sizes: List[int], formats: List[str], data_dir: Path) -> List[Benchmark]:
+    benchmarks = []
+
+    for rows in sizes:
+        for file_format in formats:
+            if file_format == "xlsx" and rows > MAX_XLSX_ROWS:
+                continue
+            path = str(write_dataset(data_dir, rows, file_format))
+            benchmarks.append(Benchmark(f"read_file.{file_format}", f"{rows}", analyzer.read_file, lambda path=path: (path,)))
+
+        # Les étapes d'analyse travaillent sur le même DataFrame (compacté) que produit le chargement d'un CSV
+        raw = make_dataframe(rows)
+        raw["date_creation"] = raw["date_creation"].dt.strftime("%Y-%m-%d")
+        df, _ = analyzer.compact_dataframe(raw)
+        missing_analysis = analyzer.analyze_missing_data(df)
+        patterns = analyzer.detect_data_patterns(df)
+
+        benchmarks += [
+            Benchmark("compact_dataframe", f"{rows}", analyzer.compact_dataframe, lambda raw=raw: (raw,)),
+            Benchmark("analyze_missing_data", f"{rows}", analyzer.analyze_missing_data, lambda df=df: (df,)),
+            Benchmark("detect_data_patterns", f"{rows}", analyzer.detect_data_patterns, lambda df=df: (df,)),
+            Benchmark("generate_enrichment_suggestions", f"{rows}", analyzer.generate_enrichment_suggestions,
+                      lambda m=missing_analysis, p=patterns: (m, p))
+        ]
+    return benchmarks
+
+
+def scraper_benchmarks(scraper: WebScraper) -> List[Benchmark]:
+    benchmarks = []
+
+    for path in sorted(HTML_DIR.glob("*.html")):
+        html = path.read_bytes()
+        fixture = path.stem
+
+        # Soupe reconstruite à chaque exécution : _extract_text_content modifie l'arbre
+        def soup(html=html):
+            return BeautifulSoup(html, "html.parser")
+
+        benchmarks += [
+            Benchmark("parse", fixture, lambda html: BeautifulSoup(html, "html.parser"), lambda html=html: (html,)),
+            Benchmark("_extract_title", fixture, scraper._extract_title, lambda soup=soup: (soup(),)),
+            Benchmark("_extract_description", fixture, scraper._extract_description, lambda soup=soup: (soup(),)),
+            Benchmark("_extract_text_content", fixture, scraper._extract_text_content, lambda soup=soup: (soup(),)),
+            Benchmark("_extract_links", fixture, scraper._extract_links, lambda soup=soup: (soup(), FIXTURE_BASE_URL)),
+            Benchmark("_extract_images", fixture, scraper._extract_images, lambda soup=soup: (soup(), FIXTURE_BASE_URL)),
+            Benchmark("_extract_metadata", fixture, scraper._extract_metadata, lambda soup=soup: (soup(),))
+        ]
+        for field in ("email", "phone", "address"):
+            benchmarks.append(Benchmark(f"_extract_specific_field.{field}", fixture, scraper._extract_specific_field,
+                                        lambda soup=soup, field=field: (soup(), field)))
+    return benchmarks
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Benchmarks dont le temps médian ou le pic d'allocation augmente de plus de `threshold` (%)"""
+    regressions = []
+    print(f"\nComparaison avec {baseline['revision'].get('commit')} ({baseline['started_at']})")
+    print(f"{'benchmark':<52}{'ms ref':>11}{'ms':>11}{'Δ':>9}{'MiB ref':>10}{'MiB':>10}{'Δ':>9}")
+
+    for name, result in current["benchmarks"].items():
+        reference = baseline["benchmarks"].get(name)
+        if not reference:
+            continue
+        time_change = (result["median_ms"] / reference["median_ms"] - 1) * 100 if reference["median_ms"] else 0
+        alloc_change = (result["peak_alloc_mb"] / reference["peak_alloc_mb"] - 1) * 100 if reference["peak_alloc_mb"] else 0
+        regressed = time_change > threshold or alloc_change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<52}{reference['median_ms']:>11}{result['median_ms']:>11}{time_change:>+8.1f}%"
+              f"{reference['peak_alloc_mb']:>10}{result['peak_alloc_mb']:>10}{alloc_change:>+8.1f}%"
+              f"{'  ⚠' if regressed else ''}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de FileAnalyzer et WebScraper")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                        help="Tailles des jeux de données (jusqu'à 10000000)")
+    parser.add_argument("--formats", nargs="+", default=["csv", "xlsx", "json"])
+    parser.add_argument("--groups", nargs="+", help="Préfixes des groupes à exécuter (ex: read_file _extract)")
+    parser.add_argument("--repeat", type=int, default=5, help="Exécutions chronométrées par benchmark")
+    parser.add_argument("--max-time", type=float, default=10.0, help="Durée maximale de chronométrage par benchmark (s)")
+    parser.add_argument("--data-dir", default=str(PROJECT_ROOT / "benchmarks" / "data"))
+    parser.add_argument("--output", help="Fichier de résultats (défaut : benchmarks/results/micro_<date>_<commit>.json)")
+    parser.add_argument("--compare", help="Résultats de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Dégradation tolérée en %% (temps, allocation)")
+    args = parser.parse_args(argv)
+
+    revision = git_revision()
+    started_at = datetime.now()
+
+    benchmarks = scraper_benchmarks(WebScraper())
+    if not args.groups or any(group.startswith(prefix) for group in FILE_GROUPS for prefix in args.groups):
+        benchmarks = file_benchmarks(FileAnalyzer(), args.rows, args.formats, Path(args.data_dir)) + benchmarks
+    if args.groups:
+        benchmarks = [b for b in benchmarks if any(b.group.startswith(prefix) for prefix in args.groups)]
+
+    results = {}
+    print(f"{'benchmark':<52}{'runs':>6}{'min ms':>11}{'median ms':>12}{'peak MiB':>10}")
+    for benchmark in benchmarks:
+        result = measure(benchmark, args.repeat, args.max_time)
+        results[benchmark.name] = result
+        print(f"{benchmark.name:<52}{result['runs']:>6}{result['min_ms']:>11}{result['median_ms']:>12}"
+              f"{result['peak_alloc_mb']:>10}", flush=True)
+
+    report = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "revision": revision,
+        "parameters": {"rows": args.rows, "formats": args.formats, "repeat": args.repeat},
+        "benchmarks": results
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"micro_{started_at:%Y%m%d_%H%M%S}_{revision['commit'] or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nRésultats enregistrés dans {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold}% : {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""
+Accès base de données pour les outils d'administration (migrations, maintenance)
+"""
+
+import os
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+DATABASE_DIR = Path(__file__).resolve().parent
+SCHEMA_FILE = DATABASE_DIR / "schema.sql"
+MIGRATIONS_DIR = DATABASE_DIR / "migrations"
+
+
+def build_connection_string() -> str:
+    """Construit la chaîne de connexion à partir des variables d'environnement"""
+    defaults = {
+        'DB_HOST': 'localhost',
+        'DB_PORT': '5432',
+        'DB_NAME': 'mg_data',
+        'DB_USER': 'mg_user',
+        'DB_PASSWORD': 'mg_pass'
+    }
+    
+    db_config = {key: os.getenv(key, default) for key, default in defaults.items()}
+    
+    return (
+        f"postgresql+psycopg2://{db_config['DB_USER']}:{db_config['DB_PASSWORD']}"
+        f"@{db_config['DB_HOST']}:{db_config['DB_PORT']}/{db_config['DB_NAME']}"
+    )
+
+
+def get_engine() -> Engine:
+    """Crée un moteur SQLAlchemy pour les tâches d'administration"""
+    return create_engine(build_connection_string(), pool_pre_ping=True)
+
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tâches de maintenance de la base de données Marne & Gondoire
+À planifier (cron, Airflow) après application des migrations
+
+Usage:
+    python -m infrastructure.data.database.maintenance partitions [--months-ahead 3]
+    python -m infrastructure.data.database.maintenance retention --keep-months 24
+    python -m infrastructure.data.database.maintenance refresh-kpis [--lookback-days 1]
+"""
+
+import argparse
+import logging
+import sys
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from infrastructure.data.database import get_engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = "enrichment_history_default"
+
+
+def ensure_partitions(months_ahead: int = 3) -> List[str]:
+    """Crée à l'avance les partitions mensuelles de enrichment_history"""
+    engine = get_engine()
+    with engine.begin() as conn:
+        created = conn.execute(
+            text("SELECT enrichment_history_ensure_partitions(0, :months_ahead)"),
+            {"months_ahead": months_ahead}
+        ).scalars().all()
+
+    for partition in created:
+        logger.info(f"Created partition {partition}")
+
+    return created
+
+
+def apply_retention(keep_months: int) -> List[str]:
+    """Supprime les partitions de enrichment_history plus anciennes que la période conservée
+
+    Les lignes expirées de la partition par défaut sont aussi supprimées : la partition
+    par défaut figure alors dans la liste retournée
+    """
+    if keep_months < 1:
+        raise ValueError("keep_months must be at least 1")
+
+    engine = get_engine()
+    with engine.begin() as conn:
+        dropped = conn.execute(
+            text("SELECT enrichment_history_drop_partitions(:keep_months)"),
+            {"keep_months": keep_months}
+        ).scalars().all()
+
+    for partition in dropped:
+        if partition == DEFAULT_PARTITION:
+            logger.info(f"Deleted expired rows from {partition}")
+        else:
+            logger.info(f"Dropped partition {partition}")
+
+    return dropped
+
+
+def refresh_kpis(lookback_days: int = 1) -> dict:
+    """Rafraîchit les agrégats KPI (jours depuis le dernier passage, moins la marge)"""
+    engine = get_engine()
+    with engine.begin() as conn:
+        row = conn.execute(
+            text("SELECT * FROM refresh_kpi_rollups(make_interval(days => :days))"),
+            {"days": lookback_days}
+        ).one()
+
+    logger.info(f"KPI rollups refreshed from {row.from_day} ({row.rows_written} rows)")
+    return {"from_day": row.from_day, "rows_written": row.rows_written}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintenance de la base Marne & Gondoire")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    partitions_parser = subparsers.add_parser("partitions", help="Crée les partitions à venir")
+    partitions_parser.add_argument("--months-ahead", type=int, default=3)
+
+    retention_parser = subparsers.add_parser("retention", help="Supprime les partitions expirées")
+    retention_parser.add_argument("--keep-months", type=int, required=True)
+
+    refresh_parser = subparsers.add_parser("refresh-kpis", help="Rafraîchit les agrégats KPI")
+    refresh_parser.add_argument("--lookback-days", type=int, default=1)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if args.command == "partitions":
+        created = ensure_partitions(args.months_ahead)
+        print(f"{len(created)} partition(s) created")
+    elif args.command == "retention":
+        dropped = apply_retention(args.keep_months)
+        partitions = [name for name in dropped if name != DEFAULT_PARTITION]
+        print(f"{len(partitions)} partition(s) dropped")
+        if DEFAULT_PARTITION in dropped:
+            print(f"Expired rows deleted from {DEFAULT_PARTITION}")
+    elif args.command == "refresh-kpis":
+        refreshed = refresh_kpis(args.lookback_days)
+        print(f"{refreshed['rows_written']} rollup row(s) written from {refreshed['from_day']}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Outil de migration du schéma de base de données Marne & Gondoire
+Applique schema.sql (version 001) puis les scripts de migrations/ dans l'ordre
+
+Usage:
+    python -m infrastructure.data.database.migrate status
+    python -m infrastructure.data.database.migrate upgrade [--target 002]
+"""
+
+import argparse
+import logging
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from infrastructure.data.database import MIGRATIONS_DIR, SCHEMA_FILE, get_engine
+
+logger = logging.getLogger(__name__)
+
+# Verrou consultatif : empêche deux migrations concurrentes
+MIGRATION_LOCK_ID = 4242001
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d{3})_([a-z0-9_]+)\.sql$")
+
+
+def list_migrations() -> List[Tuple[str, str, str]]:
+    """Retourne les migrations disponibles (version, nom, SQL) triées par version"""
+    migrations = [("001", "initial_schema", SCHEMA_FILE.read_text(encoding="utf-8"))]
+
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if not match:
+            logger.warning(f"Ignoring migration file with unexpected name: {path.name}")
+            continue
+        migrations.append((match.group(1), match.group(2), path.read_text(encoding="utf-8")))
+
+    return migrations
+
+
+def ensure_migrations_table(engine):
+    """Crée la table de suivi des migrations"""
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(10) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+
+
+def applied_versions(engine) -> Dict[str, str]:
+    """Versions déjà appliquées avec leur date"""
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT version, applied_at FROM schema_migrations ORDER BY version"))
+        return {row.version: str(row.applied_at) for row in rows}
+
+
+def apply_migration(engine, version: str, name: str, sql: str):
+    """Applique une migration et l'enregistre dans la même transaction"""
+    raw_connection = engine.raw_connection()
+    try:
+        with raw_connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+
+            # Une autre instance a pu appliquer la migration pendant l'attente du verrou
+            cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+            if cursor.fetchone():
+                raw_connection.rollback()
+                return
+
+            cursor.execute(sql)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name)
+            )
+        raw_connection.commit()
+    except Exception:
+        raw_connection.rollback()
+        raise
+    finally:
+        raw_connection.close()
+
+
+def upgrade(target: Optional[str] = None) -> List[str]:
+    """Applique les migrations en attente jusqu'à la version cible incluse"""
+    engine = get_engine()
+    ensure_migrations_table(engine)
+    applied = applied_versions(engine)
+
+    newly_applied = []
+    for version, name, sql in list_migrations():
+        if target and version > target:
+            break
+        if version in applied:
+            continue
+
+        logger.info(f"Applying migration {version}_{name}")
+        apply_migration(engine, version, name, sql)
+        newly_applied.append(f"{version}_{name}")
+
+    if not newly_applied:
+        logger.info("Database schema is up to date")
+
+    return newly_applied
+
+
+def status() -> List[Dict[str, Optional[str]]]:
+    """État de chaque migration (appliquée ou en attente)"""
+    engine = get_engine()
+    ensure_migrations_table(engine)
+    applied = applied_versions(engine)
+
+    return [
+        {"version": version, "name": name, "applied_at": applied.get(version)}
+        for version, name, _ in list_migrations()
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Migrations du schéma Marne & Gondoire")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("status", help="Affiche l'état des migrations")
+    upgrade_parser = subparsers.add_parser("upgrade", help="Applique les migrations en attente")
+    upgrade_parser.add_argument("--target", help="Version cible (ex: 002)")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if args.command == "status":
+        for migration in status():
+            state = f"applied {migration['applied_at']}" if migration["applied_at"] else "pending"
+            print(f"{migration['version']}_{migration['name']}: {state}")
+    else:
+        for migration in upgrade(args.target):
+            print(f"Applied {migration}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+-- Migration 002 : partitionnement mensuel de enrichment_history
+-- Partitions par plage sur created_at, index composites couvrants et BRIN temporel
+
+-- Ancienne table conservée le temps de la copie
+ALTER TABLE enrichment_history RENAME TO enrichment_history_legacy;
+ALTER SEQUENCE enrichment_history_id_seq RENAME TO enrichment_history_legacy_id_seq;
+ALTER INDEX IF EXISTS idx_enrichment_file_id RENAME TO idx_enrichment_legacy_file_id;
+ALTER INDEX IF EXISTS idx_enrichment_field RENAME TO idx_enrichment_legacy_field;
+ALTER TABLE enrichment_history_legacy RENAME CONSTRAINT enrichment_history_pkey TO enrichment_history_legacy_pkey;
+ALTER TABLE enrichment_history_legacy RENAME CONSTRAINT enrichment_history_file_id_fkey TO enrichment_history_legacy_file_id_fkey;
+ALTER TABLE enrichment_history_legacy RENAME CONSTRAINT enrichment_history_confidence_check TO enrichment_history_legacy_confidence_check;
+
+-- Table partitionnée (la clé de partition fait partie de la clé primaire)
+CREATE TABLE enrichment_history (
+    id BIGSERIAL,
+    file_id INTEGER REFERENCES files_processed(id) ON DELETE CASCADE,
+    field_name VARCHAR(100) NOT NULL,
+    row_index INTEGER,
+    original_value TEXT,
+    enriched_value TEXT,
+    source VARCHAR(255),
+    confidence FLOAT CHECK (confidence >= 0 AND confidence <= 1),
+    method VARCHAR(100),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Partition par défaut pour les lignes hors des plages mensuelles
+CREATE TABLE enrichment_history_default PARTITION OF enrichment_history DEFAULT;
+
+-- Index déclarés sur la table mère, propagés à chaque partition
+-- Reprise d'enrichissement : existence d'une cellule (file_id, row_index, field_name)
+CREATE INDEX idx_enrichment_file_row_field
+    ON enrichment_history (file_id, row_index, field_name) INCLUDE (confidence);
+
+-- Reporting par champ et niveau de confiance
+CREATE INDEX idx_enrichment_field_confidence
+    ON enrichment_history (field_name, confidence) INCLUDE (source, file_id);
+
+-- Filtrage temporel peu coûteux sur des données insérées dans l'ordre chronologique
+CREATE INDEX idx_enrichment_created_brin
+    ON enrichment_history USING BRIN (created_at);
+
+-- Création des partitions mensuelles manquantes sur une fenêtre autour du mois courant
+CREATE OR REPLACE FUNCTION enrichment_history_ensure_partitions(
+    months_back INTEGER DEFAULT 1,
+    months_ahead INTEGER DEFAULT 3
+) RETURNS SETOF TEXT AS $$
+DECLARE
+    month_start DATE;
+    partition_name TEXT;
+BEGIN
+    FOR offset_months IN -months_back..months_ahead LOOP
+        month_start := (date_trunc('month', CURRENT_DATE) + make_interval(months => offset_months))::DATE;
+        partition_name := 'enrichment_history_p' || to_char(month_start, 'YYYY_MM');
+
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF enrichment_history FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + INTERVAL '1 month')::DATE
+            );
+            -- Vacuum déclenché par les insertions : maintient la visibility map
+            -- à jour pour que les lectures restent index-only
+            EXECUTE format(
+                'ALTER TABLE %I SET (autovacuum_vacuum_insert_scale_factor = 0.01, autovacuum_analyze_scale_factor = 0.02)',
+                partition_name
+            );
+            RETURN NEXT partition_name;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Suppression des partitions mensuelles entièrement antérieures à la période conservée
+CREATE OR REPLACE FUNCTION enrichment_history_drop_partitions(
+    keep_months INTEGER
+) RETURNS SETOF TEXT AS $$
+DECLARE
+    cutoff DATE := (date_trunc('month', CURRENT_DATE) - make_interval(months => keep_months))::DATE;
+    partition_name TEXT;
+BEGIN
+    FOR partition_name IN
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'enrichment_history'
+          AND child.relname ~ '^enrichment_history_p[0-9]{4}_[0-9]{2}$'
+        ORDER BY child.relname
+    LOOP
+        -- Borne haute de la partition : premier jour du mois suivant
+        IF (to_date(substring(partition_name FROM '[0-9]{4}_[0-9]{2}$'), 'YYYY_MM') + INTERVAL '1 month')::DATE <= cutoff THEN
+            EXECUTE format('DROP TABLE %I', partition_name);
+            RETURN NEXT partition_name;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partitions couvrant les données existantes et les prochains mois
+SELECT enrichment_history_ensure_partitions(
+    COALESCE(
+        (
+            SELECT ((extract(year FROM age(date_trunc('month', CURRENT_DATE), date_trunc('month', MIN(created_at)))) * 12)
+                   + extract(month FROM age(date_trunc('month', CURRENT_DATE), date_trunc('month', MIN(created_at)))))::INTEGER
+            FROM enrichment_history_legacy
+        ),
+        1
+    ),
+    3
+);
+
+-- Copie des données et reprise de la séquence
+INSERT INTO enrichment_history
+    (id, file_id, field_name, row_index, original_value, enriched_value, source, confidence, method, created_at)
+SELECT
+    id, file_id, field_name, row_index, original_value, enriched_value, source, confidence, method,
+    COALESCE(created_at, CURRENT_TIMESTAMP)
+FROM enrichment_history_legacy;
+
+SELECT setval(
+    'enrichment_history_id_seq',
+    GREATEST((SELECT MAX(id) FROM enrichment_history_legacy), 1),
+    (SELECT MAX(id) FROM enrichment_history_legacy) IS NOT NULL
+);
+
+DROP TABLE enrichment_history_legacy;
+
+ANALYZE enrichment_history;
@@ -0,0 +1,140 @@
+-- Migration 003 : agrégats KPI de l'enrichissement
+-- Table de cumul journalière rafraîchie de façon incrémentale et vues de synthèse
+
+-- Cumul par jour, fichier, champ et domaine source
+CREATE TABLE IF NOT EXISTS kpi_enrichment_daily (
+    day DATE NOT NULL,
+    file_id INTEGER NOT NULL REFERENCES files_processed(id) ON DELETE CASCADE,
+    field_name VARCHAR(100) NOT NULL,
+    source VARCHAR(255) NOT NULL,
+    enriched_count BIGINT NOT NULL,
+    filled_count BIGINT NOT NULL,
+    high_confidence_count BIGINT NOT NULL,
+    confidence_sum DOUBLE PRECISION NOT NULL,
+    confidence_count BIGINT NOT NULL,
+    PRIMARY KEY (day, file_id, field_name, source)
+);
+
+CREATE INDEX IF NOT EXISTS idx_kpi_daily_file ON kpi_enrichment_daily(file_id);
+CREATE INDEX IF NOT EXISTS idx_kpi_daily_field ON kpi_enrichment_daily(field_name);
+
+-- Position du dernier rafraîchissement de chaque agrégat
+CREATE TABLE IF NOT EXISTS kpi_rollup_state (
+    rollup_name VARCHAR(100) PRIMARY KEY,
+    refreshed_until TIMESTAMP NOT NULL,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Rafraîchissement incrémental : seuls les jours depuis le dernier passage
+-- (moins une marge pour les écritures tardives) sont recalculés
+CREATE OR REPLACE FUNCTION refresh_kpi_rollups(
+    lookback INTERVAL DEFAULT INTERVAL '1 day'
+) RETURNS TABLE (from_day DATE, rows_written BIGINT) AS $$
+DECLARE
+    watermark TIMESTAMP;
+    refresh_start TIMESTAMP := CURRENT_TIMESTAMP;
+BEGIN
+    -- Un seul rafraîchissement à la fois
+    PERFORM pg_advisory_xact_lock(4242003);
+
+    SELECT refreshed_until INTO watermark
+    FROM kpi_rollup_state
+    WHERE rollup_name = 'kpi_enrichment_daily';
+
+    IF watermark IS NULL THEN
+        SELECT MIN(created_at) INTO watermark FROM enrichment_history;
+        watermark := COALESCE(watermark, refresh_start);
+        from_day := date_trunc('day', watermark)::DATE;
+    ELSE
+        from_day := date_trunc('day', watermark - lookback)::DATE;
+    END IF;
+
+    DELETE FROM kpi_enrichment_daily WHERE day >= from_day;
+
+    INSERT INTO kpi_enrichment_daily (
+        day, file_id, field_name, source, enriched_count, filled_count,
+        high_confidence_count, confidence_sum, confidence_count
+    )
+    SELECT
+        created_at::DATE,
+        file_id,
+        field_name,
+        -- Domaine de la source pour limiter la cardinalité
+        COALESCE(NULLIF(substring(source FROM '^(?:[a-zA-Z]+://)?(?:www\.)?([^/?#]+)'), ''), 'unknown'),
+        COUNT(*),
+        COUNT(*) FILTER (WHERE enriched_value IS NOT NULL AND enriched_value <> ''),
+        COUNT(*) FILTER (WHERE confidence >= 0.8),
+        COALESCE(SUM(confidence), 0),
+        COUNT(confidence)
+    FROM enrichment_history
+    WHERE created_at >= from_day
+      AND file_id IS NOT NULL
+    GROUP BY 1, 2, 3, 4;
+
+    GET DIAGNOSTICS rows_written = ROW_COUNT;
+
+    INSERT INTO kpi_rollup_state (rollup_name, refreshed_until, refreshed_at)
+    VALUES ('kpi_enrichment_daily', refresh_start, CURRENT_TIMESTAMP)
+    ON CONFLICT (rollup_name) DO UPDATE SET
+        refreshed_until = EXCLUDED.refreshed_until,
+        refreshed_at = EXCLUDED.refreshed_at;
+
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Synthèse par fichier : taux de remplissage rapporté aux valeurs manquantes de l'analyse
+CREATE OR REPLACE VIEW kpi_file_summary AS
+SELECT
+    f.id AS file_id,
+    f.filename,
+    f.status,
+    (f.analysis_result -> 'missing_data_summary' ->> 'total_missing_values')::BIGINT AS missing_values,
+    COALESCE(SUM(k.enriched_count), 0) AS enriched_count,
+    COALESCE(SUM(k.filled_count), 0) AS filled_count,
+    ROUND((COALESCE(SUM(k.filled_count), 0)::NUMERIC
+        / NULLIF((f.analysis_result -> 'missing_data_summary' ->> 'total_missing_values')::NUMERIC, 0)) * 100, 2) AS fill_rate,
+    ROUND((SUM(k.confidence_sum) / NULLIF(SUM(k.confidence_count), 0))::NUMERIC, 4) AS avg_confidence,
+    MAX(k.day) AS last_enrichment_day
+FROM files_processed f
+LEFT JOIN kpi_enrichment_daily k ON k.file_id = f.id
+GROUP BY f.id, f.filename, f.status, f.analysis_result;
+
+-- Synthèse par champ
+CREATE OR REPLACE VIEW kpi_field_summary AS
+SELECT
+    field_name,
+    SUM(enriched_count) AS enriched_count,
+    SUM(filled_count) AS filled_count,
+    ROUND((SUM(filled_count)::NUMERIC / NULLIF(SUM(enriched_count), 0)) * 100, 2) AS success_rate,
+    SUM(high_confidence_count) AS high_confidence_count,
+    ROUND((SUM(confidence_sum) / NULLIF(SUM(confidence_count), 0))::NUMERIC, 4) AS avg_confidence,
+    COUNT(DISTINCT file_id) AS files_count
+FROM kpi_enrichment_daily
+GROUP BY field_name;
+
+-- Synthèse par domaine source
+CREATE OR REPLACE VIEW kpi_source_summary AS
+SELECT
+    source,
+    SUM(enriched_count) AS enriched_count,
+    SUM(filled_count) AS filled_count,
+    ROUND((SUM(filled_count)::NUMERIC / NULLIF(SUM(enriched_count), 0)) * 100, 2) AS success_rate,
+    ROUND((SUM(confidence_sum) / NULLIF(SUM(confidence_count), 0))::NUMERIC, 4) AS avg_confidence,
+    COUNT(DISTINCT field_name) AS fields_count
+FROM kpi_enrichment_daily
+GROUP BY source;
+
+-- Synthèse par jour
+CREATE OR REPLACE VIEW kpi_daily_summary AS
+SELECT
+    day,
+    SUM(enriched_count) AS enriched_count,
+    SUM(filled_count) AS filled_count,
+    ROUND((SUM(filled_count)::NUMERIC / NULLIF(SUM(enriched_count), 0)) * 100, 2) AS success_rate,
+    ROUND((SUM(confidence_sum) / NULLIF(SUM(confidence_count), 0))::NUMERIC, 4) AS avg_confidence,
+    COUNT(DISTINCT file_id) AS files_count
+FROM kpi_enrichment_daily
+GROUP BY day;
+
+SELECT * FROM refresh_kpi_rollups();
@@ -0,0 +1,6 @@
+-- Migration 004 : empreinte du contenu des fichiers reçus
+-- SHA-256 calculé pendant l'envoi (/files/upload), clé de déduplication des fichiers identiques
+
+ALTER TABLE files_processed ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files_processed(content_hash);
@@ -0,0 +1,40 @@
+-- Migration 005 : index des entités déjà enrichies
+-- Entreprises identifiées dans les fichiers sources (SIRET, nom normalisé et code postal) et dernières valeurs
+-- enrichies de chaque champ : une même entreprise présente dans plusieurs lignes ou fichiers n'est recherchée qu'une fois
+
+CREATE TABLE IF NOT EXISTS entities (
+    id BIGSERIAL PRIMARY KEY,
+    -- siret:<14 chiffres> ou nom:<nom normalisé>|<code postal ou ville normalisée>
+    entity_key VARCHAR(500) NOT NULL UNIQUE,
+    siret CHAR(14),
+    name TEXT,
+    normalized_name TEXT,
+    postcode VARCHAR(10),
+    city TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_entities_siret ON entities(siret) WHERE siret IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_entities_name_postcode ON entities(normalized_name, postcode);
+
+-- Valeur retenue par champ : la plus sûre, la plus récente à confiance égale
+CREATE TABLE IF NOT EXISTS entity_values (
+    entity_id BIGINT NOT NULL REFERENCES entities(id) ON DELETE CASCADE,
+    field_name VARCHAR(100) NOT NULL,
+    value TEXT NOT NULL,
+    confidence FLOAT CHECK (confidence >= 0 AND confidence <= 1),
+    source VARCHAR(255),
+    file_id INTEGER REFERENCES files_processed(id) ON DELETE SET NULL,
+    -- Date de l'enrichissement d'origine (enrichment_history.created_at)
+    enriched_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (entity_id, field_name)
+);
+
+-- Position de la dernière intégration de enrichment_history
+CREATE TABLE IF NOT EXISTS entity_index_state (
+    index_name VARCHAR(100) PRIMARY KEY,
+    synced_until TIMESTAMP NOT NULL,
+    synced_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,5 @@
+-- Migration 006 : identité de la ligne source des enrichissements
+-- Empreinte de la clé d'entité (SIRET, ou nom et localité) de la ligne enrichie : après une nouvelle livraison
+-- du fichier, une valeur n'est pas rattachée à l'entreprise arrivée à la même position
+
+ALTER TABLE enrichment_history ADD COLUMN IF NOT EXISTS source_key BIGINT;
@@ -0,0 +1,104 @@
+-- Migration 007 : lignes de la partition par défaut de enrichment_history
+-- Une partition mensuelle ne peut pas être créée tant que des lignes de ce mois sont dans la partition par défaut
+-- (insérées avant la création de la partition) : elles sont déplacées dans la nouvelle partition, qui est
+-- rattachée ensuite. La rétention s'applique aussi aux lignes de la partition par défaut
+
+CREATE OR REPLACE FUNCTION enrichment_history_ensure_partitions(
+    months_back INTEGER DEFAULT 1,
+    months_ahead INTEGER DEFAULT 3
+) RETURNS SETOF TEXT AS $$
+DECLARE
+    month_start DATE;
+    month_end DATE;
+    partition_name TEXT;
+BEGIN
+    FOR offset_months IN -months_back..months_ahead LOOP
+        month_start := (date_trunc('month', CURRENT_DATE) + make_interval(months => offset_months))::DATE;
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+        partition_name := 'enrichment_history_p' || to_char(month_start, 'YYYY_MM');
+
+        IF to_regclass(partition_name) IS NULL THEN
+            IF EXISTS (
+                SELECT 1 FROM enrichment_history_default
+                WHERE created_at >= month_start AND created_at < month_end
+            ) THEN
+                -- Table remplie avec les lignes du mois puis rattachée (index de la table mère créés au rattachement)
+                EXECUTE format(
+                    'CREATE TABLE %I (LIKE enrichment_history INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                    partition_name
+                );
+                EXECUTE format(
+                    'INSERT INTO %I SELECT * FROM enrichment_history_default WHERE created_at >= %L AND created_at < %L',
+                    partition_name, month_start, month_end
+                );
+                DELETE FROM enrichment_history_default WHERE created_at >= month_start AND created_at < month_end;
+                EXECUTE format(
+                    'ALTER TABLE enrichment_history ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF enrichment_history FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+            END IF;
+            -- Vacuum déclenché par les insertions : maintient la visibility map
+            -- à jour pour que les lectures restent index-only
+            EXECUTE format(
+                'ALTER TABLE %I SET (autovacuum_vacuum_insert_scale_factor = 0.01, autovacuum_analyze_scale_factor = 0.02)',
+                partition_name
+            );
+            RETURN NEXT partition_name;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Suppression des partitions mensuelles entièrement antérieures à la période conservée
+-- et des lignes de la partition par défaut antérieures à cette période
+CREATE OR REPLACE FUNCTION enrichment_history_drop_partitions(
+    keep_months INTEGER
+) RETURNS SETOF TEXT AS $$
+DECLARE
+    cutoff DATE := (date_trunc('month', CURRENT_DATE) - make_interval(months => keep_months))::DATE;
+    partition_name TEXT;
+    deleted_rows BIGINT;
+BEGIN
+    FOR partition_name IN
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'enrichment_history'
+          AND child.relname ~ '^enrichment_history_p[0-9]{4}_[0-9]{2}$'
+        ORDER BY child.relname
+    LOOP
+        -- Borne haute de la partition : premier jour du mois suivant
+        IF (to_date(substring(partition_name FROM '[0-9]{4}_[0-9]{2}$'), 'YYYY_MM') + INTERVAL '1 month')::DATE <= cutoff THEN
+            EXECUTE format('DROP TABLE %I', partition_name);
+            RETURN NEXT partition_name;
+        END IF;
+    END LOOP;
+
+    DELETE FROM enrichment_history_default WHERE created_at < cutoff;
+    GET DIAGNOSTICS deleted_rows = ROW_COUNT;
+    IF deleted_rows > 0 THEN
+        RETURN NEXT 'enrichment_history_default';
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Lignes déjà présentes dans la partition par défaut : partitions de leurs mois créées
+DO $$
+DECLARE
+    month_offset INTEGER;
+BEGIN
+    FOR month_offset IN
+        SELECT DISTINCT ((extract(year FROM age(date_trunc('month', created_at), date_trunc('month', CURRENT_DATE))) * 12)
+                         + extract(month FROM age(date_trunc('month', created_at), date_trunc('month', CURRENT_DATE))))::INTEGER
+        FROM enrichment_history_default
+    LOOP
+        PERFORM enrichment_history_ensure_partitions(-month_offset, month_offset);
+    END LOOP;
+END;
+$$;
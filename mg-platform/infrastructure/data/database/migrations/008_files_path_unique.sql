@@ -0,0 +1,45 @@
+-- Migration 008 : unicité de files_processed.file_path
+-- Clé de l'upsert des résultats d'analyse (ON CONFLICT (file_path)) : les doublons existants sont
+-- fusionnés dans la ligne la plus récente de chaque chemin avant la création de l'index
+
+CREATE TEMP TABLE files_path_duplicates ON COMMIT DROP AS
+SELECT id, kept_id
+FROM (
+    SELECT id, first_value(id) OVER (PARTITION BY file_path ORDER BY updated_at DESC NULLS LAST, id DESC) AS kept_id
+    FROM files_processed
+) ranked
+WHERE id <> kept_id;
+
+-- Historique et valeurs d'entités rattachés à la ligne conservée
+UPDATE enrichment_history h
+SET file_id = d.kept_id
+FROM files_path_duplicates d
+WHERE h.file_id = d.id;
+
+UPDATE entity_values v
+SET file_id = d.kept_id
+FROM files_path_duplicates d
+WHERE v.file_id = d.id;
+
+-- Cumuls KPI additionnés dans ceux de la ligne conservée (ceux des doublons supprimés en cascade)
+INSERT INTO kpi_enrichment_daily AS target
+    (day, file_id, field_name, source, enriched_count, filled_count, high_confidence_count, confidence_sum, confidence_count)
+SELECT
+    k.day, d.kept_id, k.field_name, k.source,
+    SUM(k.enriched_count), SUM(k.filled_count), SUM(k.high_confidence_count),
+    SUM(k.confidence_sum), SUM(k.confidence_count)
+FROM kpi_enrichment_daily k
+JOIN files_path_duplicates d ON d.id = k.file_id
+GROUP BY k.day, d.kept_id, k.field_name, k.source
+ON CONFLICT (day, file_id, field_name, source) DO UPDATE SET
+    enriched_count = target.enriched_count + excluded.enriched_count,
+    filled_count = target.filled_count + excluded.filled_count,
+    high_confidence_count = target.high_confidence_count + excluded.high_confidence_count,
+    confidence_sum = target.confidence_sum + excluded.confidence_sum,
+    confidence_count = target.confidence_count + excluded.confidence_count;
+
+DELETE FROM files_processed f
+USING files_path_duplicates d
+WHERE f.id = d.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_files_path ON files_processed(file_path);
@@ -1,5 +1,7 @@
 -- Schéma de base de données pour Marne & Gondoire
 -- Version: 0.1.0
+-- Schéma initial (migration 001) ; les évolutions sont dans migrations/
+-- et s'appliquent avec : python -m infrastructure.data.database.migrate upgrade
 
 -- Table des fichiers traités
 CREATE TABLE IF NOT EXISTS files_processed (
@@ -188,6 +188,21 @@ EOF
     "formatters": {
         "standard": {
             "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+        },
+        "json": {
+            "()": "observability.log_config.JsonFormatter",
+            "fmt": "%(asctime)s %(levelname)s %(name)s %(message)s"
+        }
+    },
+    "filters": {
+        "context": {
+            "()": "observability.log_config.ContextFilter"
+        },
+        "sample_noisy_info": {
+            "()": "observability.log_config.SamplingFilter",
+            "every": 10,
+            "max_level": "INFO",
+            "loggers": ["uvicorn.access"]
         }
     },
     "handlers": {
@@ -198,15 +213,24 @@ EOF
             "stream": "ext://sys.stdout"
         },
         "file": {
-            "class": "logging.FileHandler",
+            "class": "logging.handlers.RotatingFileHandler",
             "level": "DEBUG",
-            "formatter": "standard",
-            "filename": "logs/mcp_server.log"
+            "formatter": "json",
+            "filename": "logs/mcp_server.log",
+            "maxBytes": 10485760,
+            "backupCount": 5,
+            "encoding": "utf-8"
+        },
+        "async": {
+            "()": "observability.log_config.AsyncQueueHandler",
+            "handlers": ["console", "file"],
+            "queue_size": 10000,
+            "filters": ["sample_noisy_info", "context"]
         }
     },
     "root": {
         "level": "INFO",
-        "handlers": ["console", "file"]
+        "handlers": ["async"]
     }
 }
 EOF
@@ -366,6 +390,23 @@ EOF
     log_success "Fichiers Python de base créés"
 }
 
+# Fonction pour appliquer les migrations du schéma (schema.sql puis migrations/)
+apply_migrations() {
+    log_info "Application des migrations de la base de données..."
+    
+    if [[ "$OSTYPE" == "msys" || "$OSTYPE" == "win32" ]]; then
+        source .venv/Scripts/activate
+    else
+        source .venv/bin/activate
+    fi
+    
+    if $PYTHON_CMD -m infrastructure.data.database.migrate upgrade; then
+        log_success "Base de données à jour"
+    else
+        log_warning "Migrations non appliquées (PostgreSQL joignable ?), la persistance des résultats échouera"
+    fi
+}
+
 # Fonction pour démarrer le serveur en mode développement
 start_dev_server() {
     log_info "Démarrage du serveur en mode développement..."
@@ -431,6 +472,7 @@ main() {
             create_basic_python_files
             create_test_file
             setup_venv
+            apply_migrations
             start_dev_server
             ;;
         "test")
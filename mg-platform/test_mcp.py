@@ -177,6 +177,38 @@ def test_file_analysis():
         print(f"❌ Erreur analyse fichier: {e}")
         return False
 
+def test_batch_tools():
+    """Test de l'appel groupé d'outils"""
+    print("\n🔍 Test 7: Appel groupé d'outils")
+    try:
+        payload = {
+            "calls": [
+                {"name": "get_table_schema", "arguments": {"table_name": "files_processed"}},
+                {"name": "run_sql", "arguments": {"query": "SELECT 1 as test_value", "limit": 1}},
+                {"name": "unknown_tool", "arguments": {}}
+            ]
+        }
+        response = requests.post(
+            f"{SERVER_URL}/tools/batch",
+            json=payload,
+            timeout=TIMEOUT
+        )
+        
+        if response.status_code == 200:
+            results = response.json().get('results', [])
+            if len(results) == 3 and results[0].get('success') and results[1].get('success') and not results[2].get('success'):
+                print("✅ Appel groupé OK - 3 réponses dans l'ordre, erreur isolée")
+                return True
+            else:
+                print(f"❌ Appel groupé - Réponses inattendues: {results}")
+                return False
+        else:
+            print(f"❌ Appel groupé HTTP erreur: {response.status_code}")
+            return False
+    except Exception as e:
+        print(f"❌ Erreur appel groupé: {e}")
+        return False
+
 def wait_for_server():
     """Attend que le serveur soit prêt"""
     print("⏳ Attente du serveur...")
@@ -212,6 +244,7 @@ def main():
         ("Outil SQL", test_sql_tool),
         ("Recherche web", test_web_search),
         ("Analyse de fichier", test_file_analysis),
+        ("Appel groupé", test_batch_tools),
     ]
     
     # Exécuter les tests